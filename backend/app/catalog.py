@@ -0,0 +1,399 @@
+# backend/app/catalog.py
+"""
+In-memory POI catalog with incremental (delta) ingestion.
+
+The catalog is loaded from the CSV once and partitioned by city. Google
+Places results are written through into it (source="google", fetched_at)
+and persisted to a sidecar CSV that is merged back in on load; with
+TRIPWEAVER_DEDUP near-duplicate places are dropped after that merge and
+again in every city a delta touches. Deltas (upserts and deletes keyed on
+(city_name, place_name)) rebuild only the partitions of the cities they
+touch and publish a new immutable snapshot by swapping a single reference
+(copy-on-write with structural sharing).
+Readers take `catalog.snapshot()` once per request and never block; a
+request keeps seeing the version it started with even if a delta lands
+meanwhile.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .dedup import DEDUP_ENABLED, REPORT_COLS, find_duplicates
+from .retrieval import REQUIRED_COLS, load_pois, normalize_pois
+
+PoiKey = Tuple[str, str]  # (city_name, place_name)
+
+DATASET_SOURCE = "dataset"
+GOOGLE_SOURCE = "google"
+GOOGLE_RATING_SCALE = 5.0
+
+_DEFAULT_GOOGLE_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "google_pois.csv"
+GOOGLE_CATALOG_PATH = Path(os.getenv("TRIPWEAVER_GOOGLE_CATALOG", str(_DEFAULT_GOOGLE_PATH)))
+
+# fields a brand-new place must provide in an upsert
+_NEW_POI_COLS = ["place_category", "popularity_score", "lat", "lon"]
+
+
+def normalize_key(value: object) -> str:
+    """City / place key: whitespace collapsed, lower-cased."""
+    return " ".join(str(value).split()).lower()
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    partitions: Mapping[str, pd.DataFrame]  # normalized city_name -> that city's rows
+    # cities changed by deltas since the last full load (precomputed plans for them are stale)
+    changed_cities: frozenset = frozenset()
+    _frame: List[pd.DataFrame] = field(default_factory=list, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.partitions.values())
+
+    def city_pois(self, city_key: str) -> pd.DataFrame:
+        """Rows of every city whose normalized name contains `city_key` (substring match)."""
+        city_key = normalize_key(city_key)
+        parts = [df for name, df in self.partitions.items() if city_key in name]
+        if not parts:
+            return self.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return pd.concat(parts, ignore_index=True)
+
+    def is_changed(self, city_key: str) -> bool:
+        city_key = normalize_key(city_key)
+        return any(city_key in name for name in self.changed_cities)
+
+    def frame(self) -> pd.DataFrame:
+        """The whole catalog as one frame (built lazily, once per snapshot)."""
+        if not self._frame:
+            parts = list(self.partitions.values())
+            self._frame.append(pd.concat(parts, ignore_index=True) if parts else self.empty())
+        return self._frame[0]
+
+    def get(self, city_name: str, place_name: str) -> Optional[dict]:
+        part = self.partitions.get(normalize_key(city_name))
+        if part is None:
+            return None
+        rows = part[part["place_key"] == normalize_key(place_name)]
+        return None if rows.empty else rows.iloc[0].to_dict()
+
+    def empty(self) -> pd.DataFrame:
+        for part in self.partitions.values():
+            return part.iloc[0:0]
+        return pd.DataFrame(columns=REQUIRED_COLS + ["lat_float", "lon_float", "place_key"])
+
+
+def _partition(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    df = df.copy()
+    df["place_key"] = df["place_name"].map(normalize_key)
+    if "source" not in df.columns:
+        df["source"] = DATASET_SOURCE
+    if "fetched_at" not in df.columns:
+        df["fetched_at"] = float("nan")
+    if "google_seen_at" not in df.columns:
+        df["google_seen_at"] = float("nan")
+    city_keys = df["city_name"].map(normalize_key)
+    return {
+        city: part.reset_index(drop=True)
+        for city, part in df.groupby(city_keys, sort=False)
+    }
+
+
+class POICatalog:
+    def __init__(
+        self,
+        csv_path: str | Path | None = None,
+        google_path: str | Path | None = None,
+        dedup: Optional[bool] = None,
+    ):
+        self.csv_path = csv_path
+        # sidecar CSV persisting Google Places results across restarts (None: memory only)
+        self.google_path = Path(google_path) if google_path is not None else None
+        self._write_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # drop near-duplicate places (dataset vs Google, name variants) on load
+        self.dedup = DEDUP_ENABLED if dedup is None else dedup
+        self.dedup_report = pd.DataFrame(columns=REPORT_COLS)
+
+    def snapshot(self) -> CatalogSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            with self._write_lock:
+                if self._snapshot is None:
+                    self._snapshot = CatalogSnapshot(0, MappingProxyType(self._load()))
+                snap = self._snapshot
+        return snap
+
+    def reload(self) -> CatalogSnapshot:
+        """Full reload from the CSV (the slow path deltas are meant to avoid)."""
+        parts = self._load()
+        with self._write_lock:
+            version = self._snapshot.version + 1 if self._snapshot else 0
+            self._snapshot = CatalogSnapshot(version, MappingProxyType(parts))
+            return self._snapshot
+
+    def _load(self) -> Dict[str, pd.DataFrame]:
+        parts = _partition(load_pois(self.csv_path))
+        if self.google_path is not None and self.google_path.exists():
+            rows = self._compact_sidecar()
+            _rebuild(parts, _upserts_by_city(_google_upserts(parts, rows)), {})
+        if self.dedup:
+            self.dedup_report = _dedupe_partitions(parts, list(parts))
+            if len(self.dedup_report):
+                print(f"[Catalog] dropped {len(self.dedup_report)} near-duplicate POIs")
+        return parts
+
+    def _compact_sidecar(self) -> pd.DataFrame:
+        """
+        Sidecar rows with only the latest fetch of each (city, place); the
+        file is rewritten when refetches had piled up older copies.
+        """
+        with self._file_lock:
+            rows = _google_prices(pd.read_csv(self.google_path))
+            rows = rows.sort_values("fetched_at", kind="stable")
+            keys = pd.DataFrame({"city": rows["city_name"].map(normalize_key), "place": rows["place_name"].map(normalize_key)})
+            latest = rows[~keys.duplicated(keep="last").to_numpy()]
+            if len(latest) < len(rows):
+                tmp = self.google_path.with_suffix(".tmp")
+                try:
+                    latest.to_csv(tmp, index=False)
+                    os.replace(tmp, self.google_path)
+                    print(f"[Catalog] compacted {self.google_path.name}: {len(rows)} -> {len(latest)} rows")
+                except OSError as e:
+                    print(f"[Catalog] failed to compact Google results: {e}")
+        return latest
+
+    def apply_delta(
+        self,
+        upserts: pd.DataFrame | Sequence[dict] | None = None,
+        deletes: Iterable[PoiKey] = (),
+        mark_changed: bool = True,
+    ) -> CatalogSnapshot:
+        """
+        Apply upserts and deletes keyed on (city_name, place_name).
+
+        Upsert rows may be partial: for an existing place only the non-null
+        fields given are changed; a new place needs every required column.
+        Deletes are applied before upserts. Raises ValueError on bad rows.
+        With mark_changed=False the touched cities are not added to
+        `changed_cities` (precomputed plans for them stay in use). With
+        dedup on, the touched cities are deduplicated again.
+        """
+        upserts_by_city = _upserts_by_city(upserts)
+        deletes_by_city: Dict[str, set] = {}
+        for city, place in deletes:
+            deletes_by_city.setdefault(normalize_key(city), set()).add(normalize_key(place))
+
+        self.snapshot()  # make sure the base is loaded before taking the lock
+        with self._write_lock:
+            base = self._snapshot
+            parts = dict(base.partitions)  # shallow: untouched cities are shared
+            touched = _rebuild(parts, upserts_by_city, deletes_by_city)
+            if self.dedup:
+                report = _dedupe_partitions(parts, touched)
+                if len(report):
+                    self.dedup_report = pd.concat([self.dedup_report, report], ignore_index=True)
+            self._snapshot = CatalogSnapshot(
+                base.version + 1,
+                MappingProxyType(parts),
+                changed_cities=base.changed_cities | touched if mark_changed else base.changed_cities,
+            )
+            return self._snapshot
+
+    def record_google_results(self, city_key: str, pois: Sequence[dict]) -> pd.DataFrame:
+        """
+        Write-through of normalized Google Places results for one city.
+
+        Ratings (0-5) are scaled to the dataset's 0-1 popularity; Google's
+        0-4 price level goes to `price_level` and `price` (currency) is left
+        empty; rows get source="google" and fetched_at. Places already in the
+        catalog from another source keep their values and only get
+        `google_seen_at`, so later Google requests can serve them too.
+        Returns the fetched rows in catalog form.
+        """
+        fetched_at = time.time()
+        rows = pd.DataFrame(list(pois))
+        rows["city_name"] = city_key
+        rows["popularity_score"] = pd.to_numeric(rows["popularity_score"], errors="coerce").fillna(0.0) / GOOGLE_RATING_SCALE
+        rows = _google_prices(rows)
+        rows["source"] = GOOGLE_SOURCE
+        rows["fetched_at"] = fetched_at
+        rows = rows[rows["place_name"].astype(str).str.strip() != ""]
+        result = normalize_pois(rows.copy())
+
+        if len(rows):
+            # cached API results, not a catalog edit: precomputed plans stay in use
+            snap = self.apply_delta(_google_upserts(self.snapshot().partitions, rows), mark_changed=False)
+            # rows dropped as near-duplicates are not worth persisting
+            part = snap.partitions.get(normalize_key(city_key))
+            kept = part["place_key"] if part is not None else pd.Series([], dtype=object)
+            self._persist(rows[rows["place_name"].map(normalize_key).isin(kept)])
+        return result
+
+    def _persist(self, rows: pd.DataFrame) -> None:
+        if self.google_path is None or rows.empty:
+            return
+        cols = REQUIRED_COLS + ["price_level", "source", "fetched_at"]
+        try:
+            with self._file_lock:
+                self.google_path.parent.mkdir(parents=True, exist_ok=True)
+                header = not self.google_path.exists()
+                rows.reindex(columns=cols).to_csv(self.google_path, mode="a", header=header, index=False)
+        except OSError as e:
+            print(f"[Catalog] failed to persist Google results: {e}")
+
+    def apply_delta_file(self, path: str | Path) -> CatalogSnapshot:
+        """
+        Apply a CSV / JSON-lines delta file. An optional `op` column marks
+        rows as "upsert" (default) or "delete".
+        """
+        path = Path(path)
+        if path.suffix in {".jsonl", ".ndjson"}:
+            df = pd.read_json(path, lines=True)
+        else:
+            df = pd.read_csv(path)
+
+        if "op" in df.columns:
+            ops = df["op"].fillna("upsert").str.lower()
+            deleted = df[ops == "delete"]
+            deletes = list(zip(deleted["city_name"], deleted["place_name"]))
+            df = df[ops != "delete"].drop(columns=["op"])
+        else:
+            deletes = []
+        return self.apply_delta(df, deletes)
+
+
+def _upserts_by_city(upserts: pd.DataFrame | Sequence[dict] | None) -> Dict[str, pd.DataFrame]:
+    if upserts is None:
+        return {}
+    upserts = upserts.copy() if isinstance(upserts, pd.DataFrame) else pd.DataFrame(list(upserts))
+    if upserts.empty:
+        return {}
+    upserts = normalize_pois(upserts, required=["city_name", "place_name"], drop_unscored=False)
+    upserts["place_key"] = upserts["place_name"].map(normalize_key)
+    # last write wins within a delta
+    upserts = upserts.drop_duplicates(subset=["city_name", "place_key"], keep="last")
+    return {city: rows for city, rows in upserts.groupby(upserts["city_name"].map(normalize_key), sort=False)}
+
+
+def _rebuild(
+    parts: Dict[str, pd.DataFrame],
+    upserts_by_city: Dict[str, pd.DataFrame],
+    deletes_by_city: Dict[str, set],
+) -> set:
+    """Replace the partitions of touched cities in `parts`; returns the touched city keys."""
+    touched = set(deletes_by_city) | set(upserts_by_city)
+    for city in touched:
+        new_part = _apply_city_delta(
+            parts.get(city),
+            upserts_by_city.get(city),
+            deletes_by_city.get(city, set()),
+        )
+        if new_part is None or new_part.empty:
+            parts.pop(city, None)
+        else:
+            parts[city] = new_part
+    return touched
+
+
+def _google_prices(rows: pd.DataFrame) -> pd.DataFrame:
+    """Keep Google's price level out of the currency `price` column (older sidecars stored it there)."""
+    rows = rows.copy()
+    if "price_level" not in rows.columns:
+        rows["price_level"] = rows["price"] if "price" in rows.columns else float("nan")
+    rows["price"] = float("nan")
+    return rows
+
+
+def _dedupe_partitions(parts: Dict[str, pd.DataFrame], cities: Iterable[str]) -> pd.DataFrame:
+    """Drop near-duplicates within each given city's partition in `parts`; returns the report."""
+    reports = []
+    for city in cities:
+        part = parts.get(city)
+        if part is None:
+            continue
+        keep, report = find_duplicates(part)
+        if len(report):
+            parts[city] = part[keep].reset_index(drop=True)
+            reports.append(report)
+    return pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=REPORT_COLS)
+
+
+def _google_upserts(parts: Mapping[str, pd.DataFrame], rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Upserts for Google rows: whole rows for places only Google has, and just
+    `google_seen_at` for places the catalog has from another source.
+    """
+    if rows.empty:
+        return rows
+    rows = rows.assign(google_seen_at=rows["fetched_at"])
+    curated = []
+    for city, place in zip(rows["city_name"].map(normalize_key), rows["place_name"].map(normalize_key)):
+        part = parts.get(city)
+        existing = part[part["place_key"] == place] if part is not None else None
+        curated.append(existing is not None and not existing.empty and (existing["source"] != GOOGLE_SOURCE).any())
+    curated = pd.Series(curated, index=rows.index)
+    seen = rows.loc[curated, ["city_name", "place_name", "google_seen_at"]]
+    return pd.concat([rows[~curated], seen], ignore_index=True)
+
+
+def _apply_city_delta(
+    part: Optional[pd.DataFrame],
+    upserts: Optional[pd.DataFrame],
+    deleted: set,
+) -> Optional[pd.DataFrame]:
+    """Build a city's new partition; the old frame is never mutated."""
+    if part is not None and deleted:
+        part = part[~part["place_key"].isin(deleted)]
+    if upserts is None or upserts.empty:
+        return None if part is None else part.reset_index(drop=True)
+
+    ups = upserts.set_index("place_key", drop=False)
+    if part is None:
+        new = ups.iloc[0:0]
+    else:
+        new = part.set_index("place_key", drop=False)  # a new frame; `part` is untouched
+
+    # partial update of existing places: only the non-null fields given
+    updated_keys = ups.index.intersection(new.index)
+    for col in ups.columns:
+        values = ups.loc[updated_keys, col].dropna()
+        if col == "place_key" or values.empty:
+            continue
+        if col not in new.columns:
+            new[col] = None
+        new[col] = new[col].astype(object)
+        new.loc[values.index, col] = values
+
+    inserted = ups.loc[~ups.index.isin(new.index)]
+    if len(inserted):
+        missing = [c for c in REQUIRED_COLS if c not in inserted.columns]
+        if missing or inserted[_NEW_POI_COLS].isna().any(axis=None):
+            raise ValueError(
+                f"New POIs need non-null {_NEW_POI_COLS} and columns {REQUIRED_COLS}: "
+                f"{list(inserted['place_name'])}"
+            )
+        new = pd.concat([new, inserted])
+
+    if new.empty:
+        return None
+    # re-derive numeric types and lat_float/lon_float for the touched city only
+    new = new.drop(columns=["lat_float", "lon_float"], errors="ignore").reset_index(drop=True)
+    return normalize_pois(new)
+
+
+_CATALOG = POICatalog(google_path=GOOGLE_CATALOG_PATH)
+
+
+def get_catalog() -> POICatalog:
+    return _CATALOG
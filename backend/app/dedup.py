@@ -0,0 +1,227 @@
+# backend/app/dedup.py
+"""
+Near-duplicate POI detection for merged catalogs.
+
+The same place often appears under slightly different names and
+coordinates ("central park" vs "Central Park NYC", a Google row next to
+the dataset row). Comparing all pairs is quadratic, so:
+
+1. Blocking: rows are bucketed by city and a lat/lon grid cell one
+   TRIPWEAVER_DEDUP_RADIUS_M wide (a fixed-size geohash); candidate pairs
+   come only from the same or an adjacent cell, generated with joins.
+2. Candidates further apart than the radius are dropped.
+3. Name similarity is the Jaccard index of character trigrams of the
+   normalized names, computed for all candidate pairs at once by joining
+   exploded (row, trigram) tables.
+4. Pairs at or above TRIPWEAVER_DEDUP_NAME_SIM are clustered (connected
+   components); each cluster keeps one canonical row: dataset rows over
+   Google rows, then the highest popularity.
+
+Work grows with rows x neighbours per cell, i.e. near-linearly for real
+catalogs. `python -m backend.app.dedup --report dups.csv` writes the
+clusters found in the current catalog; set TRIPWEAVER_DEDUP=1 to drop
+the duplicates when the catalog loads.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .wiki_index import normalize_title
+
+DEDUP_ENABLED = os.getenv("TRIPWEAVER_DEDUP", "").lower() in {"1", "true", "yes"}
+DEDUP_RADIUS_M = float(os.getenv("TRIPWEAVER_DEDUP_RADIUS_M", "150"))
+DEDUP_NAME_SIM = float(os.getenv("TRIPWEAVER_DEDUP_NAME_SIM", "0.5"))
+
+_M_PER_DEG = 111_320.0
+_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+REPORT_COLS = ["cluster_id", "city_name", "canonical_name", "place_name", "source", "distance_m", "name_sim"]
+
+
+def _trigrams(name: str) -> List[str]:
+    padded = f"  {name} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def _candidate_pairs(city: np.ndarray, lat: np.ndarray, lon: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(i, j) index pairs, i < j, in the same or adjacent grid cells of the same city."""
+    cell_deg = radius_m / _M_PER_DEG
+    # per-city reference latitude keeps longitude cells ~radius wide
+    ref_lat = pd.Series(lat).groupby(city).transform("median").to_numpy()
+    cells = pd.DataFrame({
+        "row": np.arange(len(lat)),
+        "city": city,
+        "cx": np.floor(lon * np.cos(np.radians(ref_lat)) / cell_deg).astype(np.int64),
+        "cy": np.floor(lat / cell_deg).astype(np.int64),
+    })
+
+    pairs = []
+    for dx, dy in _NEIGHBOURS:
+        shifted = cells.assign(cx=cells["cx"] + dx, cy=cells["cy"] + dy)
+        joined = cells.merge(shifted, on=["city", "cx", "cy"], suffixes=("_i", "_j"))
+        joined = joined[joined["row_i"] < joined["row_j"]]
+        pairs.append(joined[["row_i", "row_j"]].to_numpy())
+    if not pairs:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    both = np.unique(np.concatenate(pairs), axis=0)
+    return both[:, 0], both[:, 1]
+
+
+def _distance_m(lat_i, lon_i, lat_j, lon_j) -> np.ndarray:
+    """Equirectangular distance; exact enough at dedup radii."""
+    mean_lat = np.radians((lat_i + lat_j) / 2.0)
+    dx = (lon_j - lon_i) * np.cos(mean_lat)
+    dy = lat_j - lat_i
+    return np.hypot(dx, dy) * _M_PER_DEG
+
+
+def _name_similarity(names: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Trigram Jaccard similarity of names[i] and names[j] for every pair."""
+    if len(i) == 0:
+        return np.zeros(0)
+    # only names that take part in a candidate pair
+    involved = np.unique(np.concatenate([i, j]))
+    unique, inverse = np.unique(names[involved], return_inverse=True)
+    code = np.full(len(names), -1, dtype=np.int64)
+    code[involved] = inverse
+    grams = [_trigrams(n) for n in unique]
+    sizes = np.fromiter((len(g) for g in grams), dtype=np.int64, count=len(grams))
+    codes, _ = pd.factorize(pd.Series([g for gs in grams for g in gs], dtype=object))
+    table = pd.DataFrame({"name": np.repeat(np.arange(len(unique)), sizes), "gram": codes})
+
+    a, b = code[i], code[j]
+    pair_ids = np.arange(len(i))
+    left = pd.DataFrame({"pair": pair_ids, "name": a, "other": b}).merge(table, on="name")
+    shared = left.merge(table, left_on=["other", "gram"], right_on=["name", "gram"])
+    inter = np.bincount(shared["pair"].to_numpy(), minlength=len(i))
+    union = sizes[a] + sizes[b] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+
+
+def _components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Connected-component label (smallest member index) per row."""
+    parent = np.arange(n)
+    while len(i):
+        ri, rj = parent[i], parent[j]
+        lo = np.minimum(ri, rj)
+        np.minimum.at(parent, ri, lo)
+        np.minimum.at(parent, rj, lo)
+        while True:  # pointer jumping to the roots
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        if np.array_equal(parent[i], parent[j]):
+            break
+    return parent
+
+
+def find_duplicates(
+    pois: pd.DataFrame,
+    radius_m: float = DEDUP_RADIUS_M,
+    min_similarity: float = DEDUP_NAME_SIM,
+) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Cluster near-duplicate rows.
+
+    Returns (keep, report): a boolean mask of rows to keep (canonical rows
+    and rows without duplicates) and one report row per duplicate dropped.
+    Rows without coordinates are never matched.
+    """
+    n = len(pois)
+    keep = np.ones(n, dtype=bool)
+    lat = pd.to_numeric(pois["lat_float"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(pois["lon_float"], errors="coerce").to_numpy(dtype=float)
+    located = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    if len(located) < 2:
+        return keep, pd.DataFrame(columns=REPORT_COLS)
+
+    city_norm = pois["city_name"].astype(str).str.split().str.join(" ").str.lower()
+    city, _ = pd.factorize(city_norm.to_numpy()[located])
+    lat, lon = lat[located], lon[located]
+
+    i, j = _candidate_pairs(city, lat, lon, radius_m)
+    dist = _distance_m(lat[i], lon[i], lat[j], lon[j])
+    near = dist <= radius_m
+    i, j, dist = i[near], j[near], dist[near]
+    # names are normalized only for rows that have a nearby candidate
+    raw_names = pois["place_name"].to_numpy(dtype=object)[located]
+    names = np.empty(len(located), dtype=object)
+    paired = np.unique(np.concatenate([i, j]))
+    names[paired] = [normalize_title(str(p)) for p in raw_names[paired]]
+    sim = _name_similarity(names, i, j)
+    match = sim >= min_similarity
+    i, j, dist, sim = i[match], j[match], dist[match], sim[match]
+    if len(i) == 0:
+        return keep, pd.DataFrame(columns=REPORT_COLS)
+
+    labels = _components(len(located), i, j)
+    clustered = np.flatnonzero(np.bincount(labels, minlength=len(located))[labels] > 1)
+
+    # canonical: dataset over google, then popularity, then first seen
+    rows = pois.iloc[located[clustered]]
+    source = rows["source"].to_numpy() if "source" in rows.columns else np.full(len(rows), "dataset")
+    rank = pd.DataFrame({
+        "local": clustered,
+        "cluster": labels[clustered],
+        "external": source == "google",
+        "popularity": pd.to_numeric(rows["popularity_score"], errors="coerce").fillna(-1.0).to_numpy(),
+    }).sort_values(["cluster", "external", "popularity", "local"], ascending=[True, True, False, True], kind="stable")
+    canonical = rank.drop_duplicates("cluster").set_index("cluster")["local"]
+    dropped = rank[~rank["local"].isin(canonical.to_numpy())]
+    keep[located[dropped["local"].to_numpy()]] = False
+
+    # per dropped row: distance / similarity of its best matching pair
+    pair_stats = pd.DataFrame({
+        "local": np.concatenate([i, j]),
+        "distance_m": np.concatenate([dist, dist]),
+        "name_sim": np.concatenate([sim, sim]),
+    }).sort_values("name_sim", ascending=False).drop_duplicates("local").set_index("local")
+    gone = pois.iloc[located[dropped["local"].to_numpy()]]
+    report = pd.DataFrame({
+        "cluster_id": dropped["cluster"].to_numpy(),
+        "city_name": gone["city_name"].to_numpy(),
+        "canonical_name": pois["place_name"].to_numpy()[located[canonical.loc[dropped["cluster"]].to_numpy()]],
+        "place_name": gone["place_name"].to_numpy(),
+        "source": gone["source"].to_numpy() if "source" in gone.columns else "dataset",
+        "distance_m": pair_stats.loc[dropped["local"], "distance_m"].round(1).to_numpy(),
+        "name_sim": pair_stats.loc[dropped["local"], "name_sim"].round(3).to_numpy(),
+    })
+    return keep, report.reset_index(drop=True)
+
+
+def dedupe_pois(pois: pd.DataFrame, **kwargs) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(pois without near-duplicates, report); see find_duplicates."""
+    keep, report = find_duplicates(pois, **kwargs)
+    if report.empty:
+        return pois, report
+    return pois[keep].reset_index(drop=True), report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Report near-duplicate POIs in the catalog.")
+    ap.add_argument("--report", type=Path, help="write the duplicate report as CSV")
+    ap.add_argument("--radius-m", type=float, default=DEDUP_RADIUS_M)
+    ap.add_argument("--min-sim", type=float, default=DEDUP_NAME_SIM)
+    args = ap.parse_args(argv)
+
+    from .catalog import GOOGLE_CATALOG_PATH, POICatalog
+
+    # the merged catalog as loaded without dedup
+    frame = POICatalog(google_path=GOOGLE_CATALOG_PATH, dedup=False).snapshot().frame()
+    _, report = find_duplicates(frame, radius_m=args.radius_m, min_similarity=args.min_sim)
+    print(f"[Dedup] {len(frame)} rows, {len(report)} duplicates in {report['cluster_id'].nunique()} clusters")
+    if args.report:
+        report.to_csv(args.report, index=False)
+    else:
+        print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# backend/app/distances.py
+"""
+Per-city distance and travel-time matrices between POIs.
+
+`python -m backend.app.distances --top-n 200` precomputes, for the top-N
+POIs (by popularity) of every catalog city, an N x N great-circle distance
+matrix (km) and a travel-time matrix (minutes) as float32 .npy files:
+
+    <TRIPWEAVER_DISTANCE_DIR>/<city>/places.json   place keys, matrix order
+    <TRIPWEAVER_DISTANCE_DIR>/<city>/km.npy
+    <TRIPWEAVER_DISTANCE_DIR>/<city>/minutes.npy
+
+At request time they are memory-mapped; `pairwise(city, pois)` slices the
+precomputed block for known places and computes rows for the rest with
+vectorized haversine, so callers get a full matrix either way.
+
+Travel time is a simple model: walking (TRIPWEAVER_WALK_KMH) up to
+TRIPWEAVER_WALK_MAX_KM, otherwise a fixed transit overhead plus
+TRIPWEAVER_TRANSIT_KMH, both over the straight line times a detour factor.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .catalog import get_catalog, normalize_key
+
+_DEFAULT_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "distances"
+DISTANCE_DIR = Path(os.getenv("TRIPWEAVER_DISTANCE_DIR", str(_DEFAULT_DIR)))
+DISTANCE_TOP_N = int(os.getenv("TRIPWEAVER_DISTANCE_TOP_N", "200"))
+
+WALK_KMH = float(os.getenv("TRIPWEAVER_WALK_KMH", "4.5"))
+WALK_MAX_KM = float(os.getenv("TRIPWEAVER_WALK_MAX_KM", "1.5"))
+TRANSIT_KMH = float(os.getenv("TRIPWEAVER_TRANSIT_KMH", "20"))
+TRANSIT_OVERHEAD_MIN = float(os.getenv("TRIPWEAVER_TRANSIT_OVERHEAD_MIN", "10"))
+DETOUR_FACTOR = float(os.getenv("TRIPWEAVER_DETOUR_FACTOR", "1.3"))
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; inputs in degrees, broadcast like NumPy."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix_km(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """N x N distances between N points."""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    return haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def travel_minutes(km: np.ndarray) -> np.ndarray:
+    km = np.asarray(km, dtype=float) * DETOUR_FACTOR
+    walk = km / WALK_KMH * 60.0
+    transit = TRANSIT_OVERHEAD_MIN + km / TRANSIT_KMH * 60.0
+    return np.where(km <= WALK_MAX_KM * DETOUR_FACTOR, walk, np.minimum(walk, transit))
+
+
+class CityMatrix:
+    def __init__(self, path: Path):
+        self.places = json.loads((path / "places.json").read_text(encoding="utf-8"))
+        self.index = {key: i for i, key in enumerate(self.places)}
+        self.km = np.load(path / "km.npy", mmap_mode="r")
+        self.minutes = np.load(path / "minutes.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+
+_MATRICES: Dict[str, Optional[CityMatrix]] = {}
+_MATRICES_LOCK = threading.Lock()
+
+
+def get_city_matrix(city_key: str) -> Optional[CityMatrix]:
+    """The precomputed matrix of a city (memory-mapped, opened once), or None."""
+    city_key = normalize_key(city_key)
+    with _MATRICES_LOCK:
+        if city_key not in _MATRICES:
+            path = DISTANCE_DIR / city_key
+            matrix = None
+            if (path / "km.npy").exists():
+                try:
+                    matrix = CityMatrix(path)
+                except (OSError, ValueError) as e:
+                    print(f"[Distances] failed to open {path}: {e}")
+            _MATRICES[city_key] = matrix
+        return _MATRICES[city_key]
+
+
+def pairwise(city_key: str, pois: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (km, minutes) float32 matrices between the given POIs, in row order.
+
+    Pairs of precomputed places are sliced from the city's matrix; rows and
+    columns of other places are computed on the fly from lat_float/lon_float.
+    Pairs without coordinates are NaN.
+    """
+    n = len(pois)
+    lat = pd.to_numeric(pois["lat_float"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(pois["lon_float"], errors="coerce").to_numpy(dtype=float)
+    matrix = get_city_matrix(city_key)
+
+    if matrix is None:
+        km = haversine_matrix_km(lat, lon)
+        return km.astype(np.float32), travel_minutes(km).astype(np.float32)
+
+    idx = np.fromiter((matrix.index.get(normalize_key(p), -1) for p in pois["place_name"]), dtype=np.int64, count=n)
+    have = idx >= 0
+    km = np.empty((n, n), dtype=np.float32)
+    minutes = np.empty((n, n), dtype=np.float32)
+
+    known = np.flatnonzero(have)
+    if len(known):
+        block = np.ix_(known, known)
+        km[block] = matrix.km[np.ix_(idx[known], idx[known])]
+        minutes[block] = matrix.minutes[np.ix_(idx[known], idx[known])]
+
+    missing = np.flatnonzero(~have)
+    if len(missing):
+        rows = haversine_km(lat[missing, None], lon[missing, None], lat[None, :], lon[None, :])
+        km[missing, :] = rows
+        km[:, missing] = rows.T
+        minutes[missing, :] = travel_minutes(rows)
+        minutes[:, missing] = minutes[missing, :].T
+    return km, minutes
+
+
+def build_city(pois: pd.DataFrame, out: Path, top_n: int = DISTANCE_TOP_N) -> int:
+    """Write the matrices for the city's top_n POIs with coordinates; returns N."""
+    pois = pois.dropna(subset=["lat_float", "lon_float"])
+    pois = pois.sort_values("popularity_score", ascending=False, kind="stable")
+    pois = pois.drop_duplicates(subset=["place_name"]).head(top_n)
+    km = haversine_matrix_km(pois["lat_float"].to_numpy(), pois["lon_float"].to_numpy())
+
+    out.mkdir(parents=True, exist_ok=True)
+    np.save(out / "km.npy", km.astype(np.float32))
+    np.save(out / "minutes.npy", travel_minutes(km).astype(np.float32))
+    keys = [normalize_key(p) for p in pois["place_name"]]
+    (out / "places.json").write_text(json.dumps(keys, ensure_ascii=False), encoding="utf-8")
+    return len(keys)
+
+
+def run(out: Optional[Path] = None, cities: Optional[Sequence[str]] = None, top_n: int = DISTANCE_TOP_N) -> int:
+    out = out or DISTANCE_DIR
+    snapshot = get_catalog().snapshot()
+    cities = list(cities) if cities else sorted(snapshot.partitions)
+    started = time.time()
+    total = 0
+    for city in cities:
+        part = snapshot.partitions.get(normalize_key(city))
+        if part is None or part.empty:
+            print(f"[Distances] no POIs for '{city}', skipped")
+            continue
+        total += build_city(part, out / normalize_key(city), top_n)
+        with _MATRICES_LOCK:
+            _MATRICES.pop(normalize_key(city), None)  # reopen on next use
+    print(f"[Distances] {len(cities)} cities, {total} places written to {out} in {time.time() - started:.1f}s")
+    return total
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Precompute per-city POI distance / travel-time matrices.")
+    ap.add_argument("--out", type=Path)
+    ap.add_argument("--cities", nargs="*", help="catalog city names (default: all)")
+    ap.add_argument("--top-n", type=int, default=DISTANCE_TOP_N)
+    args = ap.parse_args(argv)
+    run(out=args.out, cities=args.cities, top_n=args.top_n)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 import os
 import requests
 
+from .resilience import DEPENDENCY_TIMEOUTS, DependencyDisabled, call_dependency
+from .shared_cache import cached
+
 API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 
 
@@ -26,14 +29,21 @@ def map_google_types_to_category(types: list) -> str:
 def search_places(query: str, city: str, country: str = "") -> list[dict]:
     """Call Google Places Text Search API and normalize results into our POI schema."""
     if API_KEY is None:
-        raise ValueError("Missing GOOGLE_PLACES_API_KEY")
+        raise DependencyDisabled("google_places: missing GOOGLE_PLACES_API_KEY")
+    # empty results (an error status like OVER_QUERY_LIMIT comes back empty) are not cached
+    return cached("places", (query, city, country), lambda: _text_search(query, city, country), cache_if=bool)
+
 
+def _text_search(query: str, city: str, country: str) -> list[dict]:
     url = (
         "https://maps.googleapis.com/maps/api/place/textsearch/json"
         f"?query={query}+in+{city}&key={API_KEY}"
     )
-    resp = requests.get(url)
-    data = resp.json()
+    timeout = DEPENDENCY_TIMEOUTS["google_places"]
+    data = call_dependency(
+        "google_places",
+        lambda: requests.get(url, timeout=timeout).json(),
+    )
 
     pois: list[dict] = []
     for item in data.get("results", []):
@@ -43,7 +53,9 @@ def search_places(query: str, city: str, country: str = "") -> list[dict]:
             "place_name": item.get("name", ""),
             "country": country or "",
             "place_category": map_google_types_to_category(item.get("types", [])),
-            "price": item.get("price_level", None),
+            # Google only has a 0-4 price level, not an entry price
+            "price": None,
+            "price_level": item.get("price_level", None),
             "open_time": None,
             "close_time": None,
             "popularity_score": item.get("rating", 0),
@@ -1,5 +1,20 @@
 # backend/app/llm_client.py
-from openai import OpenAI
+import os
+
+from openai import OpenAI, OpenAIError
+
+from .resilience import DEPENDENCY_TIMEOUTS
 
-client = OpenAI()
 LLM_MODEL = "gpt-4.1-mini"
+
+try:
+    # timeouts/retries are bounded here; the latency budget and circuit breaker
+    # in resilience.py decide whether a call is attempted at all
+    client = OpenAI(
+        timeout=DEPENDENCY_TIMEOUTS["openai"],
+        max_retries=int(os.getenv("TRIPWEAVER_OPENAI_MAX_RETRIES", "1")),
+    )
+except OpenAIError as e:
+    # e.g. OPENAI_API_KEY not set: LLM layers fall back to their non-LLM paths
+    print(f"[LLM client] OpenAI client disabled: {e}")
+    client = None
@@ -0,0 +1,266 @@
+# backend/app/llm_dispatcher.py
+"""
+Central, rate-limit-aware scheduler for OpenAI calls.
+
+Every completion goes through `dispatch()`, which
+- accounts requests and tokens against two token buckets sized to the
+  account's limits (TRIPWEAVER_LLM_RPM / TRIPWEAVER_LLM_TPM), charging an
+  estimate (prompt tokens + max_tokens) up front and settling the difference
+  once the real usage is known,
+- admits waiting calls strictly by priority class, then arrival order:
+      0 interactive parse   1 interactive explain
+      2 batch parse         3 batch explain
+  (precompute marks its calls as batch with `batch_traffic()`),
+- keeps at most TRIPWEAVER_LLM_MAX_CONCURRENCY calls in flight and at most
+  TRIPWEAVER_LLM_QUEUE_MAX waiting; when full, a new call evicts the
+  lowest-priority waiter or is rejected itself,
+- sheds a call as soon as it cannot start before its request's latency
+  budget runs out, instead of letting it burn the budget in the queue.
+Shed or rejected calls raise DependencyUnavailable, so callers use their
+existing fallbacks (heuristic parse, no explanation).
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+from .prompts import message_tokens
+from .resilience import DependencyUnavailable, call_dependency, current_budget, get_breaker
+
+T = TypeVar("T")
+
+LLM_RPM = float(os.getenv("TRIPWEAVER_LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("TRIPWEAVER_LLM_TPM", "200000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("TRIPWEAVER_LLM_MAX_CONCURRENCY", "16"))
+LLM_QUEUE_MAX = int(os.getenv("TRIPWEAVER_LLM_QUEUE_MAX", "256"))
+# completion tokens assumed for calls without max_tokens
+LLM_DEFAULT_OUTPUT_TOKENS = int(os.getenv("TRIPWEAVER_LLM_DEFAULT_OUTPUT_TOKENS", "600"))
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_TRAFFIC: ContextVar[str] = ContextVar("tripweaver_llm_traffic", default=INTERACTIVE)
+
+
+@contextmanager
+def batch_traffic() -> Iterator[None]:
+    """Mark LLM calls made inside the block as batch (lowest priority)."""
+    token = _TRAFFIC.set(BATCH)
+    try:
+        yield
+    finally:
+        _TRAFFIC.reset(token)
+
+
+def priority_class(kind: str, traffic: str) -> int:
+    return (2 if traffic == BATCH else 0) + (0 if kind == "parse" else 1)
+
+
+class TokenBucket:
+    """Classic token bucket; `capacity` per minute, refilled continuously."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        # a single call larger than the bucket may go once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def settle(self, delta: float) -> None:
+        """Give back (delta > 0) or charge (delta < 0) after the real usage is known."""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    kind: str = field(compare=False)
+    tokens: int = field(compare=False)
+    deadline: Optional[float] = field(compare=False)
+    granted: bool = field(default=False, compare=False)
+    shed: Optional[str] = field(default=None, compare=False)
+
+
+class LLMDispatcher:
+    def __init__(
+        self,
+        rpm: float = LLM_RPM,
+        tpm: float = LLM_TPM,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        queue_max: int = LLM_QUEUE_MAX,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.queue_max = queue_max
+        self.in_flight = 0
+        self.shed_count = 0
+        self._queue: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, kind: str, tokens: int, traffic: str = INTERACTIVE, deadline: Optional[float] = None) -> _Ticket:
+        """Block until the call may start; raises DependencyUnavailable when shed."""
+        ticket = _Ticket(priority_class(kind, traffic), next(self._seq), kind, tokens, deadline)
+        with self._cond:
+            self._enqueue(ticket)
+            while True:
+                if ticket.shed:
+                    raise DependencyUnavailable(f"openai: {ticket.shed}")
+                now = time.monotonic()
+                wait = self._admit(now)
+                if ticket.granted:
+                    return ticket
+                if ticket.shed:
+                    continue
+                if ticket.deadline is not None:
+                    if now >= ticket.deadline:
+                        self._queue.remove(ticket)
+                        heapq.heapify(self._queue)
+                        self._shed(ticket, "deadline passed while queued")
+                        continue
+                    wait = min(wait, ticket.deadline - now)
+                self._cond.wait(timeout=min(wait, 1.0))
+
+    def release(self, ticket: _Ticket, actual_tokens: Optional[int] = None, refund: bool = False) -> None:
+        """Free the call's slot; `refund` gives back everything charged for a call that never ran."""
+        with self._cond:
+            self.in_flight -= 1
+            if refund:
+                self.requests.settle(1)
+                self.tokens.settle(ticket.tokens)
+            elif actual_tokens is not None:
+                self.tokens.settle(ticket.tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def _enqueue(self, ticket: _Ticket) -> None:
+        if len(self._queue) >= self.queue_max:
+            worst = max(self._queue)
+            if ticket < worst:
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self._shed(worst, "evicted by higher-priority call")
+            else:
+                self.shed_count += 1
+                raise DependencyUnavailable("openai: dispatcher queue full")
+        heapq.heappush(self._queue, ticket)
+        self._cond.notify_all()
+
+    def _shed(self, ticket: _Ticket, reason: str) -> None:
+        ticket.shed = reason
+        self.shed_count += 1
+        self._cond.notify_all()
+
+    def _admit(self, now: float) -> float:
+        """Grant calls at the head of the queue while capacity allows; returns the next wait."""
+        while self._queue:
+            head = self._queue[0]
+            if head.deadline is not None and now >= head.deadline:
+                heapq.heappop(self._queue)
+                self._shed(head, "deadline passed while queued")
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return 1.0  # woken by release()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(head.tokens, now))
+            if wait > 0:
+                if head.deadline is not None and now + wait > head.deadline:
+                    # the rate limit would not let it start in time
+                    heapq.heappop(self._queue)
+                    self._shed(head, "rate limit leaves no time before the deadline")
+                    continue
+                return wait
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(head.tokens)
+            self.in_flight += 1
+            head.granted = True
+            self._cond.notify_all()
+        return 1.0
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._cond:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "queued": len(self._queue),
+                "in_flight": self.in_flight,
+                "shed": self.shed_count,
+                "rpm_available": int(self.requests.tokens),
+                "tpm_available": int(self.tokens.tokens),
+            }
+
+
+_DISPATCHER = LLMDispatcher()
+
+
+def get_dispatcher() -> LLMDispatcher:
+    return _DISPATCHER
+
+
+def dispatch(
+    kind: str,
+    messages: List[Dict[str, str]],
+    create: Callable[[], T],
+    max_tokens: Optional[int] = None,
+) -> T:
+    """Run one completion (`create`) through the rate limiter, priority queue and circuit breaker."""
+    estimate = message_tokens(messages) + (max_tokens or LLM_DEFAULT_OUTPUT_TOKENS)
+    budget = current_budget()
+    deadline = None
+    if budget is not None:
+        deadline = time.monotonic() + max(0.0, budget.remaining())
+
+    # an open circuit refuses the call anyway: don't spend rate-limit capacity on it
+    if get_breaker("openai").is_open():
+        if budget is not None:
+            budget.degraded = True
+        raise DependencyUnavailable("openai: circuit open")
+
+    dispatcher = get_dispatcher()
+    try:
+        ticket = dispatcher.acquire(kind, estimate, _TRAFFIC.get(), deadline)
+    except DependencyUnavailable:
+        if budget is not None:
+            budget.degraded = True
+        raise
+
+    actual = None
+    started = []
+
+    def run() -> T:
+        started.append(True)
+        return create()
+
+    try:
+        resp = call_dependency("openai", run)
+        usage = getattr(resp, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        actual = total if isinstance(total, int) else None
+        return resp
+    finally:
+        # refused without reaching OpenAI (circuit opened meanwhile, budget spent, pool full)
+        dispatcher.release(ticket, actual, refund=not started)
@@ -1,16 +1,116 @@
 # backend/app/llm_explainer.py
 from __future__ import annotations
 
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import contextvars
+import os
+import re
 
 from .llm_client import client, LLM_MODEL
-from .schemas import TripPlan, TripRequest, ParsedTripRequest
+from .prompts import (
+    DAY_INSTRUCTIONS,
+    EXPLAIN_INSTRUCTIONS,
+    SUMMARY_INSTRUCTIONS,
+    dumps_compact,
+    build_messages,
+    compact_day,
+    compact_plan,
+    record_usage,
+    request_context,
+)
+from .llm_dispatcher import dispatch
+from .resilience import DependencyDisabled, mark_degraded
+from .shared_cache import cached
+from .schemas import DayPlan, TripPlan, TripRequest, ParsedTripRequest
+
+# "monolithic": one prompt for the whole trip (original behaviour)
+# "per_day": one concurrent prompt per day plus a short summary prompt
+EXPLAIN_MODE = os.getenv("TRIPWEAVER_EXPLAIN_MODE", "monolithic").strip().lower()
+# completion token budgets for the per-day mode; bound tail latency on long trips
+EXPLAIN_DAY_MAX_TOKENS = int(os.getenv("TRIPWEAVER_EXPLAIN_DAY_MAX_TOKENS", "350"))
+EXPLAIN_SUMMARY_MAX_TOKENS = int(os.getenv("TRIPWEAVER_EXPLAIN_SUMMARY_MAX_TOKENS", "120"))
+EXPLAIN_MAX_WORKERS = int(os.getenv("TRIPWEAVER_EXPLAIN_MAX_WORKERS", "8"))
 
 
 def build_itinerary_explanation(
     req: TripRequest,
     parsed: ParsedTripRequest,
     plan: TripPlan,
+    mode: Optional[str] = None,
+) -> str:
+    """
+    Generate the explanation text for the itinerary.
+
+    `mode` overrides TRIPWEAVER_EXPLAIN_MODE ("monolithic" or "per_day").
+    """
+    summary, day_explanations = build_explanation_parts(req, parsed, plan, mode=mode)
+    return join_explanation(summary, day_explanations)
+
+
+def build_explanation_parts(
+    req: TripRequest,
+    parsed: ParsedTripRequest,
+    plan: TripPlan,
+    mode: Optional[str] = None,
+) -> Tuple[str, Dict[int, str]]:
+    """
+    Generate the explanation as (summary, {day_number: paragraph}).
+
+    In "per_day" mode the summary and every day are separate, independently
+    cached prompts issued concurrently; in "monolithic" mode the single
+    response is split on its "Day X:" headers.
+    """
+    mode = (mode or EXPLAIN_MODE).strip().lower()
+    if mode != "per_day":
+        return split_explanation(_build_monolithic_explanation(req, parsed, plan))
+
+    jobs: Dict[object, Callable[[], str]] = {
+        "summary": lambda: build_trip_summary(req, parsed, plan),
+    }
+    for day_plan in plan.days:
+        if day_plan.places:
+            jobs[day_plan.day] = lambda d=day_plan: build_day_explanation(req, parsed, d)
+
+    results = run_concurrently(jobs)
+    if not any(results.values()):
+        raise RuntimeError("All explanation prompts failed")
+
+    summary = results.pop("summary", "") or ""
+    return summary, {d: text for d, text in results.items() if text}
+
+
+def run_concurrently(jobs: Dict[object, Callable[[], str]]) -> Dict[object, Optional[str]]:
+    """
+    Run explanation prompts in parallel; a failed prompt maps to None so one
+    slow or broken day does not take the rest of the explanation with it.
+    """
+    results: Dict[object, Optional[str]] = {}
+    if not jobs:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(jobs), EXPLAIN_MAX_WORKERS))) as pool:
+        # copy the context so per-request state (e.g. token usage) follows the job
+        futures = {key: pool.submit(contextvars.copy_context().run, fn) for key, fn in jobs.items()}
+        for key, fut in futures.items():
+            try:
+                results[key] = fut.result()
+            except Exception as e:
+                mark_degraded(e)
+                print(f"[LLM explainer] Failed to generate explanation part {key!r}: {e}")
+                results[key] = None
+    return results
+
+
+def _cached_piece(kind: str, payload: object, generate: Callable[[], str]) -> str:
+    """Memoize one explanation piece (shared cache) on everything its prompt depends on."""
+    return cached("explain", (kind, LLM_MODEL, payload), generate, cache_if=bool)
+
+
+def _build_monolithic_explanation(
+    req: TripRequest,
+    parsed: ParsedTripRequest,
+    plan: TripPlan,
 ) -> str:
     """
     Call LLM to generate a friendly, concise explanation for the itinerary.
@@ -23,60 +123,102 @@ def build_itinerary_explanation(
     - simple food suggestions near key areas
     - any practical tips (crowds, timing, etc.)
     """
-    # JSON version of the final itinerary
-    plan_json = plan.model_dump_json()
-
-    user_query = req.query
-
-    prompt = f"""
-You are TripWeaver, a smart trip-planning assistant.
-
-The user wrote this original query:
-"{user_query}"
-
-We parsed it into this structured preference object:
-city = "{parsed.city}"
-days = {parsed.days}
-categories = {parsed.categories}
-data_source = "{getattr(req, "data_source", "offline")}"
-
-Here is the final itinerary in JSON (Pydantic model):
-{plan_json}
-
-Please write a friendly, concise explanation of this itinerary for the user.
-
-Requirements:
-- 1 short paragraph of overall summary.
-- Then for each day, provide a complete and detailed paragraph that:
-  * MUST include and mention EVERY single POI/attraction listed for that day in the itinerary,
-  * explains the full day's plan in chronological order (morning to evening),
-  * describes the rough pace (busy vs relaxed) and timing considerations,
-  * explains why these places make sense together geographically and thematically,
-  * details any notable transitions between spots (e.g., walking distance, transportation needed),
-  * includes practical information like suggested visit duration for each major attraction.
-- If helpful, mention:
-  * alternative POIs the user could swap in,
-  * simple food ideas (e.g., "look for local bakeries near Central Park"),
-  * important tips (crowds, opening hours, weather considerations).
-
-Output format:
-- Plain text in English.
-- No JSON, no markdown, no bullet points. Just paragraphs.
-- Use double line breaks (blank line) to separate paragraphs:
-  * First paragraph: overall summary
-  * Then one paragraph per day (Day 1, Day 2, etc.)
-- Each day paragraph should start with "Day X:" or "Day X -" for clarity.
-- Ensure no POI from the itinerary is omitted - every attraction must be mentioned in the explanation.
-"""
-
-    resp = client.chat.completions.create(
+    messages = build_messages(
+        EXPLAIN_INSTRUCTIONS,
+        f"{request_context(req, parsed)}\nItinerary: {compact_plan(plan)}",
+    )
+    return _cached_piece("trip", messages, lambda: _complete("explain", messages))
+
+
+_DAY_HEADER = re.compile(r"^\s*Day\s+(\d+)\s*[:\-]", re.I)
+
+
+def split_explanation(text: str) -> Tuple[str, Dict[int, str]]:
+    """
+    Split a full explanation into (summary, {day_number: paragraph}).
+
+    Relies on the output format requested above: paragraphs separated by a
+    blank line, day paragraphs starting with "Day X:" / "Day X -". Paragraphs
+    before the first day header form the summary; paragraphs after a day
+    header without their own header are appended to that day.
+    """
+    summary_parts: List[str] = []
+    days: Dict[int, List[str]] = {}
+    current: Optional[int] = None
+
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = para.strip()
+        if not para:
+            continue
+        m = _DAY_HEADER.match(para)
+        if m:
+            current = int(m.group(1))
+            days.setdefault(current, []).append(para)
+        elif current is None:
+            summary_parts.append(para)
+        else:
+            days[current].append(para)
+
+    return "\n\n".join(summary_parts), {d: "\n\n".join(p) for d, p in days.items()}
+
+
+def join_explanation(summary: str, day_explanations: Dict[int, str]) -> str:
+    """Inverse of `split_explanation`: summary first, then days in order."""
+    parts = [summary] if summary else []
+    parts.extend(day_explanations[d] for d in sorted(day_explanations) if day_explanations[d])
+    return "\n\n".join(parts)
+
+
+def build_day_explanation(
+    req: TripRequest,
+    parsed: ParsedTripRequest,
+    day_plan: DayPlan,
+) -> str:
+    """
+    Generate the paragraph for a single day of the itinerary.
+
+    Used by the "per_day" explanation mode and when only one day changed
+    (e.g. a POI swap in a plan session). Cached on the day's content.
+    """
+    day_json = dumps_compact(compact_day(day_plan))
+    payload = [req.query, parsed.city, parsed.days, parsed.categories, day_json, EXPLAIN_DAY_MAX_TOKENS]
+    return _cached_piece("day", payload, lambda: _generate_day_explanation(req, parsed, day_json))
+
+
+def _generate_day_explanation(req: TripRequest, parsed: ParsedTripRequest, day_json: str) -> str:
+    messages = build_messages(DAY_INSTRUCTIONS, f"{request_context(req, parsed)}\nDay: {day_json}")
+    return _complete("explain_day", messages, max_tokens=EXPLAIN_DAY_MAX_TOKENS)
+
+
+def build_trip_summary(
+    req: TripRequest,
+    parsed: ParsedTripRequest,
+    plan: TripPlan,
+) -> str:
+    """Generate only the short overall summary paragraph for the itinerary (cached)."""
+    outline = "; ".join(
+        f"Day {d.day}: " + ", ".join(p.name for p in d.places) for d in plan.days
+    )
+    payload = [req.query, parsed.city, parsed.days, parsed.categories, outline, EXPLAIN_SUMMARY_MAX_TOKENS]
+    return _cached_piece("summary", payload, lambda: _generate_trip_summary(req, parsed, outline))
+
+
+def _generate_trip_summary(req: TripRequest, parsed: ParsedTripRequest, outline: str) -> str:
+    messages = build_messages(SUMMARY_INSTRUCTIONS, f"{request_context(req, parsed)}\nOutline: {outline}")
+    return _complete("explain_summary", messages, max_tokens=EXPLAIN_SUMMARY_MAX_TOKENS)
+
+
+def _complete(kind: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> str:
+    kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+    if client is None:
+        raise DependencyDisabled("openai: client not configured")
+    resp = dispatch(kind, messages, lambda: client.chat.completions.create(
         model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a helpful trip-planning assistant called TripWeaver."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=messages,
         temperature=0.4,
-    )
+        **kwargs,
+    ), max_tokens=max_tokens)
+    record_usage(kind, messages, resp)
 
     text = resp.choices[0].message.content
     return (text or "").strip()
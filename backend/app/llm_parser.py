@@ -5,6 +5,10 @@ from typing import Dict, Any
 import json
 
 from .llm_client import client, LLM_MODEL
+from .prompts import PARSER_INSTRUCTIONS, build_messages, record_usage
+from .llm_dispatcher import dispatch
+from .resilience import DependencyDisabled, mark_degraded
+from .shared_cache import cached
 from .schemas import ParsedTripRequest
 
 
@@ -37,37 +41,20 @@ def llm_parse_query(user_query: str) -> Dict[str, Any]:
       - crowd_preference: "avoid_crowds" | "no_preference"
     """
 
-    system_prompt = """
-You are a strict JSON generator for a travel planner called TripWeaver.
+    messages = build_messages(PARSER_INSTRUCTIONS, f"User query: {user_query}")
+    # shared across workers; keyed on the prompt so instruction changes invalidate it
+    return cached("parse", (LLM_MODEL, messages), lambda: _complete_parse(messages))
 
-Your ONLY job is to read the user's natural language trip query
-and return a SINGLE JSON object with the following schema:
 
-{
-  "city": string,
-  "total_days": integer,
-  "categories": [string, ...],   // like "museum", "park", "food", "landmark"
-  "budget": "low" | "medium" | "high" | "unspecified",
-  "crowd_preference": "avoid_crowds" | "no_preference"
-}
-
-Rules:
-- Do NOT wrap the JSON in backticks.
-- Do NOT include any explanation, text, or comments.
-- If a field is not mentioned, guess a reasonable default
-  (e.g., budget="unspecified", crowd_preference="no_preference").
-"""
-
-    user_prompt = f"User query: {user_query}"
-
-    resp = client.chat.completions.create(
+def _complete_parse(messages) -> Dict[str, Any]:
+    if client is None:
+        raise DependencyDisabled("openai: client not configured")
+    resp = dispatch("parse", messages, lambda: client.chat.completions.create(
         model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=messages,
         temperature=0,
-    )
+    ))
+    record_usage("parse", messages, resp)
 
     content = resp.choices[0].message.content
     if not content:
@@ -92,12 +79,13 @@ def llm_parse_to_parsed_trip_request(
     """
     Try to refine the heuristic ParsedTripRequest using the LLM parser.
 
-    - If LLM call succeeds, overlay its city/total_days/categories onto `base`.
+    - If LLM call succeeds, overlay its city/total_days/categories/budget onto `base`.
     - If anything fails (no key, API error, etc.), return `base` unchanged.
     """
     try:
         raw = llm_parse_query(user_query)
     except Exception as e:
+        mark_degraded(e)
         print(f"[LLM parser] Falling back to heuristic parser due to error: {e}")
         return base
 
@@ -116,10 +104,15 @@ def llm_parse_to_parsed_trip_request(
 
     explicit = bool(categories)
 
+    budget = str(raw.get("budget") or "").strip().lower()
+    if budget not in {"low", "medium", "high"}:
+        budget = base.budget
+
     return ParsedTripRequest(
         query=base.query,
         categories=categories,
         explicit_categories=explicit,
         city=city,
         days=total_days,
+        budget=budget,
     )
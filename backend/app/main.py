@@ -1,9 +1,26 @@
 # backend/app/main.py
-from fastapi import FastAPI
+import hmac
+import os
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .schemas import TripRequest, TripPlan
+from .schemas import TripRequest, TripPlan, PlanEdit, PlanSessionResponse, CatalogDelta, CatalogDeltaResponse
 from .planner import dummy_plan
+from .sessions import create_session, get_session, apply_edit
+from .prompts import TokenUsage, track_usage
+from .resilience import breaker_states, request_budget
+from .catalog import get_catalog
+from .llm_dispatcher import get_dispatcher
+from .profiling import list_profiles, profile_request, read_profile, should_profile
+from .shared_cache import get_cache
+from .response_cache import CachedResponse, etag_matches, make_etag, plan_cache, request_key
+
+# also log each request's LLM token usage (it is always in the X-LLM-* headers)
+LOG_LLM_USAGE = os.getenv("TRIPWEAVER_LOG_LLM_USAGE", "").lower() in {"1", "true", "yes"}
+# /admin/* needs this token in X-TripWeaver-Admin-Token; unset disables those endpoints
+ADMIN_TOKEN = os.getenv("TRIPWEAVER_ADMIN_TOKEN", "")
 
 app = FastAPI(title="TripWeaver API")
 
@@ -25,9 +42,122 @@ app.add_middleware(
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "dependencies": breaker_states(),
+        "llm": get_dispatcher().snapshot(),
+        "cache": get_cache().stats,
+    }
+
+def _report_usage(response: Response, usage: TokenUsage) -> None:
+    """Expose per-request LLM token usage as response headers (and in the log if enabled)."""
+    response.headers["X-LLM-Calls"] = str(usage.calls)
+    response.headers["X-LLM-Input-Tokens"] = str(usage.input_tokens)
+    response.headers["X-LLM-Output-Tokens"] = str(usage.output_tokens)
+    if LOG_LLM_USAGE and usage.calls:
+        print(f"[LLM usage] calls={usage.calls} input={usage.input_tokens} output={usage.output_tokens} by_kind={usage.by_kind}")
+
+def _cache_bypassed(request: Request) -> bool:
+    if request.headers.get("x-tripweaver-cache", "").strip().lower() == "bypass":
+        return True
+    return "no-cache" in request.headers.get("cache-control", "").lower()
+
+def _cached_plan_response(entry: CachedResponse, request: Request, status: str) -> Response:
+    headers = {"ETag": entry.etag, "X-Cache": status}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
 @app.post("/plan", response_model=TripPlan)
-def create_plan(req: TripRequest):
-    plan = dummy_plan(req)
-    return plan
+def create_plan(req: TripRequest, request: Request):
+    key = request_key(req)
+    profiled = should_profile(request.headers)
+    # a profiled request has to actually run the pipeline
+    bypass = _cache_bypassed(request) or profiled
+    if not bypass:
+        entry = plan_cache.get(key)
+        if entry is not None:
+            return _cached_plan_response(entry, request, "HIT")
+
+    with profile_request(profiled, label=req.query) as profile, track_usage() as usage, request_budget() as budget:
+        plan = dummy_plan(req)
+    body = plan.model_dump_json().encode("utf-8")
+
+    # don't pin a degraded plan (fallbacks used) in the cache for the whole TTL
+    if budget.degraded:
+        entry = CachedResponse(body=body, etag=make_etag(body), expires_at=0.0)
+    else:
+        entry = plan_cache.put(key, body)
+
+    response = _cached_plan_response(entry, request, "BYPASS" if bypass else "MISS")
+    _report_usage(response, usage)
+    if profile is not None:
+        response.headers["X-TripWeaver-Profile-Id"] = profile.id
+    return response
+
+
+@app.post("/plan/sessions", response_model=PlanSessionResponse)
+def create_plan_session(req: TripRequest, response: Response):
+    with track_usage() as usage:
+        session = create_session(req)
+    _report_usage(response, usage)
+    return PlanSessionResponse(
+        plan_id=session.plan_id,
+        plan=session.plan,
+        recomputed_days=[d.day for d in session.plan.days],
+    )
+
+@app.get("/plan/sessions/{plan_id}", response_model=PlanSessionResponse)
+def read_plan_session(plan_id: str):
+    session = get_session(plan_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired plan id")
+    return PlanSessionResponse(plan_id=session.plan_id, plan=session.plan)
+
+@app.patch("/plan/sessions/{plan_id}", response_model=PlanSessionResponse)
+def edit_plan_session(plan_id: str, edit: PlanEdit, response: Response):
+    session = get_session(plan_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired plan id")
+    try:
+        with track_usage() as usage:
+            changed = apply_edit(session, edit)
+    except ValueError as e:
+        # the edit names a day / place / replacement the plan does not have
+        raise HTTPException(status_code=422, detail=str(e))
+    _report_usage(response, usage)
+    return PlanSessionResponse(plan_id=session.plan_id, plan=session.plan, recomputed_days=changed)
+
+
+def require_admin(x_tripweaver_admin_token: str = Header(default="")) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_tripweaver_admin_token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.post("/admin/catalog/delta", response_model=CatalogDeltaResponse, dependencies=[Depends(require_admin)])
+def apply_catalog_delta(delta: CatalogDelta):
+    try:
+        snapshot = get_catalog().apply_delta(
+            delta.upserts,
+            [(d.city_name, d.place_name) for d in delta.deletes],
+        )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # cached /plan bodies may include changed or deleted places
+    plan_cache.clear()
+    print(f"[Catalog] applied delta: {len(delta.upserts)} upserts, {len(delta.deletes)} deletes -> v{snapshot.version}")
+    return CatalogDeltaResponse(version=snapshot.version, pois=len(snapshot))
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def get_profiles():
+    return {"profiles": list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str):
+    folded = read_profile(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Unknown profile id")
+    return PlainTextResponse(folded)
@@ -1,18 +1,26 @@
 # backend/app/optimizer.py
 from __future__ import annotations
-from typing import List
+import os
+from typing import List, Optional
+import numpy as np
+import pandas as pd
 from .schemas import ParsedTripRequest
 from .retrieval import as_records
+from .catalog import normalize_key
+from .distances import EARTH_RADIUS_KM, get_city_matrix
 from math import radians, sin, cos, asin, sqrt
 
+# MMR similarity: places this far apart count as ~37% similar (exp(-1))
+MMR_RADIUS_KM = float(os.getenv("TRIPWEAVER_MMR_RADIUS_KM", "1.0"))
+# weight of "same category" vs. spatial proximity in the MMR similarity
+MMR_CATEGORY_WEIGHT = float(os.getenv("TRIPWEAVER_MMR_CATEGORY_WEIGHT", "0.5"))
+
 def _haversine_km(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    from math import radians, sin, cos, asin, sqrt
+    """Single pair; use distances.haversine_km for arrays."""
     dlat = radians(lat2 - lat1)
     dlon = radians(lon2 - lon1)
     a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
 
 def score_record(rec: dict, prefs: ParsedTripRequest) -> float:
     """
@@ -39,3 +47,247 @@ def select_pois_greedy(pois_df, prefs: ParsedTripRequest, pois_needed: int):
     records = as_records(pois_df)
     scored = sorted(records, key=lambda r: score_record(r, prefs), reverse=True)
     return scored[:pois_needed]
+
+
+def score_array(pois_df: pd.DataFrame, prefs: ParsedTripRequest) -> np.ndarray:
+    """Vectorized score_record over a whole DataFrame."""
+    scores = pd.to_numeric(pois_df["popularity_score"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    wanted = [c.lower() for c in (prefs.categories or [])]
+    if wanted and "place_category" in pois_df.columns:
+        match = pois_df["place_category"].astype(str).str.lower().isin(wanted).to_numpy()
+        scores = scores + 0.2 * match
+    return scores
+
+
+def _top_k(values: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(values):
+        return np.arange(len(values))
+    return np.argpartition(-values, k - 1)[:k]
+
+
+def _fill_budget(s: np.ndarray, p: np.ndarray, chosen: np.ndarray, k: int, max_spend: float) -> np.ndarray:
+    """Greedily add the best-scoring unchosen items that still fit, up to k items."""
+    slots = k - len(chosen)
+    remaining = max_spend - p[chosen].sum()
+    if slots <= 0:
+        return chosen
+    taken = np.zeros(len(s), dtype=bool)
+    taken[chosen] = True
+    order = np.argsort(-s, kind="stable")
+    order = order[~taken[order] & (p[order] <= remaining)]
+    extra = []
+    for i in order:
+        if slots == 0:
+            break
+        if p[i] <= remaining:
+            extra.append(i)
+            remaining -= p[i]
+            slots -= 1
+    if not extra:
+        return chosen
+    return np.concatenate([chosen, np.asarray(extra, dtype=int)])
+
+
+def _improve_by_swaps(s: np.ndarray, p: np.ndarray, chosen: np.ndarray, max_spend: float, max_passes: int) -> np.ndarray:
+    """
+    Local search on a feasible pick: replace one chosen item (1-for-1) or two
+    (2-for-1, frees budget for one better place) by the best unchosen item
+    that still fits, taking the best-gain move per pass. The best incoming
+    item for any price cap comes from a running minimum of price over the
+    unchosen items in score order plus one searchsorted.
+    """
+    chosen = np.asarray(chosen, dtype=int)
+    for _ in range(max_passes):
+        if len(chosen) == 0:
+            break
+        taken = np.zeros(len(s), dtype=bool)
+        taken[chosen] = True
+        order = np.argsort(-s, kind="stable")
+        order = order[~taken[order]]
+        if len(order) == 0:
+            break
+        cheapest_so_far = -np.minimum.accumulate(p[order])  # non-decreasing after negation
+        slack = max_spend - p[chosen].sum()
+
+        def best_incoming(caps):
+            pos = np.searchsorted(cheapest_so_far, -caps, side="left")
+            valid = pos < len(order)
+            return order[np.minimum(pos, len(order) - 1)], valid
+
+        # 1-for-1
+        incoming, valid = best_incoming(slack + p[chosen])
+        gains = np.where(valid, s[incoming] - s[chosen], -np.inf)
+        j = int(np.argmax(gains))
+        best_gain, move = gains[j], ("one", j, incoming[j])
+
+        # 2-for-1 over every pair of chosen items (k is small)
+        if len(chosen) >= 2:
+            a, b = np.triu_indices(len(chosen), 1)
+            incoming, valid = best_incoming(slack + p[chosen[a]] + p[chosen[b]])
+            gains = np.where(valid, s[incoming] - s[chosen[a]] - s[chosen[b]], -np.inf)
+            j = int(np.argmax(gains))
+            if gains[j] > best_gain:
+                best_gain, move = gains[j], ("two", (a[j], b[j]), incoming[j])
+
+        if best_gain <= 1e-12:
+            break
+        kind, out, new = move
+        if kind == "one":
+            chosen = chosen.copy()
+            chosen[out] = new
+        else:
+            chosen = np.append(np.delete(chosen, list(out)), new)
+    return chosen
+
+
+def select_pois_budgeted(
+    pois_df,
+    prefs: ParsedTripRequest,
+    pois_needed: int,
+    max_spend: Optional[float],
+    iterations: int = 40,
+):
+    """
+    Pick up to `pois_needed` POIs maximizing total score with total price <= max_spend.
+
+    Lagrangian relaxation of the spend constraint: for a price multiplier
+    lam the relaxed problem is solved exactly by the top-k of
+    score - lam * price (one argpartition). Binary search finds the smallest
+    lam whose top-k fits the budget; leftover budget and free slots are then
+    filled greedily by score, and a short swap local search recovers most of
+    the relaxation's duality gap. Everything is O(n) NumPy work per iteration.
+    Missing prices count as free. Returns records sorted by score, like
+    select_pois_greedy; with no cap it simply is select_pois_greedy.
+    """
+    if max_spend is None:
+        return select_pois_greedy(pois_df, prefs, pois_needed)
+    if pois_df is None or len(pois_df) == 0 or pois_needed <= 0:
+        return []
+
+    scores = score_array(pois_df, prefs)
+    if "price" in pois_df.columns:
+        prices = pd.to_numeric(pois_df["price"], errors="coerce").fillna(0.0).clip(lower=0.0).to_numpy(dtype=float)
+    else:
+        prices = np.zeros(len(pois_df))
+
+    # nothing priced above the whole budget can ever be picked
+    feasible = np.flatnonzero(prices <= max_spend)
+    if len(feasible) == 0:
+        return []
+    s, p = scores[feasible], prices[feasible]
+    k = min(pois_needed, len(feasible))
+
+    # the unconstrained greedy pick, when it already fits
+    chosen = np.argsort(-s, kind="stable")[:k]
+    if p[chosen].sum() > max_spend:
+        # grow lam until the top-k fits (at worst: the k cheapest), then bisect
+        lo, hi = 0.0, 1.0
+        while p[_top_k(s - hi * p, k)].sum() > max_spend and hi < 1e12:
+            hi *= 4.0
+        best = _top_k(s - hi * p, k)
+        if p[best].sum() > max_spend:
+            best = np.empty(0, dtype=int)  # even the k cheapest don't fit: fill below
+        else:
+            for _ in range(iterations):
+                mid = (lo + hi) / 2.0
+                idx = _top_k(s - mid * p, k)
+                if p[idx].sum() <= max_spend:
+                    best, hi = idx, mid
+                else:
+                    lo = mid
+        chosen = _fill_budget(s, p, best, k, max_spend)
+        for _ in range(3):
+            improved = _fill_budget(s, p, _improve_by_swaps(s, p, chosen, max_spend, max_passes=k), k, max_spend)
+            if s[improved].sum() <= s[chosen].sum() + 1e-12:
+                break
+            chosen = improved
+
+    # score desc, ties in input order (same as the stable sort in select_pois_greedy)
+    chosen = np.sort(chosen)
+    chosen = chosen[np.argsort(-s[chosen], kind="stable")]
+    return as_records(pois_df.iloc[feasible[chosen]])
+
+
+def _coords_rad(pois_df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """lat/lon in radians; NaN where a place has no usable coordinates."""
+    n = len(pois_df)
+    if "lat_float" not in pois_df.columns or "lon_float" not in pois_df.columns:
+        return np.full(n, np.nan), np.full(n, np.nan)
+    lat = pd.to_numeric(pois_df["lat_float"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(pois_df["lon_float"], errors="coerce").to_numpy(dtype=float)
+    return np.radians(lat), np.radians(lon)
+
+
+def select_pois_mmr(
+    pois_df,
+    prefs: ParsedTripRequest,
+    pois_needed: int,
+    diversity: float = 0.3,
+    max_spend: Optional[float] = None,
+    radius_km: float = MMR_RADIUS_KM,
+    category_weight: float = MMR_CATEGORY_WEIGHT,
+    city_key: Optional[str] = None,
+):
+    """
+    Maximal-marginal-relevance selection.
+
+    Each step picks argmax of (1 - diversity) * score - diversity * max_sim,
+    where max_sim[i] is the highest similarity of candidate i to anything
+    already picked. Similarity mixes "same category" with spatial proximity
+    exp(-distance / radius_km). max_sim is kept as one array and updated
+    against only the newly picked place, so a step is O(n) NumPy work.
+
+    diversity=0 is plain score order; with `max_spend`, places that no
+    longer fit the remaining budget are skipped. With `city_key`, distances
+    come from the city's precomputed matrix when one exists (see
+    distances.py): only the new pick's row is read, never an n x n matrix.
+    Returns records in pick order.
+    """
+    if pois_df is None or len(pois_df) == 0 or pois_needed <= 0:
+        return []
+    diversity = min(max(float(diversity), 0.0), 1.0)
+
+    rel = score_array(pois_df, prefs)
+    n = len(rel)
+    if "place_category" in pois_df.columns:
+        cat_codes = pd.factorize(pois_df["place_category"].astype(str).str.lower())[0]
+    else:
+        cat_codes = np.zeros(n, dtype=int)
+    lat, lon = _coords_rad(pois_df)
+    cos_lat = np.cos(lat)
+    matrix = get_city_matrix(city_key) if city_key else None
+    if matrix is not None:
+        idx = np.fromiter((matrix.index.get(normalize_key(p), -1) for p in pois_df["place_name"]), dtype=np.int64, count=n)
+        known = np.flatnonzero(idx >= 0)
+    if max_spend is not None and "price" in pois_df.columns:
+        prices = pd.to_numeric(pois_df["price"], errors="coerce").fillna(0.0).clip(lower=0.0).to_numpy(dtype=float)
+        remaining = float(max_spend)
+    else:
+        prices, remaining = np.zeros(n), np.inf
+
+    max_sim = np.zeros(n)
+    available = prices <= remaining
+    picked = []
+    for _ in range(min(pois_needed, n)):
+        if not available.any():
+            break
+        mmr = (1.0 - diversity) * rel - diversity * max_sim
+        mmr[~available] = -np.inf
+        i = int(np.argmax(mmr))  # first max on ties, i.e. input order
+        picked.append(i)
+        available[i] = False
+        remaining -= prices[i]
+        available &= prices <= remaining
+
+        # similarity of every candidate to the new pick (vectorized haversine,
+        # overwritten from the pick's matrix row for precomputed places)
+        a = (np.sin((lat - lat[i]) / 2.0) ** 2
+             + cos_lat * cos_lat[i] * np.sin((lon - lon[i]) / 2.0) ** 2)
+        dist = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        if matrix is not None and idx[i] >= 0:
+            dist[known] = matrix.km[idx[i], idx[known]]
+        near = np.nan_to_num(np.exp(-dist / radius_km), nan=0.0)
+        sim = category_weight * (cat_codes == cat_codes[i]) + (1.0 - category_weight) * near
+        np.maximum(max_sim, sim, out=max_sim)
+
+    return as_records(pois_df.iloc[picked])
@@ -1,6 +1,8 @@
 # backend/app/parser.py
+import multiprocessing
+import os
 import re
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
 try:
     from .schemas import TripRequest, ParsedTripRequest
@@ -16,16 +18,31 @@ _CATEGORY_ALIASES = {
 }
 
 
+# token -> canonical category, compiled once from _CATEGORY_ALIASES
+# (first category listing a token wins, matching the original scan order)
+_ALIAS_TO_CATEGORY = {}
+for _canon, _aliases in _CATEGORY_ALIASES.items():
+	for _alias in (*_aliases, _canon):
+		_ALIAS_TO_CATEGORY.setdefault(_alias, _canon)
+
+# precompiled once instead of per call; tokens are looked up in the map above
+_TOKEN_RE = re.compile(r"[A-Za-z]+")
+_DAYS_RE = re.compile(r"\b(\d+)\s*(?:days|day|d)\b", re.I)
+_NUMBER_RE = re.compile(r"\b(\d+)\b")
+# catch 'in Paris', 'in New York', 'to Tokyo', 'near Seattle', 'at London'
+_CITY_RE = re.compile(r"\b(in|to|at|near|around|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)")
+
+# below this many queries parse_queries stays in-process
+_PARALLEL_MIN_QUERIES = 20000
+
+
 def _normalize_categories(found: List[str]) -> List[str]:
 	"""Normalize tokens to canonical categories using aliases map."""
 	normalized = []
 	for token in found:
-		t = token.lower()
-		for canon, aliases in _CATEGORY_ALIASES.items():
-			if t in aliases or t == canon:
-				if canon not in normalized:
-					normalized.append(canon)
-				break
+		canon = _ALIAS_TO_CATEGORY.get(token.lower())
+		if canon is not None and canon not in normalized:
+			normalized.append(canon)
 	return normalized
 
 
@@ -43,31 +60,67 @@ def parse_query(query: str) -> ParsedTripRequest:
 
 	Returns: ParsedTripRequest
 	"""
+	q, categories, explicit_categories, city, days = _parse_fields(query)
+	return ParsedTripRequest(query=q, categories=categories, explicit_categories=explicit_categories, city=city, days=days)
+
+
+def parse_queries(
+	queries: Sequence[str],
+	processes: Optional[int] = None,
+	chunksize: int = 2000,
+) -> List[Optional[ParsedTripRequest]]:
+	"""Parse many queries (e.g. logged traffic) with the same rules as parse_query.
+
+	Queries without a detectable city yield None instead of raising. Large
+	batches are spread over a multiprocessing pool; workers return plain
+	tuples and the models are built in the parent process.
+
+	Returns: one entry per input query, in input order
+	"""
+	if processes is None:
+		processes = os.cpu_count() or 1
+
+	if processes <= 1 or len(queries) < _PARALLEL_MIN_QUERIES:
+		fields = map(_parse_fields_or_none, queries)
+	else:
+		with multiprocessing.Pool(processes) as pool:
+			fields = pool.map(_parse_fields_or_none, queries, chunksize=chunksize)
+
+	return [
+		None if f is None else ParsedTripRequest(
+			query=f[0], categories=f[1], explicit_categories=f[2], city=f[3], days=f[4],
+		)
+		for f in fields
+	]
+
+
+def _parse_fields_or_none(query: str) -> Optional[Tuple[str, List[str], bool, str, int]]:
+	try:
+		return _parse_fields(query)
+	except ValueError:
+		return None
+
+
+def _parse_fields(query: str) -> Tuple[str, List[str], bool, str, int]:
+	"""Core of parse_query; returns (query, categories, explicit, city, days)."""
 	q = (query or "").strip()
 
-	# 1) categories: look for any alias tokens
-	tokens = re.findall(r"[A-Za-z]+", q)
-	found = []
-	for tok in tokens:
-		# quick match against alias lists
-		for aliases in _CATEGORY_ALIASES.values():
-			if tok.lower() in aliases:
-				found.append(tok.lower())
-				break
-
-	categories = _normalize_categories(found)
+	# 1) categories: every alias token, in query order, mapped to its category
+	categories = []
+	for tok in _TOKEN_RE.findall(q):
+		canon = _ALIAS_TO_CATEGORY.get(tok.lower())
+		if canon is not None and canon not in categories:
+			categories.append(canon)
+
 	explicit_categories = True
 	if not categories:
 		# No explicit category tokens found. Do NOT default to a category when
 		# we want 'explicit only' filtering — mark as not explicit and leave list empty.
 		explicit_categories = False
-		# however keep backward compatibility: parser can still suggest a default
-		# category for other consumers if desired. For now, return empty list.
-		categories = []
 
 	# 2) days extraction
 	days = 1
-	m = re.search(r"\b(\d+)\s*(?:days|day|d)\b", q, re.I)
+	m = _DAYS_RE.search(q)
 	if m:
 		try:
 			days = max(1, int(m.group(1)))
@@ -75,7 +128,7 @@ def parse_query(query: str) -> ParsedTripRequest:
 			days = 1
 	else:
 		# fallback to any standalone number
-		m2 = re.search(r"\b(\d+)\b", q)
+		m2 = _NUMBER_RE.search(q)
 		if m2:
 			try:
 				days = max(1, int(m2.group(1)))
@@ -84,23 +137,18 @@ def parse_query(query: str) -> ParsedTripRequest:
 
 	# 3) city extraction (REQUIRED)
 	city: Optional[str] = None
-	# catch 'in Paris', 'in New York', 'to Tokyo', 'near Seattle', 'at London'
-	city_match = re.search(r"\b(in|to|at|near|around|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)", q)
-
-						
+	city_match = _CITY_RE.search(q)
 	if city_match:
 		raw_city = city_match.group(2).strip()
-		# remove trailing prepositions if any
-		#raw_city = re.sub(r"\s+(for|on|in|at)$", "", raw_city, flags=re.I).strip()
 		if raw_city:
 			# Title-case city for nicer output
 			city = raw_city.title()
-	
+
 	# Raise error if city was not detected
 	if city is None:
 		raise ValueError(f"No city detected in query: '{q}'. Please specify a city using phrases like 'in <City>', 'to <City>', etc.")
 
-	return ParsedTripRequest(query=q, categories=categories, explicit_categories=explicit_categories, city=city, days=days)
+	return q, categories, explicit_categories, city, days
 
 
 if __name__ == "__main__":
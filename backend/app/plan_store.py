@@ -0,0 +1,116 @@
+# backend/app/plan_store.py
+"""
+On-disk store of precomputed itineraries for the head of the traffic
+distribution (popular city x days x pace x category combinations).
+
+Written by `python -m backend.app.precompute`, read by the planner right
+after parsing. Plans are stored as zlib-compressed TripPlan JSON in a single
+SQLite file keyed on everything the offline pipeline's output depends on.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from .schemas import TripPlan
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "precomputed_plans.sqlite"
+PLAN_STORE_PATH = Path(os.getenv("TRIPWEAVER_PLAN_STORE", str(_DEFAULT_PATH)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    enriched INTEGER NOT NULL,
+    explained INTEGER NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class StoredPlan(NamedTuple):
+    plan: TripPlan
+    enriched: bool  # descriptions were fetched at precompute time
+
+
+def plan_key(
+    city_key: str,
+    days: int,
+    max_per_day: int,
+    categories: Sequence[str],
+    explicit_categories: bool,
+) -> str:
+    """Key of an offline plan; categories only matter when they are explicit."""
+    cats = sorted({c.strip().lower() for c in categories if c and c.strip()}) if explicit_categories else []
+    return json.dumps([city_key, int(days), int(max_per_day), cats], separators=(",", ":"))
+
+
+class PlanStore:
+    def __init__(self, path: Path | str = PLAN_STORE_PATH, readonly: bool = True):
+        self.path = Path(path)
+        self.readonly = readonly
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            else:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path))
+                conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[StoredPlan]:
+        row = self._conn().execute("SELECT body, enriched FROM plans WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return StoredPlan(TripPlan.model_validate_json(zlib.decompress(row[0])), bool(row[1]))
+
+    def put_many(self, items: Iterable[tuple[str, TripPlan, bool, bool]]) -> int:
+        """Insert/replace (key, plan, enriched, explained) rows; returns the row count."""
+        now = time.time()
+        rows = [
+            (key, zlib.compress(plan.model_dump_json(exclude_none=True).encode("utf-8"), 9), int(enriched), int(explained), now)
+            for key, plan, enriched, explained in items
+        ]
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+
+_STORE: Optional[PlanStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_plan_store() -> Optional[PlanStore]:
+    """The read-only store, or None if no precomputed file exists."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None and PLAN_STORE_PATH.exists():
+                _STORE = PlanStore(PLAN_STORE_PATH)
+    return _STORE
+
+
+def lookup_plan(key: str) -> Optional[StoredPlan]:
+    store = get_plan_store()
+    if store is None:
+        return None
+    try:
+        return store.get(key)
+    except sqlite3.Error as e:
+        print(f"[Plan store] lookup failed: {e}")
+        return None
@@ -1,9 +1,8 @@
 # backend/app/planner.py
 from .schemas import TripRequest, TripPlan, DayPlan, Place, ParsedTripRequest
 from .parser import parse_query
-from .optimizer import select_pois_greedy
+from .optimizer import select_pois_budgeted, select_pois_mmr
 from .retrieval import (
-    load_pois,
     filter_pois_by_category,
     top_popular_pois,
     as_records,
@@ -12,9 +11,28 @@ from .google_places import search_places
 from .wikipedia import get_poi_summary
 from .llm_parser import llm_parse_to_parsed_trip_request
 from .llm_explainer import build_itinerary_explanation
+from .resilience import mark_degraded, request_budget, stage
+from .plan_store import lookup_plan, plan_key
+from .catalog import get_catalog
+
+import os
+import time
 
 import pandas as pd
 
+# per-day entry-price caps for parsed budget levels ("high" is uncapped)
+BUDGET_PER_DAY = {
+    "low": float(os.getenv("TRIPWEAVER_BUDGET_LOW_PER_DAY", "30")),
+    "medium": float(os.getenv("TRIPWEAVER_BUDGET_MEDIUM_PER_DAY", "100")),
+}
+# default relevance/diversity trade-off when a request sets none (0 = plain score order)
+DEFAULT_DIVERSITY = float(os.getenv("TRIPWEAVER_DIVERSITY", "0"))
+# with a spend cap or diversity, the offline pool is widened so cheaper or
+# less popular places get a chance
+CANDIDATE_POOL_FACTOR = int(os.getenv("TRIPWEAVER_CANDIDATE_POOL_FACTOR", "10"))
+# Google Places results stored in the catalog are served without an API call for this long
+GOOGLE_FRESH_S = float(os.getenv("TRIPWEAVER_GOOGLE_FRESH_S", str(7 * 24 * 3600)))
+
 
 def dummy_plan(req: TripRequest) -> TripPlan:
     """
@@ -23,16 +41,124 @@ def dummy_plan(req: TripRequest) -> TripPlan:
     2) choose data source (offline CSV or Google Places)
     3) run greedy optimizer to select POIs
     4) distribute POIs across days
+
+    External calls share one latency budget (see resilience.py); a stage
+    that runs out of time or hits an open circuit uses its fallback.
     """
+    with request_budget():
+        return _run_pipeline(req)
+
+
+def _run_pipeline(req: TripRequest) -> TripPlan:
     # 1) parse user query (heuristic)
     base_parsed = parse_query(req.query)
 
     # 1.1 optional: refine with LLM parser (fallback-safe)
-    parsed = llm_parse_to_parsed_trip_request(req.query, base_parsed)
+    with stage("parse"):
+        parsed = llm_parse_to_parsed_trip_request(req.query, base_parsed)
+
+    # 1.2 head queries: serve a precomputed itinerary if one exists
+    plan = _precomputed_plan(req, parsed)
+    if plan is None:
+        plan = _plan_from_parsed(req, parsed)
+        if plan is None:
+            return TripPlan(city=parsed.city, days=[])
 
+    # Optional: LLM explanation layer (safe fallback)
+    if plan.explanation is None:
+        try:
+            with stage("explain"):
+                plan.explanation = build_itinerary_explanation(req, parsed, plan)
+        except Exception as e:
+            mark_degraded(e)
+            print(f"[LLM explainer] Failed to generate explanation: {e}")
+
+    return plan
+
+
+def _plan_from_parsed(req: TripRequest, parsed: ParsedTripRequest, enrich: bool = True) -> TripPlan | None:
+    """
+    Retrieval, selection, enrichment and day distribution for a parsed request.
+
+    Returns None when the data source has no POIs for the city.
+    """
     # keep original days logic
     days_requested = parsed.days or 1
+    max_per_day = _max_places_per_day(req)
+
+    # total POIs we want
+    pois_needed = days_requested * max_per_day
+
+    # 2) choose data source
+    with stage("retrieval"):
+        pois_df = _load_candidates(req, parsed, pois_needed)
+
+    # 3) check if there are any POIs
+    if pois_df is None or len(pois_df) == 0:
+        return None
+
+    # 4) selection (greedy, budget-constrained and/or diversity-aware)
+    max_spend = _spend_cap(req, parsed)
+    day_cap = _day_spend_cap(req, parsed)
+    diversity = _diversity(req)
+    records = _assign_days(
+        _select_records(pois_df, parsed, pois_needed, max_spend, diversity, day_cap), days_requested, day_cap
+    )
 
+    # enrich with Wikipedia description
+    places = _enrich_records(records) if enrich else _bare_places(records)
+
+    if len(places) == 0:
+        # offline fallback: if no places after greedy selection, use offline dataset
+        all_pois_for_city = _pois_from_offline(parsed, pois_needed)
+        fallback_records = _assign_days(
+            _select_records(all_pois_for_city, parsed, pois_needed, max_spend, diversity, day_cap),
+            days_requested,
+            day_cap,
+        )
+        places = _enrich_records(fallback_records) if enrich else _bare_places(fallback_records)
+
+    # 5) distribute across days
+    day_plans = _distribute_places(places, days_requested)
+
+    return TripPlan(city=parsed.city, days=day_plans)
+
+
+def _precomputed_plan(req: TripRequest, parsed: ParsedTripRequest) -> TripPlan | None:
+    """Look the request up in the precomputed store (offline data source only)."""
+    if getattr(req, "data_source", "offline").lower() == "google":
+        return None
+    # the store is keyed without spend caps or diversity
+    if _spend_cap(req, parsed) is not None or _diversity(req) > 0:
+        return None
+    # precomputed plans were built from the base dataset, not from later deltas
+    if get_catalog().snapshot().is_changed(_city_key(parsed.city)):
+        return None
+
+    key = plan_key(
+        _city_key(parsed.city),
+        parsed.days or 1,
+        _max_places_per_day(req),
+        parsed.categories or [],
+        getattr(parsed, "explicit_categories", False),
+    )
+    stored = lookup_plan(key)
+    if stored is None:
+        return None
+
+    plan = stored.plan.model_copy(update={"city": parsed.city})
+    if not stored.enriched:
+        records = [
+            {"place_name": p.name, "place_category": p.category}
+            for d in plan.days for p in d.places
+        ]
+        places = iter(_enrich_records(records))
+        plan.days = [d.model_copy(update={"places": [next(places) for _ in d.places]}) for d in plan.days]
+    return plan
+
+
+def _max_places_per_day(req: TripRequest) -> int:
+    """Resolve the per-day POI cap from explicit `max_places_per_day` or `pace`."""
     pace_raw = getattr(req, "pace", None) or ""
     pace = pace_raw.strip().lower()
 
@@ -56,116 +182,227 @@ def dummy_plan(req: TripRequest) -> TripPlan:
     if max_per_day is None or max_per_day <= 0:
         max_per_day = default_max_per_day
 
-    # total POIs we want
-    pois_needed = days_requested * max_per_day
+    return max_per_day
 
-    # 2) choose data source
+
+def _spend_cap(req: TripRequest, parsed: ParsedTripRequest) -> float | None:
+    """
+    Total entry-price cap for the trip, or None when uncapped.
+
+    Explicit `max_spend_total` / `max_spend_per_day` win (the tighter one if
+    both are set); otherwise the budget level from the request or the parsed
+    query maps to BUDGET_PER_DAY. A per-day cap also bounds the trip total
+    (cap x days); `_assign_days` then enforces it day by day.
+    """
+    days = parsed.days or 1
+    caps = []
+    if getattr(req, "max_spend_total", None) is not None:
+        caps.append(float(req.max_spend_total))
+    if getattr(req, "max_spend_per_day", None) is not None:
+        caps.append(float(req.max_spend_per_day) * days)
+    if not caps:
+        level = (getattr(req, "budget", None) or getattr(parsed, "budget", None) or "").strip().lower()
+        if level in BUDGET_PER_DAY:
+            caps.append(BUDGET_PER_DAY[level] * days)
+    return min(caps) if caps else None
+
+
+def _day_spend_cap(req: TripRequest, parsed: ParsedTripRequest) -> float | None:
+    """
+    Entry-price cap for a single day, or None: `max_spend_per_day`, else the
+    budget level's BUDGET_PER_DAY unless an explicit `max_spend_total` is set.
+    """
+    if getattr(req, "max_spend_per_day", None) is not None:
+        return float(req.max_spend_per_day)
+    if getattr(req, "max_spend_total", None) is not None:
+        return None
+    level = (getattr(req, "budget", None) or getattr(parsed, "budget", None) or "").strip().lower()
+    return BUDGET_PER_DAY.get(level)
+
+
+def _diversity(req: TripRequest) -> float:
+    """MMR trade-off in [0, 1] from the request, else TRIPWEAVER_DIVERSITY."""
+    value = getattr(req, "diversity", None)
+    if value is None:
+        value = DEFAULT_DIVERSITY
+    return min(max(float(value), 0.0), 1.0)
+
+
+def _load_candidates(req: TripRequest, parsed: ParsedTripRequest, pois_needed: int) -> pd.DataFrame:
+    """Fetch the candidate pool from the requested data source."""
     data_source = getattr(req, "data_source", "offline").lower()
     if data_source == "google":
-        pois_df = _pois_from_google(parsed, pois_needed)
+        return _pois_from_google(parsed, pois_needed)
+    widen = _spend_cap(req, parsed) is not None or _diversity(req) > 0
+    top_k = pois_needed * CANDIDATE_POOL_FACTOR if widen else None
+    return _pois_from_offline(parsed, pois_needed, top_k=top_k)
+
+
+def _select_records(
+    pois_df: pd.DataFrame,
+    parsed: ParsedTripRequest,
+    pois_needed: int,
+    max_spend: float | None = None,
+    diversity: float = 0.0,
+    day_cap: float | None = None,
+) -> list[dict]:
+    """Run the optimizer and hard-cap the result at `pois_needed`."""
+    if day_cap is not None and "price" in pois_df.columns:
+        # a place dearer than a whole day's cap could never be scheduled
+        prices = pd.to_numeric(pois_df["price"], errors="coerce").fillna(0.0)
+        pois_df = pois_df[prices <= day_cap]
+    if diversity > 0:
+        city_key = _city_key(parsed.city) if parsed.city else None
+        records = select_pois_mmr(pois_df, parsed, pois_needed, diversity, max_spend=max_spend, city_key=city_key)
     else:
-        pois_df = _pois_from_offline(parsed, pois_needed)
+        records = select_pois_budgeted(pois_df, parsed, pois_needed, max_spend)
 
-    # 3) check if there are any POIs
-    if pois_df is None or len(pois_df) == 0:
-        return TripPlan(city=parsed.city, days=[])
+    # Hard cap: don't exceed days * max_per_day, even if optimizer returns more
+    if pois_needed > 0 and len(records) > pois_needed:
+        records = records[:pois_needed]
+    return records
 
-    # 4) greedy selection
-    records = select_pois_greedy(pois_df, parsed, pois_needed)
 
-    # Hard cap: don't exceed days * max_per_day, even if optimizer returns more
-    max_total = days_requested * max_per_day
-    if max_total > 0 and len(records) > max_total:
-        records = records[:max_total]
+def _enrich_records(records: list[dict], descriptions: dict | None = None) -> list[Place]:
+    """
+    Turn optimizer records into Places with a Wikipedia description.
 
-    # enrich with Wikipedia description
-    places = []
-    for r in records:
-        wiki_text = get_poi_summary(r["place_name"], sentences=2)
-        places.append(Place(
-            name=r["place_name"],
-            category=r["place_category"],
-            description=wiki_text,
-        ))
+    `descriptions` is an optional name -> summary memo; names already present
+    are not looked up again and new lookups are written back into it.
+    """
+    with stage("enrich"):
+        places = [_enrich_record(r, descriptions) for r in records]
+    return places
 
-    # 5) distribute across days
+
+def _enrich_record(r: dict, descriptions: dict | None) -> Place:
+    name = r["place_name"]
+    if descriptions is not None and name in descriptions:
+        wiki_text = descriptions[name]
+    else:
+        wiki_text = get_poi_summary(name, sentences=2)
+        if descriptions is not None:
+            descriptions[name] = wiki_text
+    return Place(
+        name=name,
+        category=r["place_category"],
+        description=wiki_text,
+    )
+
+
+def _bare_places(records: list[dict]) -> list[Place]:
+    """Places without a Wikipedia lookup (precompute runs with enrichment off)."""
+    return [Place(name=r["place_name"], category=r["place_category"]) for r in records]
+
+
+def _price(record: dict) -> float:
+    price = pd.to_numeric(record.get("price"), errors="coerce")
+    return 0.0 if pd.isna(price) else max(0.0, float(price))
+
+
+def _assign_days(records: list[dict], days: int, day_cap: float | None) -> list[dict]:
+    """
+    Reorder selected records so every day (as cut by `_day_sizes`) stays
+    within `day_cap`; places that fit on no day are dropped.
+
+    First-fit decreasing by price onto the day with the most budget left;
+    within a day the selection order is kept. Without a cap the records are
+    returned as they are.
+    """
+    if day_cap is None:
+        return records
+    records = list(records)
+    while records:
+        sizes = _day_sizes(len(records), days)
+        buckets: list[list[int]] = [[] for _ in sizes]
+        left = [day_cap] * len(sizes)
+        misfit = None
+        for i in sorted(range(len(records)), key=lambda i: -_price(records[i])):
+            open_days = [d for d in range(len(sizes)) if len(buckets[d]) < sizes[d]]
+            day = max(open_days, key=lambda d: left[d])
+            if _price(records[i]) > left[day]:
+                misfit = i
+                break
+            buckets[day].append(i)
+            left[day] -= _price(records[i])
+        if misfit is None:
+            return [records[i] for bucket in buckets for i in sorted(bucket)]
+        del records[misfit]
+    return records
+
+
+def _day_sizes(n_places: int, days: int) -> list[int]:
+    """Number of places per day when spreading `n_places` evenly over `days`."""
+    days_to_return = days or 1
+    per_day_base = n_places // days_to_return
+    remainder = n_places % days_to_return
+    return [per_day_base + (1 if day_num <= remainder else 0) for day_num in range(1, days_to_return + 1)]
+
+
+def _distribute_places(places: list[Place], days: int) -> list[DayPlan]:
+    """Spread places evenly across days, earlier days taking the remainder."""
     day_plans: list[DayPlan] = []
 
-    if len(places) == 0:
-        # offline fallback: if no places after greedy selection, use offline dataset
-        all_pois_for_city = _pois_from_offline(parsed, pois_needed)
-        fallback_records = select_pois_greedy(all_pois_for_city, parsed, pois_needed)
-
-        # apply the same hard cap in fallback
-        if max_total > 0 and len(fallback_records) > max_total:
-            fallback_records = fallback_records[:max_total]
-
-        places = []
-        for r in fallback_records:
-            wiki_text = get_poi_summary(r["place_name"], sentences=2)
-            places.append(Place(
-                name=r["place_name"],
-                category=r["place_category"],
-                description=wiki_text,
-            ))
-
-    # average distribution logic (unchanged)
-    days_to_return = days_requested or 1
-    per_day_base = len(places) // days_to_return
-    remainder = len(places) % days_to_return
     idx = 0
-    for day_num in range(1, days_to_return + 1):
-        take = per_day_base + (1 if day_num <= remainder else 0)
+    for day_num, take in enumerate(_day_sizes(len(places), days), start=1):
         day_places = places[idx: idx + take]
         idx += take
         day_plans.append(DayPlan(day=day_num, places=day_places))
+    return day_plans
 
-    # Build base TripPlan
-    plan = TripPlan(city=parsed.city, days=day_plans)
-
-    # Optional: LLM explanation layer (safe fallback)
-    try:
-        plan.explanation = build_itinerary_explanation(req, parsed, plan)
-    except Exception as e:
-        print(f"[LLM explainer] Failed to generate explanation: {e}")
-
-    return plan
 
+def _city_key(city: str) -> str:
+    """Normalize a city name to the dataset's `city_name` convention."""
+    city = city.lower()
+    if city in {"new york", "nyc", "new york city"}:
+        return "newyork"
+    return city.strip().lower()
 
-def _pois_from_offline(parsed: ParsedTripRequest, pois_needed: int) -> pd.DataFrame:
-    """Use our offline CSV dataset to retrieve POIs for a city."""
-    city = parsed.city.lower()
 
-    # normalize city name
-    if city in {"new york", "nyc", "new york city"}:
-        city_key = "newyork"
-    else:
-        city_key = city.strip().lower()
+def _pois_from_offline(parsed: ParsedTripRequest, pois_needed: int, top_k: int | None = None) -> pd.DataFrame:
+    """Use our offline POI catalog to retrieve POIs for a city (top_k defaults to 2x what is needed)."""
+    city_key = _city_key(parsed.city)
+    if top_k is None:
+        top_k = pois_needed * 2
 
-    pois_df = load_pois()
-    pois_for_city = pois_df[pois_df["city_name"].str.lower().str.contains(city_key, na=False)]
+    pois_for_city = get_catalog().snapshot().city_pois(city_key)
 
     explicit = getattr(parsed, "explicit_categories", False)
     categories = [c.lower() for c in (parsed.categories or [])]
 
     if explicit and categories:
-        filtered_df = filter_pois_by_category(pois_for_city, categories, top_k=pois_needed * 2)
+        filtered_df = filter_pois_by_category(pois_for_city, categories, top_k=top_k)
     else:
-        filtered_df = top_popular_pois(pois_for_city, top_k=pois_needed * 2)
+        filtered_df = top_popular_pois(pois_for_city, top_k=top_k)
 
     return filtered_df
 
 
 def _pois_from_google(parsed: ParsedTripRequest, pois_needed: int) -> pd.DataFrame:
-    """Use Google Places API to retrieve POIs for a city."""
+    """
+    Google Places POIs for a city: from the catalog when earlier results are
+    fresh and plentiful enough, else from the live API (written through).
+    """
     city = parsed.city
+    city_key = _city_key(city)
+
+    stored = _stored_google_pois(city_key, parsed, pois_needed)
+    if stored is not None:
+        return stored
 
     if parsed.categories:
         search_query = " ".join(parsed.categories)
     else:
         search_query = "tourist attractions"
 
-    raw_pois = search_places(search_query, city)
+    try:
+        raw_pois = search_places(search_query, city)
+    except Exception as e:
+        # missing key, timeout or open circuit: serve the offline dataset instead
+        mark_degraded(e)
+        print(f"[Google Places] Falling back to offline dataset due to error: {e}")
+        return _pois_from_offline(parsed, pois_needed)
+
     if not raw_pois:
         return pd.DataFrame(columns=[
             "city_name", "place_name", "country", "place_category",
@@ -173,5 +410,28 @@ def _pois_from_google(parsed: ParsedTripRequest, pois_needed: int) -> pd.DataFra
             "lat", "lon"
         ])
 
-    df = pd.DataFrame(raw_pois)
-    return df
+    try:
+        return get_catalog().record_google_results(city_key, raw_pois)
+    except Exception as e:
+        mark_degraded()
+        print(f"[Google Places] Could not store results in the catalog: {e}")
+        return pd.DataFrame(raw_pois)
+
+
+def _stored_google_pois(city_key: str, parsed: ParsedTripRequest, pois_needed: int) -> pd.DataFrame | None:
+    """
+    Catalog rows Google returned for the city recently (its own places and
+    dataset places it matched), or None when stale / too few.
+    """
+    rows = get_catalog().snapshot().city_pois(city_key)
+    if rows.empty or "google_seen_at" not in rows.columns:
+        return None
+    fresh = rows[pd.to_numeric(rows["google_seen_at"], errors="coerce") >= time.time() - GOOGLE_FRESH_S]
+
+    categories = [c.lower() for c in (parsed.categories or [])]
+    if getattr(parsed, "explicit_categories", False) and categories:
+        fresh = fresh[fresh["place_category"].astype(str).str.lower().isin(categories)]
+
+    if len(fresh) < max(1, pois_needed):
+        return None
+    return fresh.sort_values("popularity_score", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,163 @@
+# backend/app/precompute.py
+"""
+Offline job: precompute itineraries for popular (city, days, pace, categories)
+combinations and write them to the plan store the planner checks first.
+
+Usage (from the project root):
+    python -m backend.app.precompute --days 1-5 --workers 4
+    python -m backend.app.precompute --cities paris newyork --with-wiki --with-llm
+
+Wikipedia enrichment and LLM explanations are off by default, so the job
+needs no network; plans stored without them get descriptions / explanations
+added live when served.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from .schemas import TripRequest, TripPlan, ParsedTripRequest
+from .catalog import get_catalog
+from .planner import _max_places_per_day, _plan_from_parsed
+from .llm_explainer import build_itinerary_explanation
+from .llm_dispatcher import batch_traffic
+from .plan_store import PLAN_STORE_PATH, PlanStore, plan_key
+
+DEFAULT_PACES = ["relaxed", "standard", "packed"]
+DEFAULT_CATEGORY_SETS: List[Tuple[str, ...]] = [
+    (),
+    ("park",),
+    ("landmark",),
+    ("museum",),
+    ("food",),
+    ("museum", "park"),
+    ("food", "landmark"),
+]
+
+
+def iter_combinations(
+    cities: Sequence[str],
+    days: Sequence[int],
+    paces: Sequence[str],
+    category_sets: Sequence[Tuple[str, ...]],
+) -> Iterator[Tuple[str, int, str, Tuple[str, ...]]]:
+    yield from product(cities, days, paces, category_sets)
+
+
+def plan_combination(
+    city: str,
+    days: int,
+    pace: str,
+    categories: Tuple[str, ...],
+    with_wiki: bool = False,
+    with_llm: bool = False,
+) -> Tuple[str, Optional[TripPlan]]:
+    """Run the offline pipeline (minus parsing) for one combination."""
+    req = TripRequest(
+        query=f"{days} days in {city} " + " ".join(categories),
+        data_source="offline",
+        pace=pace,
+    )
+    parsed = ParsedTripRequest(
+        query=req.query,
+        categories=list(categories),
+        explicit_categories=bool(categories),
+        city=city,
+        days=days,
+    )
+    key = plan_key(city, days, _max_places_per_day(req), parsed.categories, parsed.explicit_categories)
+
+    plan = _plan_from_parsed(req, parsed, enrich=with_wiki)
+    if plan is not None and with_llm:
+        try:
+            # yield the LLM quota to live traffic
+            with batch_traffic():
+                plan.explanation = build_itinerary_explanation(req, parsed, plan)
+        except Exception as e:
+            print(f"[Precompute] explanation failed for {key}: {e}")
+    return key, plan
+
+
+def run(
+    out: Path = PLAN_STORE_PATH,
+    cities: Optional[Sequence[str]] = None,
+    days: Sequence[int] = range(1, 6),
+    paces: Sequence[str] = DEFAULT_PACES,
+    category_sets: Sequence[Tuple[str, ...]] = DEFAULT_CATEGORY_SETS,
+    workers: int = 4,
+    with_wiki: bool = False,
+    with_llm: bool = False,
+) -> int:
+    """Precompute every combination with at most `workers` in flight; returns plans written."""
+    if cities is None:
+        cities = sorted(get_catalog().snapshot().partitions)
+
+    combos = list(iter_combinations(cities, days, paces, category_sets))
+    # several paces share a max_per_day, so keys repeat; plan each key once
+    seen = set()
+    unique = []
+    for city, d, pace, cats in combos:
+        req = TripRequest(query="", pace=pace)
+        key = plan_key(city, d, _max_places_per_day(req), cats, bool(cats))
+        if key not in seen:
+            seen.add(key)
+            unique.append((city, d, pace, cats))
+
+    print(f"[Precompute] {len(unique)} combinations for {len(cities)} cities, {workers} workers")
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(
+            lambda c: plan_combination(*c, with_wiki=with_wiki, with_llm=with_llm),
+            unique,
+        ))
+
+    rows = [(key, plan, with_wiki, plan.explanation is not None) for key, plan in results if plan is not None]
+    written = PlanStore(out, readonly=False).put_many(rows)
+    print(f"[Precompute] wrote {written} plans to {out} in {time.time() - started:.1f}s")
+    return written
+
+
+def _parse_days(spec: str) -> List[int]:
+    if "-" in spec:
+        lo, hi = spec.split("-", 1)
+        return list(range(int(lo), int(hi) + 1))
+    return [int(x) for x in spec.split(",")]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Precompute itineraries for popular combinations.")
+    ap.add_argument("--out", type=Path, default=PLAN_STORE_PATH)
+    ap.add_argument("--cities", nargs="*", help="dataset city_name values (default: all)")
+    ap.add_argument("--days", default="1-5", help="e.g. 1-5 or 1,2,3")
+    ap.add_argument("--paces", default=",".join(DEFAULT_PACES))
+    ap.add_argument(
+        "--categories", nargs="*",
+        help="comma-separated category sets, '' for none (default: a built-in handful)",
+    )
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--with-wiki", action="store_true", help="fetch Wikipedia descriptions")
+    ap.add_argument("--with-llm", action="store_true", help="generate LLM explanations")
+    args = ap.parse_args(argv)
+
+    category_sets = DEFAULT_CATEGORY_SETS
+    if args.categories is not None:
+        category_sets = [tuple(c for c in spec.split(",") if c) for spec in args.categories]
+
+    run(
+        out=args.out,
+        cities=[c.lower() for c in args.cities] if args.cities else None,
+        days=_parse_days(args.days),
+        paces=[p.strip() for p in args.paces.split(",") if p.strip()],
+        category_sets=category_sets,
+        workers=args.workers,
+        with_wiki=args.with_wiki,
+        with_llm=args.with_llm,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# backend/app/profiling.py
+"""
+Opt-in sampling profiler for planner requests.
+
+A profiled request (header `X-TripWeaver-Profile: 1`, or a random
+TRIPWEAVER_PROFILE_SAMPLE_RATE fraction of traffic) gets a background thread
+that samples the request thread's stack every TRIPWEAVER_PROFILE_INTERVAL_S
+via sys._current_frames(). Each sample is attributed to one category
+(retrieval, pandas, optimizer, enrichment, llm, other) by the innermost frame
+that matches a rule below, and the category becomes the root frame of the
+folded stack, so flamegraph.pl / speedscope group by it.
+
+Per profile two files are written to TRIPWEAVER_PROFILE_DIR:
+    <id>.folded  "frame;frame;... count" lines (flamegraph-compatible)
+    <id>.json    metadata and per-category sample counts
+Only the newest TRIPWEAVER_PROFILE_KEEP profiles are kept.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_DEFAULT_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "profiles"
+PROFILE_DIR = Path(os.getenv("TRIPWEAVER_PROFILE_DIR", str(_DEFAULT_DIR)))
+PROFILE_SAMPLE_RATE = float(os.getenv("TRIPWEAVER_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_S = float(os.getenv("TRIPWEAVER_PROFILE_INTERVAL_S", "0.005"))
+PROFILE_KEEP = int(os.getenv("TRIPWEAVER_PROFILE_KEEP", "50"))
+
+PROFILE_HEADER = "x-tripweaver-profile"
+_APP_DIR = "backend/app/"
+_PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+# (path fragment, function or None) -> category; checked per frame
+# from the innermost frame outwards, the first hit wins
+_CATEGORY_RULES: List[Tuple[str, Optional[str], str]] = [
+    ("/pandas/", None, "pandas"),
+    ("backend/app/llm_", None, "llm"),
+    ("/openai/", None, "llm"),
+    ("backend/app/optimizer.py", None, "optimizer"),
+    ("backend/app/wikipedia.py", None, "enrichment"),
+    ("backend/app/wiki_index.py", None, "enrichment"),
+    ("backend/app/planner.py", "_enrich_records", "enrichment"),
+    ("backend/app/planner.py", "_enrich_record", "enrichment"),
+    ("backend/app/google_places.py", None, "retrieval"),
+    ("backend/app/catalog.py", None, "retrieval"),
+    ("backend/app/retrieval.py", None, "retrieval"),
+    ("backend/app/planner.py", "_load_candidates", "retrieval"),
+    ("backend/app/planner.py", "_precomputed_plan", "retrieval"),
+    ("backend/app/planner.py", "_select_records", "optimizer"),
+]
+
+
+def categorize(frames: List[Tuple[str, str]]) -> str:
+    """Category of one sample; `frames` are (filename, function), innermost first."""
+    for filename, function in frames:
+        filename = filename.replace(os.sep, "/")
+        for fragment, func, category in _CATEGORY_RULES:
+            if fragment in filename and (func is None or func == function):
+                return category
+    return "other"
+
+
+def _frame_label(filename: str, function: str) -> str:
+    return f"{Path(filename).stem}.{function}"
+
+
+class Profile:
+    def __init__(self, label: str, interval_s: float = PROFILE_INTERVAL_S):
+        self.id = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.label = label
+        self.interval_s = interval_s
+        self.started_at = time.time()
+        self.duration_s = 0.0
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="tripweaver-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.duration_s = time.time() - self.started_at
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self._thread_id)
+            frames = []
+            while frame is not None:
+                frames.append((frame.f_code.co_filename, frame.f_code.co_name))
+                frame = frame.f_back
+            if not frames:
+                continue
+            category = categorize(frames)
+            outer_to_inner = list(reversed(frames))
+            # drop server / event-loop frames above our own code
+            for i, (filename, _) in enumerate(outer_to_inner):
+                if _APP_DIR in filename.replace(os.sep, "/"):
+                    outer_to_inner = outer_to_inner[i:]
+                    break
+            stack = ";".join([category] + [_frame_label(f, fn) for f, fn in outer_to_inner])
+            self.stacks[stack] += 1
+            self.categories[category] += 1
+
+    def meta(self) -> Dict[str, object]:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "started_at": self.started_at,
+            "duration_s": round(self.duration_s, 4),
+            "interval_s": self.interval_s,
+            "samples": sum(self.stacks.values()),
+            "by_category": dict(self.categories.most_common()),
+        }
+
+    def save(self, directory: Optional[Path] = None) -> None:
+        directory = directory or PROFILE_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        folded = "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        (directory / f"{self.id}.folded").write_text(folded, encoding="utf-8")
+        (directory / f"{self.id}.json").write_text(json.dumps(self.meta()), encoding="utf-8")
+        _prune(directory)
+
+
+def _prune(directory: Path) -> None:
+    metas = sorted(directory.glob("*.json"), key=lambda p: p.name, reverse=True)
+    for old in metas[PROFILE_KEEP:]:
+        for path in (old, old.with_suffix(".folded")):
+            path.unlink(missing_ok=True)
+
+
+def should_profile(headers: Dict[str, str]) -> bool:
+    value = headers.get(PROFILE_HEADER, "").strip().lower()
+    if value in {"1", "true", "yes", "on"}:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def profile_request(enabled: bool, label: str = "") -> Iterator[Optional[Profile]]:
+    """Profile the block on the current thread when `enabled`; yields the Profile or None."""
+    if not enabled:
+        yield None
+        return
+    profile = Profile(label)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        try:
+            profile.save()
+        except OSError as e:
+            print(f"[Profiling] failed to save profile {profile.id}: {e}")
+
+
+def list_profiles(directory: Optional[Path] = None) -> List[Dict[str, object]]:
+    """Metadata of saved profiles, newest first."""
+    directory = directory or PROFILE_DIR
+    if not directory.exists():
+        return []
+    out = []
+    for path in sorted(directory.glob("*.json"), key=lambda p: p.name, reverse=True):
+        try:
+            out.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def read_profile(profile_id: str, directory: Optional[Path] = None) -> Optional[str]:
+    """Folded stacks of one profile, or None (also for ids that are not ours)."""
+    directory = directory or PROFILE_DIR
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = directory / f"{profile_id}.folded"
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8")
@@ -0,0 +1,242 @@
+# backend/app/prompts.py
+"""
+Prompt construction and token accounting for the LLM layers.
+
+Static instructions are module constants sent first (as the system message),
+so every call of a given kind starts with an identical prefix that
+provider-side prompt caching can reuse; only the request-specific part at the
+end changes. Plans are serialized compactly: abbreviated keys, no null
+fields, no whitespace, and Wikipedia text clipped to PROMPT_WIKI_CHARS.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character-based estimate
+    tiktoken = None
+
+from .schemas import DayPlan, Place, TripPlan, TripRequest, ParsedTripRequest
+
+# max characters of Wikipedia description per place included in a prompt
+PROMPT_WIKI_CHARS = int(os.getenv("TRIPWEAVER_PROMPT_WIKI_CHARS", "240"))
+
+SYSTEM_PROMPT = "You are TripWeaver, a helpful trip-planning assistant."
+
+PLAN_KEY_LEGEND = (
+    'Itineraries are given as compact JSON: {"c": city, "d": [{"n": day number, '
+    '"p": [{"n": place name, "k": category, "w": short Wikipedia note}]}]}. '
+    'A place without "w" has no note.'
+)
+
+EXPLAIN_INSTRUCTIONS = f"""{SYSTEM_PROMPT}
+
+{PLAN_KEY_LEGEND}
+
+Write a friendly, concise explanation of the itinerary for the user.
+
+Requirements:
+- 1 short paragraph of overall summary.
+- Then for each day, provide a complete and detailed paragraph that:
+  * MUST include and mention EVERY single POI/attraction listed for that day in the itinerary,
+  * explains the full day's plan in chronological order (morning to evening),
+  * describes the rough pace (busy vs relaxed) and timing considerations,
+  * explains why these places make sense together geographically and thematically,
+  * details any notable transitions between spots (e.g., walking distance, transportation needed),
+  * includes practical information like suggested visit duration for each major attraction.
+- If helpful, mention:
+  * alternative POIs the user could swap in,
+  * simple food ideas (e.g., "look for local bakeries near Central Park"),
+  * important tips (crowds, opening hours, weather considerations).
+
+Output format:
+- Plain text in English.
+- No JSON, no markdown, no bullet points. Just paragraphs.
+- Use double line breaks (blank line) to separate paragraphs:
+  * First paragraph: overall summary
+  * Then one paragraph per day (Day 1, Day 2, etc.)
+- Each day paragraph should start with "Day X:" or "Day X -" for clarity.
+- Ensure no POI from the itinerary is omitted - every attraction must be mentioned in the explanation."""
+
+DAY_INSTRUCTIONS = f"""{SYSTEM_PROMPT}
+
+{PLAN_KEY_LEGEND}
+
+You will get the trip context and ONE day of the itinerary. Write ONE complete
+and detailed paragraph for that day that:
+- MUST mention EVERY place listed for the day,
+- explains the day's plan in chronological order (morning to evening),
+- describes the rough pace and timing considerations,
+- explains why these places make sense together geographically and thematically,
+- includes a suggested visit duration for each major attraction.
+
+Output format: plain text in English, a single paragraph, no JSON, no markdown,
+no bullet points. Start the paragraph with "Day X:" where X is the day number."""
+
+SUMMARY_INSTRUCTIONS = f"""{SYSTEM_PROMPT}
+
+You will get the trip context and an outline of the itinerary. Write 1 short
+paragraph giving an overall summary of the itinerary. Plain text in English,
+no JSON, no markdown, no bullet points, no per-day breakdown."""
+
+PARSER_INSTRUCTIONS = """You are a strict JSON generator for a travel planner called TripWeaver.
+
+Read the user's trip query and return a SINGLE JSON object with this schema:
+{"city": string, "total_days": integer, "categories": [string], "budget": "low"|"medium"|"high"|"unspecified", "crowd_preference": "avoid_crowds"|"no_preference"}
+
+Rules:
+- categories use words like "museum", "park", "food", "landmark".
+- No backticks, no explanation, no comments.
+- If a field is not mentioned, guess a reasonable default (e.g., budget="unspecified", crowd_preference="no_preference")."""
+
+
+def clip_text(text: Optional[str], max_chars: int = PROMPT_WIKI_CHARS) -> Optional[str]:
+    """Clip text to `max_chars`, preferring a sentence end, then a word boundary."""
+    if not text:
+        return None
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if end >= max_chars // 2:
+        return cut[: end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+
+def compact_place(place: Place, wiki_chars: int = PROMPT_WIKI_CHARS) -> Dict[str, str]:
+    out = {"n": place.name, "k": place.category}
+    note = clip_text(place.description, wiki_chars) if wiki_chars > 0 else None
+    if note:
+        out["w"] = note
+    return out
+
+
+def compact_day(day_plan: DayPlan, wiki_chars: int = PROMPT_WIKI_CHARS) -> Dict[str, object]:
+    return {"n": day_plan.day, "p": [compact_place(p, wiki_chars) for p in day_plan.places]}
+
+
+def compact_plan(plan: TripPlan, wiki_chars: int = PROMPT_WIKI_CHARS) -> str:
+    """Serialize a TripPlan with the abbreviated keys described in PLAN_KEY_LEGEND."""
+    data = {"c": plan.city, "d": [compact_day(d, wiki_chars) for d in plan.days]}
+    return dumps_compact(data)
+
+
+def request_context(req: TripRequest, parsed: ParsedTripRequest) -> str:
+    """The request-specific header shared by every explanation prompt."""
+    return (
+        f'Query: "{req.query}"\n'
+        f"City: {parsed.city} | days: {parsed.days} | "
+        f"categories: {','.join(parsed.categories) or '-'} | "
+        f"source: {getattr(req, 'data_source', 'offline')}"
+    )
+
+
+def build_messages(instructions: str, user_content: str) -> List[Dict[str, str]]:
+    """Static instructions first (cacheable prefix), request data last."""
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def dumps_compact(data: object) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+# ----------------------------------------------------------------------------
+# token accounting
+# ----------------------------------------------------------------------------
+
+_ENCODING = None
+_ENCODING_LOCK = threading.Lock()
+
+
+def _encoding():
+    global _ENCODING
+    if tiktoken is None:
+        return None
+    with _ENCODING_LOCK:
+        if _ENCODING is None:
+            try:
+                _ENCODING = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                return None
+        return _ENCODING
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Token count via tiktoken when installed, else a ~4 chars/token estimate."""
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def message_tokens(messages: List[Dict[str, str]]) -> int:
+    # ~4 tokens of per-message framing overhead in the chat format
+    return sum(count_tokens(m.get("content")) + 4 for m in messages)
+
+
+@dataclass
+class TokenUsage:
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    by_kind: Dict[str, List[int]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, kind: str, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            totals = self.by_kind.setdefault(kind, [0, 0])
+            totals[0] += input_tokens
+            totals[1] += output_tokens
+
+
+_CURRENT_USAGE: ContextVar[Optional[TokenUsage]] = ContextVar("tripweaver_token_usage", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[TokenUsage]:
+    """Collect token usage of every LLM call made inside the block (per request)."""
+    usage = TokenUsage()
+    token = _CURRENT_USAGE.set(usage)
+    try:
+        yield usage
+    finally:
+        _CURRENT_USAGE.reset(token)
+
+
+def record_usage(kind: str, messages: List[Dict[str, str]], resp: object) -> None:
+    """
+    Attribute one completion to the current tracker, if any.
+
+    Prefers the provider-reported `usage`; estimates locally when missing.
+    """
+    usage = _CURRENT_USAGE.get()
+    if usage is None:
+        return
+
+    reported = getattr(resp, "usage", None)
+    input_tokens = getattr(reported, "prompt_tokens", None)
+    output_tokens = getattr(reported, "completion_tokens", None)
+    if not isinstance(input_tokens, int):
+        input_tokens = message_tokens(messages)
+    if not isinstance(output_tokens, int):
+        try:
+            output_tokens = count_tokens(resp.choices[0].message.content)
+        except Exception:
+            output_tokens = 0
+    usage.add(kind, input_tokens, output_tokens)
@@ -0,0 +1,315 @@
+# backend/app/resilience.py
+"""
+Timeouts, latency budgets and circuit breakers for external dependencies
+(OpenAI, Wikipedia, Google Places).
+
+- Every planner request gets a total latency budget (TRIPWEAVER_REQUEST_BUDGET_S)
+  split across stages (parse / retrieval / enrich / explain) by fixed shares.
+  A call never waits longer than its dependency timeout or what is left of
+  the current stage.
+- Each dependency has a circuit breaker. After `failure_threshold` consecutive
+  failures or slow calls it opens and `call_dependency` raises
+  DependencyUnavailable immediately, so callers go straight to their existing
+  fallbacks (heuristic parse, no description, no explanation). After
+  `reset_timeout_s` one probe call is let through; success closes the breaker.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+REQUEST_BUDGET_S = float(os.getenv("TRIPWEAVER_REQUEST_BUDGET_S", "25"))
+
+# fraction of the request budget each stage may use at most
+STAGE_SHARES: Dict[str, float] = {
+    "parse": 0.15,
+    "retrieval": 0.25,
+    "enrich": 0.30,
+    "explain": 0.45,
+}
+
+# per-call timeouts (seconds) and slow-call thresholds per dependency
+DEPENDENCY_TIMEOUTS: Dict[str, float] = {
+    "openai": float(os.getenv("TRIPWEAVER_OPENAI_TIMEOUT_S", "15")),
+    "wikipedia": float(os.getenv("TRIPWEAVER_WIKIPEDIA_TIMEOUT_S", "3")),
+    "google_places": float(os.getenv("TRIPWEAVER_GOOGLE_TIMEOUT_S", "5")),
+}
+
+BREAKER_FAILURES = int(os.getenv("TRIPWEAVER_BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("TRIPWEAVER_BREAKER_RESET_S", "30"))
+# a successful call slower than this fraction of its timeout counts as a failure
+BREAKER_SLOW_FRACTION = float(os.getenv("TRIPWEAVER_BREAKER_SLOW_FRACTION", "0.8"))
+
+# worker threads per dependency; a timed-out call keeps its worker until it
+# really returns, so one slow upstream can only exhaust its own pool
+DEPENDENCY_WORKERS = int(os.getenv("TRIPWEAVER_DEPENDENCY_WORKERS", "16"))
+
+
+class DependencyUnavailable(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open or whose budget is spent."""
+
+
+class DependencyDisabled(DependencyUnavailable):
+    """Raised for a dependency turned off by configuration (e.g. no API key)."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_timeout_s: float = BREAKER_RESET_S,
+        slow_call_s: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.slow_call_s = slow_call_s
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (half-open lets exactly one probe)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether calls are refused right now (no state change, unlike allow())."""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout_s
+
+    def record_success(self, duration_s: float) -> None:
+        if self.slow_call_s is not None and duration_s > self.slow_call_s:
+            self.record_failure()
+            return
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"[Resilience] circuit '{self.name}' opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+class DependencyPool:
+    """
+    Bounded worker pool of one dependency. Every call runs on a worker so the
+    caller can stop waiting at its timeout; the call's slot is only freed when
+    the call actually finishes. When every slot is taken, `submit` returns
+    None at once instead of queueing behind the stuck calls.
+    """
+
+    def __init__(self, name: str, size: int = DEPENDENCY_WORKERS):
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"tripweaver-{name}")
+
+    def submit(self, fn: Callable[[], T]):
+        if not self._slots.acquire(blocking=False):
+            return None
+
+        def run() -> T:
+            try:
+                return fn()
+            finally:
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except BaseException:
+            self._slots.release()
+            raise
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+_POOLS: Dict[str, DependencyPool] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            timeout = DEPENDENCY_TIMEOUTS.get(name)
+            breaker = CircuitBreaker(
+                name,
+                slow_call_s=timeout * BREAKER_SLOW_FRACTION if timeout else None,
+            )
+            _BREAKERS[name] = breaker
+        return breaker
+
+
+def get_pool(name: str) -> DependencyPool:
+    with _BREAKERS_LOCK:
+        pool = _POOLS.get(name)
+        if pool is None:
+            pool = _POOLS[name] = DependencyPool(name)
+        return pool
+
+
+def breaker_states() -> Dict[str, Dict[str, object]]:
+    with _BREAKERS_LOCK:
+        return {name: b.snapshot() for name, b in _BREAKERS.items()}
+
+
+@dataclass
+class LatencyBudget:
+    total_s: float = REQUEST_BUDGET_S
+    started_at: float = field(default_factory=time.monotonic)
+    stage_deadline: Optional[float] = None
+    # set when any call was skipped or cut short, i.e. a fallback was used
+    degraded: bool = False
+
+    @property
+    def deadline(self) -> float:
+        return self.started_at + self.total_s
+
+    def remaining(self) -> float:
+        """Seconds left for the current stage (or the whole request outside a stage)."""
+        end = self.deadline
+        if self.stage_deadline is not None:
+            end = min(end, self.stage_deadline)
+        return end - time.monotonic()
+
+
+_CURRENT_BUDGET: ContextVar[Optional[LatencyBudget]] = ContextVar("tripweaver_latency_budget", default=None)
+
+
+def current_budget() -> Optional[LatencyBudget]:
+    """The latency budget of the current request, if any."""
+    return _CURRENT_BUDGET.get()
+
+
+def mark_degraded(error: Optional[BaseException] = None) -> None:
+    """
+    Record that the current request used a fallback (its result is not
+    cached). A DependencyDisabled `error` is not recorded: that fallback is
+    permanent, so the plan is the same next time.
+    """
+    if isinstance(error, DependencyDisabled):
+        return
+    budget = _CURRENT_BUDGET.get()
+    if budget is not None:
+        budget.degraded = True
+
+
+@contextmanager
+def request_budget(total_s: Optional[float] = None) -> Iterator[LatencyBudget]:
+    """Start a per-request latency budget (no-op nesting: an outer budget wins)."""
+    outer = _CURRENT_BUDGET.get()
+    if outer is not None:
+        yield outer
+        return
+    budget = LatencyBudget(total_s=total_s if total_s is not None else REQUEST_BUDGET_S)
+    token = _CURRENT_BUDGET.set(budget)
+    try:
+        yield budget
+    finally:
+        _CURRENT_BUDGET.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Cap the calls made inside the block to the stage's share of the budget."""
+    budget = _CURRENT_BUDGET.get()
+    if budget is None:
+        yield
+        return
+    previous = budget.stage_deadline
+    share = STAGE_SHARES.get(name, 1.0)
+    budget.stage_deadline = min(budget.deadline, time.monotonic() + share * budget.total_s)
+    try:
+        yield
+    finally:
+        budget.stage_deadline = previous
+
+
+def call_dependency(dependency: str, fn: Callable[[], T], timeout_s: Optional[float] = None) -> T:
+    """
+    Call `fn` through the dependency's circuit breaker and latency budget.
+
+    `fn` runs on the dependency's own worker pool. Raises
+    DependencyUnavailable without calling `fn` if the breaker is open, the
+    budget is exhausted or all of the dependency's workers are busy, and if
+    `fn` does not finish in time (the worker keeps running until `fn`
+    returns and holds its slot until then). Exceptions raised by `fn` are
+    counted as failures and re-raised.
+    """
+    breaker = get_breaker(dependency)
+    timeout = timeout_s if timeout_s is not None else DEPENDENCY_TIMEOUTS.get(dependency, 10.0)
+
+    budget = _CURRENT_BUDGET.get()
+    if budget is not None:
+        timeout = min(timeout, budget.remaining())
+        if timeout <= 0:
+            budget.degraded = True
+            raise DependencyUnavailable(f"{dependency}: latency budget exhausted")
+
+    if not breaker.allow():
+        if budget is not None:
+            budget.degraded = True
+        raise DependencyUnavailable(f"{dependency}: circuit open")
+
+    started = time.monotonic()
+    future = get_pool(dependency).submit(lambda ctx=copy_context(): ctx.run(fn))
+    if future is None:
+        breaker.release_probe()
+        if budget is not None:
+            budget.degraded = True
+        raise DependencyUnavailable(f"{dependency}: all workers busy")
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        if budget is not None:
+            budget.degraded = True
+        if timeout >= DEPENDENCY_TIMEOUTS.get(dependency, timeout):
+            breaker.record_failure()
+        else:
+            # cut short by our own budget, not evidence the dependency is down
+            breaker.release_probe()
+        raise DependencyUnavailable(f"{dependency}: timed out after {timeout:.2f}s")
+    except Exception:
+        breaker.record_failure()
+        if budget is not None:
+            budget.degraded = True
+        raise
+    breaker.record_success(time.monotonic() - started)
+    return result
@@ -0,0 +1,109 @@
+# backend/app/response_cache.py
+"""
+Full-response cache for POST /plan.
+
+Keyed on a canonical hash of the TripRequest; stores the serialized TripPlan
+bytes with an ETag so repeat requests skip the planner and Pydantic
+serialization entirely, and clients holding the ETag get a 304. Entries
+expire after a TTL and the cache is bounded by entry count and total bytes
+(least recently used entries are evicted first).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .schemas import TripRequest
+
+RESPONSE_CACHE_TTL_S = float(os.getenv("TRIPWEAVER_RESPONSE_CACHE_TTL_S", "600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("TRIPWEAVER_RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("TRIPWEAVER_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+def request_key(req: TripRequest) -> str:
+    """Canonical hash of a TripRequest: equal requests modulo whitespace/case of enums."""
+    data = req.model_dump()
+    data["query"] = " ".join((data.get("query") or "").split())
+    for field in ("data_source", "pace"):
+        if isinstance(data.get(field), str):
+            data[field] = data[field].strip().lower()
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 7232 weak comparison against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return any(t.removeprefix("W/") == etag for t in candidates)
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl_s: float = RESPONSE_CACHE_TTL_S,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+    ):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body=body, etag=make_etag(body), expires_at=time.time() + self.ttl_s)
+        if len(body) > self.max_bytes:
+            return entry  # never cacheable, but still usable by the caller
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+
+plan_cache = ResponseCache()
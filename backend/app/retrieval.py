@@ -9,7 +9,8 @@ REQUIRED_COLS = [
     "price", "open_time", "close_time", "popularity_score", "lat", "lon"
 ]
 
-def load_pois(csv_path: str | None = None) -> pd.DataFrame:
+def load_pois(csv_path: str | None = None, dedup: bool = False) -> pd.DataFrame:
+    """Load and normalize the POI CSV; `dedup` drops near-duplicate places (see dedup.py)."""
     if csv_path is None:
         project_root = Path(__file__).resolve().parent.parent.parent
         csv_path = project_root / "data" / "global_poi_dataset.csv"
@@ -18,7 +19,28 @@ def load_pois(csv_path: str | None = None) -> pd.DataFrame:
     if not csv_path.exists():
         raise FileNotFoundError(f"POI CSV not found at {csv_path}")
   
-    df = pd.read_csv(csv_path)
+    df = normalize_pois(pd.read_csv(csv_path))
+    if dedup:
+        from .dedup import dedupe_pois
+
+        df, report = dedupe_pois(df)
+        if len(report):
+            print(f"[Retrieval] dropped {len(report)} near-duplicate POIs")
+    return df
+
+
+def normalize_pois(
+    df: pd.DataFrame,
+    required: Iterable[str] = REQUIRED_COLS,
+    drop_unscored: bool = True,
+) -> pd.DataFrame:
+    """
+    Coerce a raw POI frame to the catalog schema: column aliases, numeric
+    types, signed lat_float/lon_float, rows without popularity dropped.
+
+    Partial rows (e.g. catalog upserts) pass a smaller `required` and
+    drop_unscored=False, since a missing value there means "unchanged".
+    """
     # handle alternate column names (if any drifted)
     # try to coerce common variants
     col_alias = {
@@ -33,14 +55,15 @@ def load_pois(csv_path: str | None = None) -> pd.DataFrame:
         if src in df.columns and dst not in df.columns:
             df.rename(columns={src: dst}, inplace=True)
 
-    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+    missing = [c for c in required if c not in df.columns]
     if missing:
         raise ValueError(f"Missing columns: {missing}. Found: {list(df.columns)}")
 
     # normalize types
     numeric_cols = ["price", "open_time", "close_time", "popularity_score"]
     for c in numeric_cols:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
 
     # lat/lon can be strings like “40.7309° N”, “73.9973° W”.
     # convert to signed floats while preserving original columns too.
@@ -71,17 +94,16 @@ def load_pois(csv_path: str | None = None) -> pd.DataFrame:
         # fallback
         return None
 
-    if df["lat"].dtype == object:
-        df["lat_float"] = df["lat"].map(_to_float_deg)
-    else:
-        df["lat_float"] = df["lat"].astype(float)
-
-    if df["lon"].dtype == object:
-        df["lon_float"] = df["lon"].map(_to_float_deg)
-    else:
-        df["lon_float"] = df["lon"].astype(float)
+    for src, dst in (("lat", "lat_float"), ("lon", "lon_float")):
+        if src not in df.columns:
+            continue
+        if not pd.api.types.is_numeric_dtype(df[src]):
+            df[dst] = df[src].map(_to_float_deg).astype(float)
+        else:
+            df[dst] = df[src].astype(float)
 
-    df = df.dropna(subset=["popularity_score"])
+    if drop_unscored:
+        df = df.dropna(subset=["popularity_score"])
     return df
 
 
@@ -1,5 +1,5 @@
 # backend/app/schemas.py
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class TripRequest(BaseModel):
@@ -9,6 +9,10 @@ class TripRequest(BaseModel):
     data_source: str = "offline"  # "offline" or "google"
     max_places_per_day: Optional[int] = None
     pace: Optional[str] = None  # e.g. "relaxed" | "standard" | "packed"
+    budget: Optional[str] = None  # "low" | "medium" | "high"; overrides the level parsed from the query
+    max_spend_per_day: Optional[float] = None  # entry-price cap per day (dataset price units)
+    max_spend_total: Optional[float] = None  # entry-price cap for the whole trip
+    diversity: Optional[float] = None  # 0 = rank by score only … 1 = mostly diversity (MMR)
 
 
 class ParsedTripRequest(BaseModel):
@@ -17,6 +21,7 @@ class ParsedTripRequest(BaseModel):
     explicit_categories: bool = False
     city: str
     days: int = 1
+    budget: Optional[str] = None  # "low" | "medium" | "high", None when unspecified
 
 
 class Place(BaseModel):
@@ -32,3 +37,38 @@ class TripPlan(BaseModel):
     city: str
     days: List[DayPlan]
     explanation: Optional[str] = None
+
+
+class PoiSwap(BaseModel):
+    day: int
+    place: str  # name of the place to replace
+    replacement: Optional[str] = None  # None → next best unused candidate
+
+
+class PlanEdit(BaseModel):
+    pace: Optional[str] = None
+    max_places_per_day: Optional[int] = None
+    days: Optional[int] = None
+    swaps: List[PoiSwap] = []
+
+
+class PlanSessionResponse(BaseModel):
+    plan_id: str
+    plan: TripPlan
+    recomputed_days: List[int] = []
+
+
+class PoiRef(BaseModel):
+    city_name: str
+    place_name: str
+
+
+class CatalogDelta(BaseModel):
+    # rows keyed on (city_name, place_name); existing places may be partial
+    upserts: List[Dict[str, Any]] = []
+    deletes: List[PoiRef] = []
+
+
+class CatalogDeltaResponse(BaseModel):
+    version: int
+    pois: int
@@ -0,0 +1,314 @@
+# backend/app/sessions.py
+"""
+Plan sessions: keep the intermediate results of a planner run per plan id so
+small edits (swap a POI, change pace, add a day) only recompute what changed.
+
+A session holds the parsed request, the candidate pool, the selected records,
+the Wikipedia descriptions already fetched and the explanation split into a
+summary plus one paragraph per day. Edits re-run selection against the stored
+pool, enrich only new names and re-explain only the days whose places changed.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+from .schemas import TripRequest, TripPlan, ParsedTripRequest, PlanEdit, PoiSwap
+from .parser import parse_query
+from .optimizer import select_pois_greedy
+from .retrieval import as_records
+from .llm_parser import llm_parse_to_parsed_trip_request
+from .llm_explainer import (
+    build_explanation_parts,
+    build_day_explanation,
+    build_trip_summary,
+    join_explanation,
+    run_concurrently,
+)
+from .resilience import request_budget, stage
+from .planner import (
+    _max_places_per_day,
+    _load_candidates,
+    _select_records,
+    _spend_cap,
+    _day_spend_cap,
+    _assign_days,
+    _price,
+    _diversity,
+    _enrich_records,
+    _distribute_places,
+    _day_sizes,
+)
+
+SESSION_TTL_S = float(os.getenv("TRIPWEAVER_SESSION_TTL_S", "3600"))
+SESSION_MAX = int(os.getenv("TRIPWEAVER_SESSION_MAX", "500"))
+
+
+@dataclass
+class PlanSession:
+    plan_id: str
+    request: TripRequest
+    parsed: ParsedTripRequest
+    candidates: pd.DataFrame
+    pool_top_k: int  # top_k the candidate pool was fetched with
+    records: List[dict]  # selected optimizer records, in itinerary order
+    plan: TripPlan
+    descriptions: Dict[str, Optional[str]] = field(default_factory=dict)
+    summary: str = ""
+    day_explanations: Dict[int, str] = field(default_factory=dict)
+    excluded: Set[str] = field(default_factory=set)  # swapped out by the user
+    pinned: Set[str] = field(default_factory=set)  # explicitly swapped in
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    updated_at: float = field(default_factory=time.time)
+
+
+# state an edit may change; applied to a draft and published only if the whole edit succeeds
+_EDITABLE = ("request", "parsed", "candidates", "pool_top_k", "records", "excluded", "pinned")
+
+_SESSIONS: "OrderedDict[str, PlanSession]" = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _store(session: PlanSession) -> None:
+    with _SESSIONS_LOCK:
+        _SESSIONS[session.plan_id] = session
+        _SESSIONS.move_to_end(session.plan_id)
+        while len(_SESSIONS) > SESSION_MAX:
+            _SESSIONS.popitem(last=False)
+
+
+def get_session(plan_id: str) -> Optional[PlanSession]:
+    """Return a live session, or None if unknown or expired."""
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(plan_id)
+        if session is None:
+            return None
+        if time.time() - session.updated_at > SESSION_TTL_S:
+            del _SESSIONS[plan_id]
+            return None
+        _SESSIONS.move_to_end(plan_id)
+        return session
+
+
+def create_session(req: TripRequest) -> PlanSession:
+    """Run the full planner pipeline once and keep every intermediate result."""
+    with request_budget():
+        session = _build_session(req)
+    _store(session)
+    return session
+
+
+def _build_session(req: TripRequest) -> PlanSession:
+    base_parsed = parse_query(req.query)
+    with stage("parse"):
+        parsed = llm_parse_to_parsed_trip_request(req.query, base_parsed)
+
+    days = parsed.days or 1
+    pois_needed = days * _max_places_per_day(req)
+    with stage("retrieval"):
+        candidates = _load_candidates(req, parsed, pois_needed)
+
+    session = PlanSession(
+        plan_id=uuid.uuid4().hex,
+        request=req,
+        parsed=parsed,
+        candidates=candidates,
+        pool_top_k=pois_needed * 2,
+        records=[],
+        plan=TripPlan(city=parsed.city, days=[]),
+    )
+
+    if candidates is not None and len(candidates) > 0:
+        day_cap = _day_spend_cap(req, parsed)
+        session.records = _assign_days(
+            _select_records(candidates, parsed, pois_needed, _spend_cap(req, parsed), _diversity(req), day_cap),
+            days,
+            day_cap,
+        )
+        places = _enrich_records(session.records, session.descriptions)
+        session.plan = TripPlan(city=parsed.city, days=_distribute_places(places, days))
+
+        try:
+            with stage("explain"):
+                session.summary, session.day_explanations = build_explanation_parts(req, parsed, session.plan)
+            session.plan.explanation = join_explanation(session.summary, session.day_explanations) or None
+        except Exception as e:
+            print(f"[LLM explainer] Failed to generate explanation: {e}")
+
+    return session
+
+
+def apply_edit(session: PlanSession, edit: PlanEdit) -> List[int]:
+    """
+    Apply an edit to a session in place and return the recomputed day numbers.
+
+    Raises ValueError for swaps that reference unknown days/places; the
+    session is then left exactly as it was.
+    """
+    with session.lock, request_budget():
+        old_days = {d.day: [p.name for p in d.places] for d in session.plan.days}
+        structural = False
+        draft = replace(
+            session,
+            records=list(session.records),
+            excluded=set(session.excluded),
+            pinned=set(session.pinned),
+        )
+
+        updates = {}
+        if edit.pace is not None:
+            updates["pace"] = edit.pace
+        if edit.max_places_per_day is not None:
+            updates["max_places_per_day"] = edit.max_places_per_day
+        if updates:
+            draft.request = draft.request.model_copy(update=updates)
+            structural = True
+        if edit.days is not None and edit.days > 0 and edit.days != draft.parsed.days:
+            draft.parsed = draft.parsed.model_copy(update={"days": edit.days})
+            structural = True
+
+        if structural:
+            _reselect(draft)
+        for swap in edit.swaps:
+            _apply_swap(draft, swap)
+        for name in _EDITABLE:
+            setattr(session, name, getattr(draft, name))
+
+        days = session.parsed.days or 1
+        places = _enrich_records(session.records, session.descriptions)
+        day_plans = _distribute_places(places, days) if session.records else []
+        session.plan = TripPlan(city=session.parsed.city, days=day_plans)
+
+        changed = [
+            d.day for d in day_plans
+            if old_days.get(d.day) != [p.name for p in d.places]
+        ]
+        _refresh_explanations(session, changed, summary=structural)
+
+        session.updated_at = time.time()
+        return changed
+
+
+def _reselect(session: PlanSession) -> None:
+    """Re-run selection against the stored pool after a pace / days change."""
+    pois_needed = (session.parsed.days or 1) * _max_places_per_day(session.request)
+
+    # Only go back to the data source if the new target outgrows a pool that
+    # was truncated by top_k; otherwise the stored pool already has everything.
+    if pois_needed * 2 > session.pool_top_k and len(session.candidates) >= session.pool_top_k:
+        with stage("retrieval"):
+            session.candidates = _load_candidates(session.request, session.parsed, pois_needed)
+        session.pool_top_k = pois_needed * 2
+
+    pool = session.candidates
+    if session.excluded:
+        pool = pool[~pool["place_name"].isin(session.excluded)]
+    if pool is None or len(pool) == 0:
+        session.records = []
+        return
+
+    day_cap = _day_spend_cap(session.request, session.parsed)
+    records = _select_records(
+        pool,
+        session.parsed,
+        pois_needed,
+        _spend_cap(session.request, session.parsed),
+        _diversity(session.request),
+        day_cap,
+    )
+
+    # keep explicit user picks even if they would not make the cut on score
+    selected = {r["place_name"] for r in records}
+    missing = [r for r in as_records(pool) if r["place_name"] in session.pinned - selected]
+    for rec in missing:
+        for i in range(len(records) - 1, -1, -1):
+            if records[i]["place_name"] not in session.pinned:
+                records[i] = rec
+                break
+    session.records = _assign_days(records, session.parsed.days or 1, day_cap)
+
+
+def _apply_swap(session: PlanSession, swap: PoiSwap) -> None:
+    sizes = _day_sizes(len(session.records), session.parsed.days or 1)
+    index = None
+    if 1 <= swap.day <= len(sizes):
+        offset = sum(sizes[: swap.day - 1])
+        for i in range(offset, offset + sizes[swap.day - 1]):
+            if session.records[i]["place_name"] == swap.place:
+                index = i
+                break
+    if index is None:
+        raise ValueError(f"Place '{swap.place}' not found on day {swap.day}")
+
+    old = session.records[index]
+    in_use = {r["place_name"] for r in session.records}
+    ranked = select_pois_greedy(session.candidates, session.parsed, len(session.candidates))
+
+    if swap.replacement:
+        target = swap.replacement.strip().lower()
+        choices = [r for r in ranked if str(r["place_name"]).lower() == target]
+        if not choices:
+            raise ValueError(f"Replacement '{swap.replacement}' is not a candidate for {session.parsed.city}")
+        new = choices[0]
+        if new["place_name"] in in_use and new["place_name"] != old["place_name"]:
+            raise ValueError(f"Replacement '{swap.replacement}' is already in the plan")
+        session.pinned.add(new["place_name"])
+    else:
+        unused = [
+            r for r in ranked
+            if r["place_name"] not in in_use and r["place_name"] not in session.excluded
+        ]
+        # stay within the spend cap (an explicit replacement is the user's call)
+        max_spend = _spend_cap(session.request, session.parsed)
+        if max_spend is not None:
+            spent = sum(_price(r) for r in session.records) - _price(old)
+            unused = [r for r in unused if spent + _price(r) <= max_spend]
+        day_cap = _day_spend_cap(session.request, session.parsed)
+        if day_cap is not None:
+            day_spent = sum(_price(r) for r in session.records[offset: offset + sizes[swap.day - 1]]) - _price(old)
+            unused = [r for r in unused if day_spent + _price(r) <= day_cap]
+        # prefer a place of the same category so the day keeps its theme
+        same_cat = [r for r in unused if r["place_category"] == old["place_category"]]
+        if not (same_cat or unused):
+            raise ValueError(f"No unused candidate left to replace '{swap.place}'")
+        new = (same_cat or unused)[0]
+
+    session.excluded.add(old["place_name"])
+    session.pinned.discard(old["place_name"])
+    session.records[index] = new
+
+
+def _refresh_explanations(session: PlanSession, changed: List[int], summary: bool) -> None:
+    """Re-explain only the changed days; keep cached paragraphs for the rest."""
+    live_days = {d.day: d for d in session.plan.days}
+    session.day_explanations = {
+        d: text for d, text in session.day_explanations.items() if d in live_days
+    }
+
+    jobs = {
+        day: (lambda d=live_days[day]: build_day_explanation(session.request, session.parsed, d))
+        for day in changed
+    }
+    if summary and session.plan.days:
+        jobs["summary"] = lambda: build_trip_summary(session.request, session.parsed, session.plan)
+
+    with stage("explain"):
+        results = run_concurrently(jobs)
+    for key, text in results.items():
+        if key == "summary":
+            if text:
+                session.summary = text
+        elif text:
+            session.day_explanations[key] = text
+        else:
+            session.day_explanations.pop(key, None)
+
+    text = join_explanation(session.summary, session.day_explanations)
+    session.plan.explanation = text or None
@@ -0,0 +1,342 @@
+# backend/app/shared_cache.py
+"""
+Two-tier cache for expensive dependency results shared by all workers.
+
+- L1: per-process LRU with a short TTL (TRIPWEAVER_CACHE_L1_SIZE,
+  TRIPWEAVER_CACHE_L1_TTL_S), so hot keys never leave the process.
+- L2: a tier shared across workers and nodes, chosen by TRIPWEAVER_CACHE_URL:
+      redis://host:6379/0        Redis (needs `pip install redis`)
+      sqlite:///path/cache.db    one SQLite file (workers on one node, tests)
+      "" (default)               no L2, L1 only
+  L2 errors never fail a request: the tier is skipped for
+  TRIPWEAVER_CACHE_L2_RETRY_S and callers just compute.
+
+Values are JSON, stored zlib-compressed above a small size, and kept
+serialized in L1 as well so every hit returns a fresh copy (so do callers
+that waited on another thread's computation).
+
+`get_or_compute` protects against stampedes: concurrent misses for a key in
+one process share a single computation, and across processes the first
+miss takes a short lease in L2 while the others poll L2 for its result
+(bounded by TRIPWEAVER_CACHE_LEASE_S and the request's latency budget).
+When the lease goes away without a cached value (the result failed
+cache_if), a waiter takes the lease over and computes right away.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # optional; only needed for a redis:// L2
+    redis = None
+
+from .resilience import current_budget
+
+CACHE_URL = os.getenv("TRIPWEAVER_CACHE_URL", "").strip()
+CACHE_L1_SIZE = int(os.getenv("TRIPWEAVER_CACHE_L1_SIZE", "4096"))
+CACHE_L1_TTL_S = float(os.getenv("TRIPWEAVER_CACHE_L1_TTL_S", "300"))
+CACHE_L2_RETRY_S = float(os.getenv("TRIPWEAVER_CACHE_L2_RETRY_S", "30"))
+CACHE_L2_TIMEOUT_S = float(os.getenv("TRIPWEAVER_CACHE_L2_TIMEOUT_S", "0.2"))
+CACHE_LEASE_S = float(os.getenv("TRIPWEAVER_CACHE_LEASE_S", "10"))
+CACHE_POLL_S = 0.05
+# values at least this long (serialized) are compressed
+COMPRESS_MIN_BYTES = 256
+
+# L2 time-to-live per namespace (seconds)
+CACHE_TTLS: Dict[str, float] = {
+    "wiki": float(os.getenv("TRIPWEAVER_CACHE_TTL_WIKI_S", str(30 * 86400))),
+    "places": float(os.getenv("TRIPWEAVER_CACHE_TTL_PLACES_S", str(86400))),
+    "parse": float(os.getenv("TRIPWEAVER_CACHE_TTL_PARSE_S", str(7 * 86400))),
+    "explain": float(os.getenv("TRIPWEAVER_CACHE_TTL_EXPLAIN_S", str(7 * 86400))),
+}
+DEFAULT_TTL_S = 86400.0
+
+_RAW = b"j"
+_ZLIB = b"z"
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable hash of everything a cached value depends on."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def dumps(value: Any) -> bytes:
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(raw, 6)
+    return _RAW + raw
+
+
+def loads(blob: bytes) -> Any:
+    head, body = blob[:1], blob[1:]
+    if head == _ZLIB:
+        body = zlib.decompress(body)
+    return json.loads(body.decode("utf-8"))
+
+
+class SQLiteBackend:
+    """L2 in a single SQLite file; shared by the processes that can see it."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=CACHE_L2_TIMEOUT_S, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, value, time.time() + ttl_s)
+        )
+
+    def add(self, key: str, value: bytes, ttl_s: float) -> bool:
+        """Set only if absent (or expired); True if this call set it."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+        cur = conn.execute("INSERT OR IGNORE INTO cache VALUES (?, ?, ?)", (key, value, now + ttl_s))
+        return cur.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("TRIPWEAVER_CACHE_URL is a redis:// URL but the redis package is not installed")
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=CACHE_L2_TIMEOUT_S, socket_connect_timeout=CACHE_L2_TIMEOUT_S
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        self.client.set(key, value, px=max(1, int(ttl_s * 1000)))
+
+    def add(self, key: str, value: bytes, ttl_s: float) -> bool:
+        return bool(self.client.set(key, value, px=max(1, int(ttl_s * 1000)), nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+
+def backend_from_url(url: str):
+    if not url or url == "none":
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported TRIPWEAVER_CACHE_URL: {url!r}")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.blob: Optional[bytes] = None  # serialized result, decoded per waiter
+        self.error: Optional[BaseException] = None
+
+
+class SharedCache:
+    def __init__(self, l2=None, l1_size: int = CACHE_L1_SIZE, l1_ttl_s: float = CACHE_L1_TTL_S):
+        self.l2 = l2
+        self.l1_size = l1_size
+        self.l1_ttl_s = l1_ttl_s
+        self._l1: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._l2_down_until = 0.0
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "l2_errors": 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """A consistent copy of the hit / miss counters."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    # ---- L1 ----
+    def _l1_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry[0]
+
+    def _l1_put(self, key: str, blob: bytes, ttl_s: float) -> None:
+        with self._lock:
+            self._l1[key] = (blob, time.time() + min(ttl_s, self.l1_ttl_s))
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+    # ---- L2 (failures disable the tier for a while) ----
+    def _l2_call(self, op: str, *args):
+        if self.l2 is None or time.monotonic() < self._l2_down_until:
+            return None
+        try:
+            return getattr(self.l2, op)(*args)
+        except Exception as e:
+            self._count("l2_errors")
+            self._l2_down_until = time.monotonic() + CACHE_L2_RETRY_S
+            print(f"[Cache] L2 {op} failed, skipping L2 for {CACHE_L2_RETRY_S:.0f}s: {e}")
+            return None
+
+    # ---- public API ----
+    def get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        """(hit, value); a cached None is a hit."""
+        full = f"{namespace}:{key}"
+        blob = self._l1_get(full)
+        if blob is not None:
+            self._count("l1_hits")
+            return True, loads(blob)
+        blob = self._l2_call("get", full)
+        if blob is not None:
+            self._count("l2_hits")
+            self._l1_put(full, blob, CACHE_TTLS.get(namespace, DEFAULT_TTL_S))
+            return True, loads(blob)
+        return False, None
+
+    def set(self, namespace: str, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        full = f"{namespace}:{key}"
+        ttl_s = ttl_s or CACHE_TTLS.get(namespace, DEFAULT_TTL_S)
+        blob = dumps(value)
+        self._l1_put(full, blob, ttl_s)
+        self._l2_call("set", full, blob, ttl_s)
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Any],
+        ttl_s: Optional[float] = None,
+        cache_if: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Cached value of `compute()`. Exceptions propagate and are not cached;
+        results for which `cache_if` is false are returned but not stored.
+        """
+        hit, value = self.get(namespace, key)
+        if hit:
+            return value
+
+        full = f"{namespace}:{key}"
+        with self._lock:
+            flight = self._flights.get(full)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return loads(flight.blob)
+
+        try:
+            value = self._compute_once(namespace, key, compute, ttl_s, cache_if)
+            flight.blob = dumps(value)
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(full, None)
+            flight.done.set()
+
+    def _compute_once(self, namespace, key, compute, ttl_s, cache_if) -> Any:
+        """Leader path: take the cross-process lease or wait for its holder's result."""
+        lease = f"lease:{namespace}:{key}"
+        if self._l2_call("add", lease, b"1", CACHE_LEASE_S) is False:
+            deadline = time.monotonic() + CACHE_LEASE_S
+            budget = current_budget()
+            if budget is not None:
+                deadline = min(deadline, time.monotonic() + max(0.0, budget.remaining()))
+            taken = False
+            while time.monotonic() < deadline:
+                time.sleep(CACHE_POLL_S)
+                blob = self._l2_call("get", f"{namespace}:{key}")
+                if blob is None and self._l2_call("get", lease) is None:
+                    # holder finished without caching (or died): re-check, then take over
+                    blob = self._l2_call("get", f"{namespace}:{key}")
+                    if blob is None:
+                        taken = self._l2_call("add", lease, b"1", CACHE_LEASE_S)
+                        if taken is False:
+                            continue  # another waiter took it first
+                        break
+                if blob is not None:
+                    self._count("l2_hits")
+                    self._l1_put(f"{namespace}:{key}", blob, ttl_s or CACHE_TTLS.get(namespace, DEFAULT_TTL_S))
+                    return loads(blob)
+            if taken is not True:
+                lease = None  # holder is slow or gone: compute ourselves
+
+        self._count("misses")
+        try:
+            value = compute()
+            if cache_if(value):
+                self.set(namespace, key, value, ttl_s)
+            return value
+        finally:
+            if lease is not None:
+                self._l2_call("delete", lease)
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._l1.clear()
+
+
+_CACHE: Optional[SharedCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> SharedCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                try:
+                    l2 = backend_from_url(CACHE_URL)
+                except (RuntimeError, ValueError) as e:
+                    print(f"[Cache] L2 disabled: {e}")
+                    l2 = None
+                _CACHE = SharedCache(l2)
+    return _CACHE
+
+
+def cached(namespace: str, key_parts: Tuple[Any, ...], compute: Callable[[], Any], **kwargs) -> Any:
+    """get_or_compute on the process-wide cache, keyed on a hash of `key_parts`."""
+    return get_cache().get_or_compute(namespace, cache_key(*key_parts), compute, **kwargs)
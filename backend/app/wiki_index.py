@@ -0,0 +1,203 @@
+# backend/app/wiki_index.py
+"""
+Local, memory-mapped Wikipedia summary index for catalog POIs.
+
+Built offline from a Wikipedia abstracts dump
+(https://dumps.wikimedia.org/enwiki/latest/enwiki-latest-abstract.xml.gz),
+keeping only pages whose normalized title matches a catalog `place_name`,
+directly or through an optional redirects TSV (`from_title<TAB>to_title`).
+
+Usage (from the project root):
+    python -m backend.app.wiki_index --abstracts enwiki-latest-abstract.xml.gz
+    python -m backend.app.wiki_index --abstracts abstracts.xml --redirects redirects.tsv --out data/wiki_index
+
+The index is a directory of three files:
+    keys.npy     sorted uint64 hashes of normalized names
+    offsets.npy  uint64 start offsets into blob.bin (n + 1 entries)
+    blob.bin     UTF-8 summaries, concatenated
+Lookups are a binary search over the memory-mapped hashes plus one slice of
+the blob, so `get_poi_summary` can answer without any network call.
+"""
+from __future__ import annotations
+
+import argparse
+import bz2
+import gzip
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "wiki_index"
+WIKI_INDEX_PATH = Path(os.getenv("TRIPWEAVER_WIKI_INDEX", str(_DEFAULT_PATH)))
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+_PAREN_RE = re.compile(r"\s*\([^)]*\)\s*$")
+_TITLE_PREFIX = "Wikipedia: "
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase, accent-folded, punctuation-free title without a leading 'the'."""
+    text = unicodedata.normalize("NFKD", title.replace("_", " "))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = " ".join(_NON_WORD_RE.sub(" ", text).split())
+    if text.startswith("the "):
+        text = text[4:]
+    return text
+
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _open_dump(path: Path) -> IO[bytes]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_abstracts(path: Path) -> Iterator[Tuple[str, str]]:
+    """Stream (title, abstract) pairs from an abstracts dump without loading it."""
+    with _open_dump(path) as fh:
+        for _, elem in ET.iterparse(fh, events=("end",)):
+            if elem.tag != "doc":
+                continue
+            title = (elem.findtext("title") or "").strip()
+            if title.startswith(_TITLE_PREFIX):
+                title = title[len(_TITLE_PREFIX):]
+            abstract = " ".join((elem.findtext("abstract") or "").split())
+            elem.clear()
+            # the dump keeps some infobox / table residue as "abstracts"
+            if title and abstract and abstract[0] not in "|{":
+                yield title, abstract
+
+
+def read_redirects(path: Path) -> Dict[str, str]:
+    """normalized redirect title -> normalized target title"""
+    redirects: Dict[str, str] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2 and parts[0] and parts[1]:
+                redirects[normalize_title(parts[0])] = normalize_title(parts[1])
+    return redirects
+
+
+def build_index(
+    abstracts: Path,
+    names: Iterable[str],
+    out: Path = WIKI_INDEX_PATH,
+    redirects: Optional[Path] = None,
+) -> int:
+    """Extract summaries for `names` from the dump into an index at `out`; returns entries written."""
+    wanted: Set[str] = {normalize_title(n) for n in names if n and str(n).strip()}
+    # page title key -> catalog keys it answers (itself and/or redirect sources)
+    targets: Dict[str, List[str]] = {key: [key] for key in wanted}
+    if redirects is not None:
+        for source, target in read_redirects(redirects).items():
+            if source in wanted and target != source:
+                targets.setdefault(target, []).append(source)
+
+    found: Dict[str, str] = {}
+    fallback: Dict[str, str] = {}  # matched only after dropping a "(disambiguation)" suffix
+    for title, abstract in iter_abstracts(abstracts):
+        key = normalize_title(title)
+        for name in targets.get(key, ()):
+            found.setdefault(name, abstract)
+        bare = normalize_title(_PAREN_RE.sub("", title))
+        if bare != key:
+            for name in targets.get(bare, ()):
+                fallback.setdefault(name, abstract)
+    for name, abstract in fallback.items():
+        found.setdefault(name, abstract)
+
+    write_index(out, found)
+    return len(found)
+
+
+def write_index(out: Path, summaries: Dict[str, str]) -> None:
+    entries = sorted((_key_hash(k), v.encode("utf-8")) for k, v in summaries.items())
+    keys = np.fromiter((h for h, _ in entries), dtype=np.uint64, count=len(entries))
+    offsets = np.zeros(len(entries) + 1, dtype=np.uint64)
+    if entries:
+        offsets[1:] = np.cumsum([len(b) for _, b in entries], dtype=np.uint64)
+
+    out.mkdir(parents=True, exist_ok=True)
+    # write the blob first so a reader never sees keys pointing past its end
+    (out / "blob.bin").write_bytes(b"".join(b for _, b in entries))
+    np.save(out / "offsets.npy", offsets)
+    np.save(out / "keys.npy", keys)
+
+
+class WikiSummaryIndex:
+    def __init__(self, path: Path | str = WIKI_INDEX_PATH):
+        path = Path(path)
+        self.keys = np.load(path / "keys.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        blob_path = path / "blob.bin"
+        # np.memmap cannot map an empty file
+        self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if blob_path.stat().st_size else np.zeros(0, np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, name: str) -> Optional[str]:
+        h = np.uint64(_key_hash(normalize_title(name)))
+        i = int(np.searchsorted(self.keys, h))
+        if i >= len(self.keys) or self.keys[i] != h:
+            return None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+
+_INDEX: Optional[WikiSummaryIndex] = None
+_INDEX_LOADED = False
+_INDEX_LOCK = threading.Lock()
+
+
+def get_wiki_index() -> Optional[WikiSummaryIndex]:
+    """The local index, or None if none was built."""
+    global _INDEX, _INDEX_LOADED
+    if not _INDEX_LOADED:
+        with _INDEX_LOCK:
+            if not _INDEX_LOADED:
+                if (WIKI_INDEX_PATH / "keys.npy").exists():
+                    try:
+                        _INDEX = WikiSummaryIndex(WIKI_INDEX_PATH)
+                    except (OSError, ValueError) as e:
+                        print(f"[Wiki index] failed to open {WIKI_INDEX_PATH}: {e}")
+                _INDEX_LOADED = True
+    return _INDEX
+
+
+def lookup_summary(name: str) -> Optional[str]:
+    index = get_wiki_index()
+    return None if index is None else index.get(name)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Build the local Wikipedia summary index for catalog POIs.")
+    ap.add_argument("--abstracts", type=Path, required=True, help="abstracts dump (.xml, .xml.gz or .xml.bz2)")
+    ap.add_argument("--redirects", type=Path, help="optional TSV of redirect_title<TAB>target_title")
+    ap.add_argument("--out", type=Path, default=WIKI_INDEX_PATH)
+    args = ap.parse_args(argv)
+
+    from .catalog import get_catalog
+
+    names = get_catalog().snapshot().frame()["place_name"].tolist()
+    started = time.time()
+    written = build_index(args.abstracts, names, out=args.out, redirects=args.redirects)
+    print(f"[Wiki index] {written}/{len(set(names))} places indexed to {args.out} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
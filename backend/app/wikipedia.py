@@ -1,52 +1,95 @@
 # backend/app/wikipedia.py
+import os
 import wikipediaapi
 import wikipedia
 import re
 
-wiki = wikipediaapi.Wikipedia(user_agent='TripWeaver', language='en')
+from .resilience import DEPENDENCY_TIMEOUTS, DependencyUnavailable, call_dependency, mark_degraded
+from .shared_cache import cached
+from .wiki_index import lookup_summary
+
+# answer only from the local index (air-gapped deployments)
+WIKI_OFFLINE = os.getenv("TRIPWEAVER_WIKI_OFFLINE", "").lower() in {"1", "true", "yes"}
+
+wiki = wikipediaapi.Wikipedia(user_agent='TripWeaver', language='en', timeout=DEPENDENCY_TIMEOUTS["wikipedia"])
 
 
 def get_poi_summary(poi_name: str, sentences: int = 3) -> str | None:
     """
     Try to fetch a short Wikipedia summary for a POI name.
 
-    1) Try direct page match via wikipediaapi
+    0) Try the local dump index (no network; see wiki_index.py)
+    1) Try direct page match via wikipediaapi (1-2 go through the shared cache)
     2) If that fails, fall back to wikipedia.search + wikipedia.summary
     3) Truncate to at most `sentences` sentences
     """
-    # 1) direct page lookup
-    page = wiki.page(poi_name)
+    # 0) local index
+    summary = lookup_summary(poi_name)
+    if summary:
+        return _clip_sentences(summary, sentences)
+    if WIKI_OFFLINE:
+        return None
 
-    if page.exists():
-        summary = page.summary or ""
-    else:
+    # 1) + 2) network lookups, shared across workers (misses are not cached)
+    summary = cached("wiki", (" ".join(poi_name.split()),), lambda: _fetch_summary(poi_name), cache_if=bool)
+    if not summary:
+        return None
+
+    # 3) Limit number of sentences
+    return _clip_sentences(summary, sentences)
+
+
+def _fetch_summary(poi_name: str) -> str | None:
+    """Full (unclipped) summary from the live Wikipedia APIs, or None."""
+    # 1) direct page lookup
+    try:
+        summary = call_dependency("wikipedia", lambda: _direct_summary(poi_name))
+    except Exception as e:
+        mark_degraded()
+        print(f"Error fetching Wikipedia page for '{poi_name}': {e}")
+        if isinstance(e, DependencyUnavailable):
+            return None
         summary = ""
 
     # 2) fallback: search if direct lookup failed / empty
     if not summary:
         try:
-            search_results = wikipedia.search(poi_name)
-            if not search_results:
-                return None
-            page_title = search_results[0]
-            summary = wikipedia.summary(page_title, auto_suggest=False)
+            summary = call_dependency("wikipedia", lambda: _search_summary(poi_name))
         except Exception as e:
+            mark_degraded()
             print(f"Error fetching Wikipedia summary via search for '{poi_name}': {e}")
             return None
 
-    if not summary:
-        return None
+    return summary or None
 
-    # 3) Limit number of sentences
+
+def _clip_sentences(summary: str, sentences: int | None) -> str:
     if sentences is not None:
         pattern = r'(?<=[.!?])\s+(?=[A-Z])'
         split_sentences = re.split(pattern, summary)
-        clipped = " ".join(split_sentences[:sentences])
-        summary = clipped
-
+        summary = " ".join(split_sentences[:sentences])
     return summary
 
 
+def _direct_summary(poi_name: str) -> str:
+    page = wiki.page(poi_name)
+    if page.exists():
+        return page.summary or ""
+    return ""
+
+
+def _search_summary(poi_name: str) -> str | None:
+    search_results = wikipedia.search(poi_name)
+    if not search_results:
+        return None
+    page_title = search_results[0]
+    try:
+        return wikipedia.summary(page_title, auto_suggest=False)
+    except (wikipedia.exceptions.DisambiguationError, wikipedia.exceptions.PageError):
+        # an ambiguous or missing title is a normal miss, not an outage
+        return None
+
+
 def get_wikipedia_summary(query: str, sentences: int = 3) -> str | None:
     """
     Search Wikipedia for a query and return a summary.
@@ -0,0 +1,116 @@
+# backend/tests/bench_parser.py
+"""
+Benchmark parse_query / parse_queries against the original token-loop parser.
+
+Run from the project root:
+    python -m backend.tests.bench_parser [n_queries]
+"""
+import gc
+import os
+import random
+import re
+import sys
+import time
+from typing import List, Optional
+
+from backend.app.parser import _CATEGORY_ALIASES, parse_query, parse_queries
+from backend.app.schemas import ParsedTripRequest
+
+
+def _legacy_parse(query: str) -> Optional[ParsedTripRequest]:
+    """The original parse_query (token x alias-list loops); None instead of ValueError."""
+    q = (query or "").strip()
+    tokens = re.findall(r"[A-Za-z]+", q)
+    found = []
+    for tok in tokens:
+        for aliases in _CATEGORY_ALIASES.values():
+            if tok.lower() in aliases:
+                found.append(tok.lower())
+                break
+    categories = []
+    for token in found:
+        t = token.lower()
+        for canon, aliases in _CATEGORY_ALIASES.items():
+            if t in aliases or t == canon:
+                if canon not in categories:
+                    categories.append(canon)
+                break
+    days = 1
+    m = re.search(r"\b(\d+)\s*(?:days|day|d)\b", q, re.I)
+    if m:
+        days = max(1, int(m.group(1)))
+    else:
+        m2 = re.search(r"\b(\d+)\b", q)
+        if m2:
+            days = max(1, int(m2.group(1)))
+    city_match = re.search(r"\b(in|to|at|near|around|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)", q)
+    if not city_match:
+        return None
+    return ParsedTripRequest(
+        query=q, categories=categories, explicit_categories=bool(categories),
+        city=city_match.group(2).strip().title(), days=days,
+    )
+
+
+def _as_tuple(p) -> Optional[tuple]:
+    if p is None:
+        return None
+    return p.query, list(p.categories), p.explicit_categories, p.city, p.days
+
+
+def make_queries(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    cities = ["Paris", "New York", "Tokyo", "London", "Rome", "San Francisco", "Hong Kong"]
+    words = ["museums", "parks", "Food", "art", "bars", "sightseeing", "nightlife", "shopping",
+             "quiet", "cheap", "Galleries", "cafes", "family", "history", "landmarks", "walks"]
+    preps = ["in", "to", "near", "around", "for", "visiting"]
+    out = []
+    for _ in range(n):
+        picked = rng.sample(words, rng.randint(0, 4))
+        days = f"{rng.randint(1, 9)} days " if rng.random() < 0.7 else ""
+        out.append(f"{days}{' and '.join(picked)} {rng.choice(preps)} {rng.choice(cities)}".strip())
+    return out
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    queries = make_queries(n)
+    # like timeit: keep the growing result lists from skewing later timings
+    gc.disable()
+
+    t = time.perf_counter()
+    legacy = [_as_tuple(_legacy_parse(q)) for q in queries]
+    t_legacy = time.perf_counter() - t
+
+    t = time.perf_counter()
+    single = []
+    for q in queries:
+        try:
+            single.append(_as_tuple(parse_query(q)))
+        except ValueError:
+            single.append(None)
+    t_single = time.perf_counter() - t
+
+    t = time.perf_counter()
+    batch = [_as_tuple(p) for p in parse_queries(queries, processes=1)]
+    t_batch = time.perf_counter() - t
+
+    t = time.perf_counter()
+    parallel = [_as_tuple(p) for p in parse_queries(queries)]
+    t_parallel = time.perf_counter() - t
+
+    assert single == legacy, "parse_query output differs from the original parser"
+    assert batch == legacy and parallel == legacy, "parse_queries output differs from the original parser"
+
+    def rate(sec):
+        return f"{n / sec:>12,.0f} q/s  ({sec:.2f}s)"
+
+    print(f"{n:,} queries, outputs identical, {os.cpu_count()} CPUs")
+    print(f"original parse_query     {rate(t_legacy)}")
+    print(f"parse_query              {rate(t_single)}")
+    print(f"parse_queries, 1 process {rate(t_batch)}")
+    print(f"parse_queries, pool      {rate(t_parallel)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from backend.app.catalog import POICatalog
+
+ROWS = [
+    ("testcity", "Old Museum", "usa", "museum", 10, 540, 1020, 0.9, "40.70° N", "74.00° W"),
+    ("testcity", "Big Park", "usa", "park", 0, 360, 1320, 0.8, "40.71° N", "74.01° W"),
+    ("othercity", "Tower", "usa", "landmark", 5, 480, 1200, 0.7, "41.00° N", "73.00° W"),
+]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "pois.csv"
+    pd.DataFrame(ROWS, columns=[
+        "city_name", "place_name", "country", "place_category", "price",
+        "open_time", "close_time", "popularity_score", "lat", "lon",
+    ]).to_csv(path, index=False)
+    return POICatalog(path)
+
+
+def test_delta_upserts_and_deletes(catalog):
+    before = catalog.snapshot()
+    after = catalog.apply_delta(
+        [
+            {"city_name": "testcity", "place_name": "old museum", "popularity_score": 0.1},
+            {"city_name": "TestCity", "place_name": "New Cafe", "place_category": "food",
+             "popularity_score": 0.95, "lat": "40.72° N", "lon": "74.02° W", "country": "usa",
+             "price": 8, "open_time": 420, "close_time": 1200},
+        ],
+        deletes=[("testcity", "Big Park")],
+    )
+
+    assert after.version == before.version + 1
+    museum = after.get("testcity", "Old Museum")
+    assert museum["popularity_score"] == 0.1 and museum["place_category"] == "museum"
+    cafe = after.get("testcity", "new cafe")
+    assert cafe["lon_float"] == pytest.approx(-74.02)
+    assert after.get("testcity", "Big Park") is None
+    assert after.is_changed("testcity") and not after.is_changed("othercity")
+
+    # untouched cities are shared, and the old snapshot still sees the old data
+    assert after.partitions["othercity"] is before.partitions["othercity"]
+    assert before.get("testcity", "Old Museum")["popularity_score"] == 0.9
+    assert before.get("testcity", "Big Park") is not None
+    assert len(before) == 3 and len(after) == 3
+
+
+def test_delta_on_cold_catalog_does_not_deadlock(catalog):
+    # no snapshot() first: apply_delta has to load the base itself
+    result = {}
+
+    def update():
+        result["snap"] = catalog.apply_delta([{"city_name": "testcity", "place_name": "Big Park", "popularity_score": 0.2}])
+
+    worker = threading.Thread(target=update, daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive(), "apply_delta deadlocked on a cold catalog"
+    assert result["snap"].get("testcity", "big park")["popularity_score"] == 0.2
+
+
+def test_new_place_needs_required_fields(catalog):
+    version = catalog.snapshot().version
+    with pytest.raises(ValueError):
+        catalog.apply_delta([{"city_name": "testcity", "place_name": "Mystery Spot"}])
+    assert catalog.snapshot().version == version
+
+
+GOOGLE_RESULTS = [
+    {"city_name": "Testcity", "place_name": "Old Museum", "country": "", "place_category": "museum",
+     "price": None, "open_time": None, "close_time": None, "popularity_score": 4.9, "lat": 40.7, "lon": -74.0},
+    {"city_name": "Testcity", "place_name": "Rooftop Garden", "country": "", "place_category": "park",
+     "price": 2, "open_time": None, "close_time": None, "popularity_score": 4.5, "lat": 40.72, "lon": -74.03},
+]
+
+
+def test_google_results_are_written_through_and_persisted(tmp_path, catalog):
+    catalog.google_path = tmp_path / "google.csv"
+    fetched = catalog.record_google_results("testcity", GOOGLE_RESULTS)
+    assert list(fetched["popularity_score"]) == pytest.approx([0.98, 0.9])
+
+    snap = catalog.snapshot()
+    garden = snap.get("testcity", "rooftop garden")
+    assert garden["source"] == "google" and garden["fetched_at"] > 0
+    # curated dataset rows are not overwritten by Google data
+    assert snap.get("testcity", "old museum")["popularity_score"] == 0.9
+
+    reloaded = POICatalog(catalog.csv_path, google_path=catalog.google_path).snapshot()
+    assert reloaded.version == 0
+    assert reloaded.get("testcity", "rooftop garden")["popularity_score"] == pytest.approx(0.9)
+    assert len(reloaded) == 4
+
+
+def test_google_price_level_is_not_a_price(tmp_path, catalog):
+    catalog.google_path = tmp_path / "google.csv"
+    fetched = catalog.record_google_results("testcity", [dict(GOOGLE_RESULTS[1], price=None, price_level=4)])
+    assert fetched["price"].isna().all() and list(fetched["price_level"]) == [4]
+    garden = catalog.snapshot().get("testcity", "rooftop garden")
+    assert pd.isna(garden["price"]) and garden["price_level"] == 4
+
+    # sidecars written before price_level existed kept the level in `price`
+    pd.DataFrame([dict(GOOGLE_RESULTS[1], city_name="testcity", price=3, source="google", fetched_at=1.0)]).to_csv(
+        catalog.google_path, index=False
+    )
+    legacy = POICatalog(catalog.csv_path, google_path=catalog.google_path).snapshot().get("testcity", "rooftop garden")
+    assert pd.isna(legacy["price"]) and legacy["price_level"] == 3
+
+
+def test_google_write_through_keeps_city_unchanged(catalog):
+    catalog.record_google_results("testcity", GOOGLE_RESULTS)
+    snap = catalog.snapshot()
+    assert snap.get("testcity", "rooftop garden") is not None
+    assert not snap.is_changed("testcity")
+    assert catalog.apply_delta([{"city_name": "testcity", "place_name": "Big Park", "price": 1}]).is_changed("testcity")
+
+
+def test_sidecar_is_compacted_on_load(tmp_path, catalog):
+    catalog.google_path = tmp_path / "google.csv"
+    catalog.record_google_results("testcity", GOOGLE_RESULTS)
+    refetched = [dict(GOOGLE_RESULTS[1], popularity_score=3.0)]
+    catalog.record_google_results("testcity", refetched)
+    # the dataset match is kept too, so its google_seen_at survives a restart
+    assert len(pd.read_csv(catalog.google_path)) == 3
+
+    reloaded = POICatalog(catalog.csv_path, google_path=catalog.google_path).snapshot()
+    assert reloaded.get("testcity", "rooftop garden")["popularity_score"] == pytest.approx(0.6)
+    assert reloaded.get("testcity", "old museum")["google_seen_at"] > 0
+    # only the latest fetch of each place is kept on disk
+    assert len(pd.read_csv(catalog.google_path)) == 2
+
+
+def test_planner_serves_fresh_google_rows_from_catalog(monkeypatch, catalog):
+    from backend.app import planner
+    from backend.app.schemas import ParsedTripRequest
+
+    calls = []
+
+    def fake_search(query, city, country=""):
+        calls.append(query)
+        return GOOGLE_RESULTS
+
+    monkeypatch.setattr(planner, "get_catalog", lambda: catalog)
+    monkeypatch.setattr(planner, "search_places", fake_search)
+    parsed = ParsedTripRequest(query="", categories=[], city="Testcity", days=1)
+
+    first = planner._pois_from_google(parsed, 1)
+    second = planner._pois_from_google(parsed, 1)
+    assert len(calls) == 1
+    # dataset places Google returned are served again, with their curated values
+    assert list(first["place_name"]) == ["Old Museum", "Rooftop Garden"]
+    assert list(second["place_name"]) == ["Old Museum", "Rooftop Garden"]
+    assert list(second["source"]) == ["dataset", "google"]
+
+    planner._pois_from_google(parsed, 2)  # enough rows counting the dataset match
+    assert len(calls) == 1
+    planner._pois_from_google(parsed, 5)  # too few stored rows: live call
+    assert len(calls) == 2
+
+
+def test_delta_endpoint_needs_admin_token(monkeypatch, catalog):
+    from fastapi.testclient import TestClient
+
+    from backend.app import main
+
+    monkeypatch.setattr(main, "get_catalog", lambda: catalog)
+    client = TestClient(main.app)
+    delta = {"upserts": [{"city_name": "testcity", "place_name": "Big Park", "popularity_score": 0.1}]}
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    assert client.post("/admin/catalog/delta", json=delta).status_code == 404
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/catalog/delta", json=delta, headers={"X-TripWeaver-Admin-Token": "guess"}).status_code == 401
+    assert catalog.snapshot().get("testcity", "big park")["popularity_score"] == 0.8
+
+    applied = client.post("/admin/catalog/delta", json=delta, headers={"X-TripWeaver-Admin-Token": "secret"})
+    assert applied.status_code == 200 and applied.json()["version"] == 1
+    assert catalog.snapshot().get("testcity", "big park")["popularity_score"] == 0.1
@@ -0,0 +1,69 @@
+import pandas as pd
+
+from backend.app.catalog import POICatalog
+from backend.app.dedup import dedupe_pois
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["city_name", "place_name", "popularity_score", "lat_float", "lon_float", "source"])
+
+
+def test_clusters_near_duplicates_within_city_blocks():
+    pois = _frame([
+        ("newyork", "Central Park", 0.90, 40.7851, -73.9683, "dataset"),
+        ("newyork", "central park NYC", 0.95, 40.7853, -73.9680, "google"),
+        ("newyork", "Central Park (NYC)", 0.50, 40.7849, -73.9685, "google"),
+        ("newyork", "Central Park Zoo", 0.70, 40.7678, -73.9718, "dataset"),  # ~2 km away
+        ("newyork", "Statue of Liberty", 0.80, 40.6892, -74.0445, "dataset"),
+        ("paris", "Louvre", 0.60, 48.8606, 2.3376, "dataset"),
+        ("paris", "The Louvre Museum", 0.99, 48.8610, 2.3380, "google"),
+        ("paris", "Musee d'Orsay", 0.90, 48.8600, 2.3266, "dataset"),
+        ("london", "Central Park", 0.10, 40.7851, -73.9683, "dataset"),  # other city, same spot
+        ("newyork", "No Coordinates Park", 0.30, None, None, "dataset"),
+    ])
+    deduped, report = dedupe_pois(pois)
+
+    assert sorted(deduped["place_name"]) == sorted([
+        "Central Park", "Central Park Zoo", "Statue of Liberty", "Louvre", "Musee d'Orsay",
+        "Central Park", "No Coordinates Park",
+    ])
+    assert len(report) == 3
+    by_name = report.set_index("place_name")
+    # dataset rows stay canonical even when the Google copy is more popular
+    assert by_name.loc["The Louvre Museum", "canonical_name"] == "Louvre"
+    assert by_name.loc["central park NYC", "canonical_name"] == "Central Park"
+    assert (report["distance_m"] < 150).all() and (report["name_sim"] >= 0.5).all()
+
+
+def test_catalog_dedups_google_rows_on_load(tmp_path):
+    csv = tmp_path / "pois.csv"
+    pd.DataFrame([
+        ("testcity", "Old Museum", "usa", "museum", 10, 540, 1020, 0.9, 40.70, -74.00),
+        ("testcity", "Big Park", "usa", "park", 0, 360, 1320, 0.8, 40.71, -74.01),
+    ], columns=[
+        "city_name", "place_name", "country", "place_category", "price",
+        "open_time", "close_time", "popularity_score", "lat", "lon",
+    ]).to_csv(csv, index=False)
+    google = tmp_path / "google.csv"
+    writer = POICatalog(csv, google_path=google)
+    writer.record_google_results("testcity", [
+        {"place_name": "Old Museum NYC", "country": "", "place_category": "museum", "price": None,
+         "open_time": None, "close_time": None, "popularity_score": 4.9, "lat": 40.7001, "lon": -74.0002},
+    ])
+    assert len(writer.snapshot()) == 3
+
+    catalog = POICatalog(csv, google_path=google, dedup=True)
+    assert sorted(catalog.snapshot().frame()["place_name"]) == ["Big Park", "Old Museum"]
+    assert list(catalog.dedup_report["place_name"]) == ["Old Museum NYC"]
+
+    # a refetch of the duplicate is dropped again and not re-persisted
+    persisted = len(pd.read_csv(google))
+    catalog.record_google_results("testcity", [
+        {"place_name": "Old Museum NYC", "country": "", "place_category": "museum", "price": None,
+         "open_time": None, "close_time": None, "popularity_score": 4.8, "lat": 40.7001, "lon": -74.0002},
+    ])
+    snap = catalog.snapshot()
+    assert sorted(snap.frame()["place_name"]) == ["Big Park", "Old Museum"]
+    assert len(pd.read_csv(google)) == persisted
+    assert not snap.is_changed("testcity")
+    assert list(catalog.dedup_report["place_name"]) == ["Old Museum NYC", "Old Museum NYC"]
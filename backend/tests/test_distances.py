@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from backend.app import distances
+from backend.app.distances import build_city, haversine_matrix_km, pairwise
+from backend.app.optimizer import _haversine_km
+
+
+def _pois():
+    return pd.DataFrame({
+        "city_name": ["paris"] * 4,
+        "place_name": ["Louvre", "Orsay", "Eiffel Tower", "Sacre Coeur"],
+        "place_category": ["museum", "museum", "landmark", "landmark"],
+        "popularity_score": [0.9, 0.8, 0.95, 0.5],
+        "lat_float": [48.8606, 48.8600, 48.8584, 48.8867],
+        "lon_float": [2.3376, 2.3266, 2.2945, 2.3431],
+    })
+
+
+def test_matrix_matches_scalar_haversine():
+    df = _pois()
+    km = haversine_matrix_km(df["lat_float"], df["lon_float"])
+    assert km.shape == (4, 4) and np.allclose(np.diag(km), 0.0)
+    expected = _haversine_km(48.8606, 2.3376, 48.8584, 2.2945)
+    assert abs(km[0, 2] - expected) < 1e-9 and np.allclose(km, km.T)
+
+
+def test_pairwise_mixes_precomputed_and_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(distances, "DISTANCE_DIR", tmp_path)
+    monkeypatch.setattr(distances, "_MATRICES", {})
+    df = _pois()
+    assert build_city(df, tmp_path / "paris", top_n=3) == 3  # Sacre Coeur left out
+
+    matrix = distances.get_city_matrix("Paris")
+    assert isinstance(matrix.km, np.memmap) and matrix.km.dtype == np.float32
+    assert "sacre coeur" not in matrix.index
+
+    query = df.iloc[[3, 0, 2]].reset_index(drop=True)
+    km, minutes = pairwise("paris", query)
+    full = haversine_matrix_km(query["lat_float"], query["lon_float"])
+    assert km.dtype == np.float32 and np.allclose(km, full, atol=1e-3)
+    assert np.allclose(minutes, distances.travel_minutes(full), atol=1e-2)
+    assert minutes[1, 2] > minutes[1, 1] == 0.0
+
+
+def test_mmr_uses_precomputed_city_matrix(tmp_path, monkeypatch):
+    from backend.app import optimizer
+    from backend.app.schemas import ParsedTripRequest
+
+    monkeypatch.setattr(distances, "DISTANCE_DIR", tmp_path)
+    monkeypatch.setattr(distances, "_MATRICES", {})
+    df = _pois()
+    build_city(df, tmp_path / "paris", top_n=3)  # Sacre Coeur falls back to haversine
+    rows = []
+
+    class RowSpy:
+        def __getitem__(self, key):
+            rows.append(key[0])
+            return distances.get_city_matrix("paris").km[key]
+
+    class SpyMatrix:
+        index = distances.get_city_matrix("paris").index
+        km = RowSpy()
+
+    monkeypatch.setattr(optimizer, "get_city_matrix", lambda key: SpyMatrix() if key == "paris" else None)
+    prefs = ParsedTripRequest(query="", categories=[], city="Paris")
+    with_matrix = optimizer.select_pois_mmr(df, prefs, 4, diversity=0.5, city_key="paris")
+    assert with_matrix == optimizer.select_pois_mmr(df, prefs, 4, diversity=0.5)
+    # one matrix row per precomputed pick, no n x n matrix
+    assert len(rows) == 3 and all(np.isscalar(r) or np.ndim(r) == 0 for r in rows)
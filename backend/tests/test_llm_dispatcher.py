@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from backend.app.llm_dispatcher import BATCH, INTERACTIVE, LLMDispatcher
+from backend.app.resilience import DependencyUnavailable
+
+
+def _start(dispatcher, kind, traffic, order, deadline=None):
+    def run():
+        try:
+            ticket = dispatcher.acquire(kind, 10, traffic, deadline)
+        except DependencyUnavailable:
+            order.append(f"shed:{traffic}:{kind}")
+            return
+        order.append(f"{traffic}:{kind}")
+        dispatcher.release(ticket, 10)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(dispatcher, n):
+    for _ in range(200):
+        if len(dispatcher._queue) == n:
+            return
+        time.sleep(0.005)
+    raise AssertionError("calls were not queued")
+
+
+def test_priority_order_parse_and_interactive_first():
+    dispatcher = LLMDispatcher(rpm=1000, tpm=100000, max_concurrency=1, queue_max=10)
+    holder = dispatcher.acquire("explain", 10)
+    order = []
+    threads = []
+    for kind, traffic in [("explain", BATCH), ("parse", BATCH), ("explain", INTERACTIVE), ("parse", INTERACTIVE)]:
+        threads.append(_start(dispatcher, kind, traffic, order))
+        _wait_queued(dispatcher, len(threads))
+    dispatcher.release(holder, 10)
+    for t in threads:
+        t.join(timeout=5)
+    assert order == ["interactive:parse", "interactive:explain", "batch:parse", "batch:explain"]
+
+
+def test_full_queue_evicts_lowest_priority():
+    dispatcher = LLMDispatcher(rpm=1000, tpm=100000, max_concurrency=1, queue_max=1)
+    holder = dispatcher.acquire("parse", 10)
+    order = []
+    batch = _start(dispatcher, "explain", BATCH, order)
+    _wait_queued(dispatcher, 1)
+    live = _start(dispatcher, "parse", INTERACTIVE, order)
+    batch.join(timeout=5)
+    assert order == ["shed:batch:explain"]
+    with pytest.raises(DependencyUnavailable):
+        dispatcher.acquire("explain", 10, BATCH)  # queue full with a better call
+    dispatcher.release(holder, 10)
+    live.join(timeout=5)
+    assert order[-1] == "interactive:parse"
+
+
+def test_rate_limited_call_is_shed_before_its_deadline():
+    dispatcher = LLMDispatcher(rpm=1, tpm=100000, max_concurrency=4, queue_max=10)
+    dispatcher.release(dispatcher.acquire("parse", 10), 10)  # spend the only request this minute
+    started = time.monotonic()
+    with pytest.raises(DependencyUnavailable):
+        dispatcher.acquire("parse", 10, deadline=started + 2.0)
+    assert time.monotonic() - started < 0.5
+    assert dispatcher.snapshot()["shed"] == 1
+
+
+def test_open_circuit_does_not_spend_rate_limit(monkeypatch):
+    from backend.app import llm_dispatcher, resilience
+    from backend.app.resilience import CircuitBreaker
+
+    dispatcher = LLMDispatcher(rpm=10, tpm=1000)
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_timeout_s=60)
+    breaker.record_failure()
+    monkeypatch.setattr(llm_dispatcher, "_DISPATCHER", dispatcher)
+    monkeypatch.setitem(resilience._BREAKERS, "openai", breaker)
+    messages = [{"role": "user", "content": "hi"}]
+
+    for _ in range(20):
+        with pytest.raises(DependencyUnavailable, match="circuit open"):
+            llm_dispatcher.dispatch("parse", messages, lambda: None, max_tokens=50)
+    assert dispatcher.requests.tokens == pytest.approx(10, abs=0.5)
+    assert dispatcher.tokens.tokens == pytest.approx(1000, abs=1)
+
+    # refused after it was granted (e.g. budget spent): everything is refunded
+    ticket = dispatcher.acquire("parse", 100)
+    dispatcher.release(ticket, None, refund=True)
+    assert dispatcher.requests.tokens == pytest.approx(10, abs=0.5) and dispatcher.in_flight == 0
@@ -0,0 +1,72 @@
+import re
+from types import SimpleNamespace
+
+from backend.app import llm_explainer, prompts, shared_cache
+from backend.app.schemas import TripRequest, ParsedTripRequest, TripPlan, DayPlan, Place
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        m = re.search(r'Day: \{"n":(\d+)', kwargs["messages"][-1]["content"])
+        if m:
+            text = f"Day {m.group(1)}: a day out."
+        else:
+            text = "A short summary."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def _plan():
+    return TripPlan(city="Paris", days=[
+        DayPlan(day=1, places=[Place(name="louvre museum", category="museum")]),
+        DayPlan(day=2, places=[Place(name="eiffel tower", category="landmark")]),
+    ])
+
+
+def test_split_and_join_roundtrip():
+    text = "Overall summary.\n\nDay 1: first day.\n\nMore on day one.\n\nDay 2 - second day."
+    summary, days = llm_explainer.split_explanation(text)
+    assert summary == "Overall summary."
+    assert days == {1: "Day 1: first day.\n\nMore on day one.", 2: "Day 2 - second day."}
+    assert llm_explainer.join_explanation(summary, days) == text
+
+
+def test_per_day_mode_is_ordered_and_cached(monkeypatch):
+    fake = _FakeCompletions()
+    monkeypatch.setattr(llm_explainer, "client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+    monkeypatch.setattr(shared_cache, "_CACHE", shared_cache.SharedCache())
+
+    req = TripRequest(query="2 days in Paris")
+    parsed = ParsedTripRequest(query=req.query, categories=[], city="Paris", days=2)
+
+    text = llm_explainer.build_itinerary_explanation(req, parsed, _plan(), mode="per_day")
+    assert text == "A short summary.\n\nDay 1: a day out.\n\nDay 2: a day out."
+    assert len(fake.calls) == 3
+    assert all(c["max_tokens"] for c in fake.calls)
+
+    llm_explainer.build_itinerary_explanation(req, parsed, _plan(), mode="per_day")
+    assert len(fake.calls) == 3
+
+
+def test_compact_plan_and_usage(monkeypatch):
+    fake = _FakeCompletions()
+    monkeypatch.setattr(shared_cache, "_CACHE", shared_cache.SharedCache())
+    monkeypatch.setattr(llm_explainer, "client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+
+    plan = _plan()
+    plan.days[0].places[0].description = "The Louvre is the world's most-visited museum. " * 20
+    compact = prompts.compact_plan(plan, wiki_chars=60)
+    assert '"w":"The Louvre is the world\'s most-visited museum."' in compact
+    assert "description" not in compact and "null" not in compact
+    assert len(compact) < len(plan.model_dump_json())
+
+    req = TripRequest(query="2 days in Paris")
+    parsed = ParsedTripRequest(query=req.query, categories=[], city="Paris", days=2)
+    with prompts.track_usage() as usage:
+        llm_explainer.build_itinerary_explanation(req, parsed, plan, mode="monolithic")
+    assert usage.calls == 1
+    assert usage.input_tokens > 0 and usage.output_tokens > 0
+    assert fake.calls[0]["messages"][0]["content"] == prompts.EXPLAIN_INSTRUCTIONS
@@ -0,0 +1,90 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from backend.app.optimizer import score_array, select_pois_budgeted, select_pois_greedy, select_pois_mmr
+from backend.app.planner import _assign_days, _day_sizes, _day_spend_cap, _price, _spend_cap
+from backend.app.schemas import ParsedTripRequest, TripRequest
+
+PREFS = ParsedTripRequest(query="", categories=["museum"], explicit_categories=True, city="x")
+
+
+def _frame(rng, n):
+    return pd.DataFrame({
+        "place_name": [f"p{i}" for i in range(n)],
+        "place_category": rng.choice(["museum", "park", "food"], n),
+        "popularity_score": rng.random(n),
+        "price": rng.choice([0, 5, 10, 20, 40, 80], n).astype(float),
+    })
+
+
+def test_budgeted_matches_greedy_when_cap_is_loose():
+    df = _frame(np.random.default_rng(1), 30)
+    assert select_pois_budgeted(df, PREFS, 6, None) == select_pois_greedy(df, PREFS, 6)
+    assert select_pois_budgeted(df, PREFS, 6, 1e9) == select_pois_greedy(df, PREFS, 6)
+
+
+def test_budgeted_respects_cap_and_is_near_optimal():
+    rng = np.random.default_rng(0)
+    ratios = []
+    for _ in range(50):
+        df = _frame(rng, 10)
+        k, cap = 4, float(rng.choice([10, 25, 50, 90]))
+        picked = select_pois_budgeted(df, PREFS, k, cap)
+        assert len(picked) <= k
+        assert sum(r["price"] for r in picked) <= cap
+
+        scores, prices = score_array(df, PREFS), df["price"].to_numpy()
+        got = sum(scores[int(r["place_name"][1:])] for r in picked)
+        best = max(
+            scores[list(c)].sum()
+            for r in range(k + 1)
+            for c in itertools.combinations(range(len(df)), r)
+            if prices[list(c)].sum() <= cap
+        )
+        ratios.append(got / best if best else 1.0)
+    assert min(ratios) > 0.8 and np.mean(ratios) > 0.97
+
+
+def test_mmr_without_diversity_is_score_order():
+    df = _frame(np.random.default_rng(2), 30)
+    assert select_pois_mmr(df, PREFS, 6, diversity=0.0) == select_pois_greedy(df, PREFS, 6)
+
+
+def test_mmr_mixes_categories_and_spreads_out():
+    prefs = ParsedTripRequest(query="", categories=["museum", "park"], explicit_categories=True, city="x")
+    df = pd.DataFrame({
+        "place_name": ["m1", "m2", "m3", "m4", "p1", "p2"],
+        "place_category": ["museum"] * 4 + ["park"] * 2,
+        "popularity_score": [0.95, 0.94, 0.93, 0.92, 0.80, 0.79],
+        # m1 and m2 sit on the same block
+        "lat_float": [40.700, 40.7001, 40.75, 40.80, 40.72, 40.78],
+        "lon_float": [-74.00, -74.0001, -73.95, -73.90, -73.98, -73.92],
+    })
+    assert {r["place_category"] for r in select_pois_mmr(df, prefs, 3, diversity=0.0)} == {"museum"}
+    picked = [r["place_name"] for r in select_pois_mmr(df, prefs, 3, diversity=0.4)]
+    assert picked[0] == "m1" and "m2" not in picked
+    assert any(name.startswith("p") for name in picked)
+
+
+def test_spend_cap_resolution():
+    parsed = ParsedTripRequest(query="", categories=[], city="Paris", days=3, budget="low")
+    assert _spend_cap(TripRequest(query=""), parsed) == 90.0
+    assert _spend_cap(TripRequest(query="", budget="high"), parsed) is None
+    assert _spend_cap(TripRequest(query="", max_spend_per_day=20, max_spend_total=50), parsed) == 50.0
+    assert _day_spend_cap(TripRequest(query=""), parsed) == 30.0
+    assert _day_spend_cap(TripRequest(query="", max_spend_total=50), parsed) is None
+
+
+def test_assign_days_keeps_each_day_under_cap():
+    records = [{"place_name": f"p{i}", "price": price} for i, price in enumerate([20, 20, 5, 5, 0, 0, 45])]
+    arranged = _assign_days(records, days=3, day_cap=25)
+
+    # the 45 place fits on no day; the two 20s go to different days
+    assert [r["place_name"] for r in arranged if r["price"] == 45] == []
+    offset = 0
+    for size in _day_sizes(len(arranged), 3):
+        assert sum(_price(r) for r in arranged[offset:offset + size]) <= 25
+        offset += size
+    assert _assign_days(records, days=3, day_cap=None) == records
@@ -0,0 +1,30 @@
+import pytest
+
+from backend.app.parser import parse_query, parse_queries
+
+
+def test_parse_query_categories_days_city():
+    parsed = parse_query("3 days in Paris visiting Museums, art and PARKS and bars")
+    assert parsed.categories == ["museum", "park", "food"]
+    assert parsed.explicit_categories is True
+    assert parsed.city == "Paris"
+    assert parsed.days == 3
+
+
+def test_parse_query_requires_city():
+    with pytest.raises(ValueError):
+        parse_query("museums and parks")
+
+
+def test_parse_queries_matches_parse_query():
+    queries = [
+        "food and landmarks in New York for 2 days",
+        "things to see in Tokyo",
+        "no city here",
+        "sightseeing123 around Rome 4",
+    ]
+    batch = parse_queries(queries, processes=1)
+    assert batch[2] is None
+    for q, parsed in zip(queries, batch):
+        if parsed is not None:
+            assert parsed == parse_query(q)
@@ -0,0 +1,73 @@
+import pytest
+
+from backend.app import plan_store, planner, precompute
+from backend.app.plan_store import PlanStore, plan_key
+from backend.app.schemas import DayPlan, Place, TripPlan, TripRequest
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(planner, "llm_parse_to_parsed_trip_request", lambda query, base: base)
+    monkeypatch.setattr(planner, "get_poi_summary", lambda name, sentences=2: f"About {name}")
+    monkeypatch.setattr(planner, "build_itinerary_explanation", lambda req, parsed, plan: "explained")
+
+
+def _plan():
+    return TripPlan(city="newyork", days=[DayPlan(day=1, places=[Place(name="Central Park", category="park")])])
+
+
+def test_plan_key_normalises_categories():
+    a = plan_key("newyork", 2, 5, [" Museum", "park", "museum"], True)
+    assert a == plan_key("newyork", 2, 5, ["park", "museum"], True)
+    assert a != plan_key("newyork", 2, 5, ["park"], True)
+    # inferred categories do not change the offline plan
+    assert plan_key("newyork", 2, 5, ["landmark"], False) == plan_key("newyork", 2, 5, [], False)
+
+
+def test_store_round_trip(tmp_path):
+    path = tmp_path / "plans.sqlite"
+    key = plan_key("newyork", 1, 5, [], False)
+    assert PlanStore(path, readonly=False).put_many([(key, _plan(), False, False)]) == 1
+
+    stored = PlanStore(path).get(key)
+    assert stored.plan == _plan() and stored.enriched is False
+    assert PlanStore(path).get(plan_key("paris", 1, 5, [], False)) is None
+
+
+def test_precompute_then_serve_stored_plan(tmp_path, monkeypatch):
+    path = tmp_path / "plans.sqlite"
+    written = precompute.run(out=path, cities=["newyork"], days=[2], paces=["standard"], category_sets=[()], workers=1)
+    assert written == 1
+    monkeypatch.setattr(plan_store, "_STORE", PlanStore(path))
+
+    def live(*args, **kwargs):
+        raise AssertionError("stored plan expected")
+
+    monkeypatch.setattr(planner, "_plan_from_parsed", live)
+    plan = planner.dummy_plan(TripRequest(query="2 days in New York"))
+
+    stored = PlanStore(path).get(plan_key("newyork", 2, 5, [], False)).plan
+    assert plan.city == "New York" and len(plan.days) == 2
+    assert [p.name for d in plan.days for p in d.places] == [p.name for d in stored.days for p in d.places]
+    # enriched live, since precompute ran without Wikipedia
+    assert all(p.description == f"About {p.name}" for d in plan.days for p in d.places)
+    assert plan.explanation == "explained"
+
+
+def test_changed_city_falls_back_to_live_plan(tmp_path, monkeypatch):
+    path = tmp_path / "plans.sqlite"
+    PlanStore(path, readonly=False).put_many([(plan_key("newyork", 1, 5, [], False), _plan(), True, False)])
+    monkeypatch.setattr(plan_store, "_STORE", PlanStore(path))
+
+    class ChangedSnapshot:
+        def is_changed(self, city):
+            return city == "newyork"
+
+    class ChangedCatalog:
+        def snapshot(self):
+            return ChangedSnapshot()
+
+    live = TripPlan(city="New York", days=[])
+    monkeypatch.setattr(planner, "get_catalog", lambda: ChangedCatalog())
+    monkeypatch.setattr(planner, "_plan_from_parsed", lambda req, parsed: live)
+    assert planner.dummy_plan(TripRequest(query="1 day in New York")) is live
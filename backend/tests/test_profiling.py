@@ -0,0 +1,50 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from backend.app import main, profiling
+from backend.app.response_cache import ResponseCache
+from backend.app.schemas import TripPlan
+
+
+def test_categorize_uses_innermost_matching_frame():
+    frames = [
+        ("/site-packages/pandas/core/frame.py", "__getitem__"),
+        ("/x/backend/app/retrieval.py", "filter_pois_by_category"),
+        ("/x/backend/app/planner.py", "_load_candidates"),
+    ]
+    assert profiling.categorize(frames) == "pandas"
+    assert profiling.categorize(frames[1:]) == "retrieval"
+    assert profiling.categorize([("/x/backend/app/resilience.py", "call_dependency"),
+                                 ("/x/backend/app/llm_explainer.py", "_complete")]) == "llm"
+    assert profiling.categorize([("/x/backend/app/main.py", "create_plan")]) == "other"
+
+
+def test_profiled_request_is_saved_and_listed(tmp_path, monkeypatch):
+    def slow_plan(req):
+        time.sleep(0.1)
+        return TripPlan(city="Paris", days=[])
+
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(main, "dummy_plan", slow_plan)
+    monkeypatch.setattr(main, "plan_cache", ResponseCache(ttl_s=60))
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    client = TestClient(main.app)
+    admin = {"X-TripWeaver-Admin-Token": "secret"}
+
+    plain = client.post("/plan", json={"query": "2 days in Paris"})
+    assert "X-TripWeaver-Profile-Id" not in plain.headers
+
+    resp = client.post("/plan", json={"query": "2 days in Paris"}, headers={"X-TripWeaver-Profile": "1"})
+    profile_id = resp.headers["X-TripWeaver-Profile-Id"]
+    assert resp.headers["X-Cache"] == "BYPASS"
+
+    assert client.get("/admin/profiles").status_code == 401
+    listed = client.get("/admin/profiles", headers=admin).json()["profiles"]
+    assert [p["id"] for p in listed] == [profile_id]
+    assert listed[0]["samples"] > 0
+
+    folded = client.get(f"/admin/profiles/{profile_id}", headers=admin).text
+    assert "test_profiling.slow_plan" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+    assert client.get("/admin/profiles/not-an-id", headers=admin).status_code == 404
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from backend.app import resilience
+from backend.app.resilience import CircuitBreaker, DependencyUnavailable, call_dependency
+
+
+def _boom():
+    raise ConnectionError("down")
+
+
+def test_breaker_opens_and_probes(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_s=0.05)
+    monkeypatch.setitem(resilience._BREAKERS, "flaky", breaker)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call_dependency("flaky", _boom, timeout_s=1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # open: short-circuits without calling the dependency
+    calls = []
+    with pytest.raises(DependencyUnavailable):
+        call_dependency("flaky", lambda: calls.append(1), timeout_s=1)
+    assert calls == []
+
+    # after the reset timeout one probe goes through and closes the breaker
+    time.sleep(0.06)
+    assert call_dependency("flaky", lambda: "ok", timeout_s=1) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_call_times_out_and_counts_as_failure(monkeypatch):
+    breaker = CircuitBreaker("slow", failure_threshold=1, reset_timeout_s=60)
+    monkeypatch.setitem(resilience._BREAKERS, "slow", breaker)
+    monkeypatch.setitem(resilience.DEPENDENCY_TIMEOUTS, "slow", 0.05)
+
+    started = time.monotonic()
+    with pytest.raises(DependencyUnavailable):
+        call_dependency("slow", lambda: time.sleep(0.5))
+    assert time.monotonic() - started < 0.3
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stage_budget_caps_calls():
+    with resilience.request_budget(total_s=1.0):
+        with resilience.stage("enrich"):
+            time.sleep(0.35)  # enrich share is 0.3s
+            with pytest.raises(DependencyUnavailable):
+                call_dependency("wikipedia", lambda: "never")
+
+
+def test_full_pool_fails_fast_without_starving_others(monkeypatch):
+    monkeypatch.setitem(resilience._BREAKERS, "stuck", CircuitBreaker("stuck", failure_threshold=100))
+    monkeypatch.setitem(resilience._POOLS, "stuck", resilience.DependencyPool("stuck", size=1))
+    release = threading.Event()
+
+    # the timed-out call keeps its worker until it really returns
+    with pytest.raises(DependencyUnavailable):
+        call_dependency("stuck", release.wait, timeout_s=0.05)
+    started = time.monotonic()
+    with pytest.raises(DependencyUnavailable, match="busy"):
+        call_dependency("stuck", lambda: "never", timeout_s=1)
+    assert time.monotonic() - started < 0.1
+
+    # other dependencies have their own workers
+    assert call_dependency("other", lambda: "ok", timeout_s=1) == "ok"
+
+    release.set()
+    time.sleep(0.05)
+    assert call_dependency("stuck", lambda: "ok", timeout_s=1) == "ok"
+
+
+def test_failed_call_marks_budget_degraded(monkeypatch):
+    monkeypatch.setitem(resilience._BREAKERS, "flaky", CircuitBreaker("flaky", failure_threshold=100))
+    with resilience.request_budget() as budget:
+        with pytest.raises(ConnectionError):
+            call_dependency("flaky", _boom, timeout_s=1)
+    assert budget.degraded
+
+
+def test_wikipedia_miss_is_not_a_failure(monkeypatch):
+    from backend.app import wikipedia as wiki_module
+
+    def ambiguous(title, auto_suggest=True):
+        raise wiki_module.wikipedia.exceptions.DisambiguationError(title, ["A", "B"])
+
+    breaker = CircuitBreaker("wikipedia", failure_threshold=2)
+    monkeypatch.setitem(resilience._BREAKERS, "wikipedia", breaker)
+    monkeypatch.setattr(wiki_module, "_direct_summary", lambda name: "")
+    monkeypatch.setattr(wiki_module.wikipedia, "search", lambda name: [name])
+    monkeypatch.setattr(wiki_module.wikipedia, "summary", ambiguous)
+
+    with resilience.request_budget() as budget:
+        for name in ["Main Square", "Old Town", "Harbour"]:
+            assert wiki_module._fetch_summary(name) is None
+    assert breaker.state == CircuitBreaker.CLOSED and not budget.degraded
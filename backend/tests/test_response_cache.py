@@ -0,0 +1,86 @@
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.response_cache import ResponseCache, request_key
+from backend.app.schemas import TripPlan, TripRequest
+
+
+def test_request_key_is_canonical():
+    a = TripRequest(query="  2 days in  Paris ", pace="Packed", data_source="OFFLINE")
+    b = TripRequest(query="2 days in Paris", pace="packed", data_source="offline")
+    assert request_key(a) == request_key(b)
+    assert request_key(a) != request_key(TripRequest(query="3 days in Paris"))
+
+
+def test_cache_evicts_by_entries_and_bytes():
+    cache = ResponseCache(ttl_s=60, max_entries=2, max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.put("c", b"1234")
+    assert cache.get("a") is None and cache.get("c") is not None
+    cache.put("d", b"12345678")
+    assert cache.get("b") is None and cache.get("c") is None
+
+
+def test_plan_endpoint_etag_and_bypass(monkeypatch):
+    calls = []
+
+    def fake_plan(req):
+        calls.append(req)
+        return TripPlan(city="Paris", days=[])
+
+    monkeypatch.setattr(main, "dummy_plan", fake_plan)
+    monkeypatch.setattr(main, "plan_cache", ResponseCache(ttl_s=60))
+    client = TestClient(main.app)
+    body = {"query": "2 days in Paris"}
+
+    first = client.post("/plan", json=body)
+    assert first.status_code == 200 and first.headers["X-Cache"] == "MISS"
+    assert first.json() == {"city": "Paris", "days": [], "explanation": None}
+
+    second = client.post("/plan", json=body)
+    assert second.headers["X-Cache"] == "HIT" and second.content == first.content
+    assert len(calls) == 1
+
+    not_modified = client.post("/plan", json=body, headers={"If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+
+    client.post("/plan", json=body, headers={"X-TripWeaver-Cache": "bypass"})
+    assert len(calls) == 2
+
+
+def test_plan_with_failed_explanation_is_not_cached(monkeypatch):
+    from backend.app import planner
+
+    def broken_explainer(req, parsed, plan):
+        raise RuntimeError("openai: 500")
+
+    monkeypatch.setattr(planner, "get_poi_summary", lambda name, sentences=2: None)
+    monkeypatch.setattr(planner, "llm_parse_to_parsed_trip_request", lambda query, base: base)
+    monkeypatch.setattr(planner, "build_itinerary_explanation", broken_explainer)
+    monkeypatch.setattr(main, "plan_cache", ResponseCache(ttl_s=60))
+    client = TestClient(main.app)
+    body = {"query": "2 days in New York", "max_places_per_day": 2}
+
+    first = client.post("/plan", json=body)
+    assert first.status_code == 200 and first.json()["explanation"] is None
+    assert first.headers["X-Cache"] == "MISS"
+    assert client.post("/plan", json=body).headers["X-Cache"] == "MISS"
+
+
+def test_plan_without_keys_is_cached(monkeypatch):
+    # no OpenAI key, Wikipedia off: permanent fallbacks, not a degraded plan
+    from backend.app import llm_explainer, llm_parser, wikipedia
+
+    monkeypatch.setattr(llm_parser, "client", None)
+    monkeypatch.setattr(llm_explainer, "client", None)
+    monkeypatch.setattr(wikipedia, "WIKI_OFFLINE", True)
+    monkeypatch.setattr(wikipedia, "lookup_summary", lambda name: None)
+    monkeypatch.setattr(main, "plan_cache", ResponseCache(ttl_s=60))
+    client = TestClient(main.app)
+    body = {"query": "2 days in New York", "max_places_per_day": 2}
+
+    first = client.post("/plan", json=body)
+    assert first.status_code == 200 and first.headers["X-Cache"] == "MISS"
+    assert len(first.json()["days"]) == 2
+    assert client.post("/plan", json=body).headers["X-Cache"] == "HIT"
@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import planner, sessions
+from backend.app.main import app
+from backend.app.schemas import PlanEdit, PoiSwap, TripRequest
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """No network: canned descriptions, explanations recorded per day."""
+    calls = {"days": [], "summary": 0}
+    monkeypatch.setattr(planner, "get_poi_summary", lambda name, sentences=2: f"About {name}.")
+    monkeypatch.setattr(sessions, "build_explanation_parts", lambda req, parsed, plan: (
+        "Summary v0", {d.day: f"Day {d.day}: v0" for d in plan.days}
+    ))
+
+    def day_explanation(req, parsed, day_plan):
+        calls["days"].append(day_plan.day)
+        return f"Day {day_plan.day}: v1"
+
+    def trip_summary(req, parsed, plan):
+        calls["summary"] += 1
+        return "Summary v1"
+
+    monkeypatch.setattr(sessions, "build_day_explanation", day_explanation)
+    monkeypatch.setattr(sessions, "build_trip_summary", trip_summary)
+    return calls
+
+
+def _names(session, day):
+    return [p.name for p in session.plan.days[day - 1].places]
+
+
+def _session():
+    return sessions.create_session(TripRequest(query="2 days in New York", max_places_per_day=2))
+
+
+def test_create_and_get():
+    session = _session()
+    assert sessions.get_session(session.plan_id) is session
+    assert [len(d.places) for d in session.plan.days] == [2, 2]
+    assert session.plan.days[0].places[0].description.startswith("About ")
+    assert session.plan.explanation == "Summary v0\n\nDay 1: v0\n\nDay 2: v0"
+    assert sessions.get_session("nope") is None
+
+
+def test_swap_changes_only_the_edited_day(offline):
+    session = _session()
+    day1, day2 = _names(session, 1), _names(session, 2)
+
+    changed = sessions.apply_edit(session, PlanEdit(swaps=[PoiSwap(day=1, place=day1[0])]))
+    assert changed == [1]
+    assert _names(session, 1)[0] not in day1 + day2 and _names(session, 1)[1] == day1[1]
+    assert _names(session, 2) == day2
+    # only the changed day is re-explained; summary and day 2 are kept
+    assert offline["days"] == [1] and offline["summary"] == 0
+    assert session.plan.explanation == "Summary v0\n\nDay 1: v1\n\nDay 2: v0"
+
+
+def test_reselect_after_constraint_change(offline):
+    session = _session()
+    swapped_out = _names(session, 1)[0]
+    sessions.apply_edit(session, PlanEdit(swaps=[PoiSwap(day=1, place=swapped_out)]))
+
+    changed = sessions.apply_edit(session, PlanEdit(max_places_per_day=3))
+    assert [len(d.places) for d in session.plan.days] == [3, 3]
+    assert changed == [1, 2] and offline["summary"] == 1
+    assert swapped_out not in {p.name for d in session.plan.days for p in d.places}
+
+
+def test_endpoints_and_errors():
+    client = TestClient(app)
+    created = client.post("/plan/sessions", json={"query": "2 days in New York", "max_places_per_day": 2})
+    assert created.status_code == 200
+    plan_id = created.json()["plan_id"]
+    assert created.json()["recomputed_days"] == [1, 2]
+
+    assert client.get(f"/plan/sessions/{plan_id}").json()["plan"] == created.json()["plan"]
+    assert client.get("/plan/sessions/unknown").status_code == 404
+    assert client.patch("/plan/sessions/unknown", json={"pace": "packed"}).status_code == 404
+
+    bad_place = client.patch(f"/plan/sessions/{plan_id}", json={"swaps": [{"day": 1, "place": "Nowhere"}]})
+    assert bad_place.status_code == 422
+    bad_replacement = client.patch(f"/plan/sessions/{plan_id}", json={"swaps": [
+        {"day": 1, "place": created.json()["plan"]["days"][0]["places"][0]["name"], "replacement": "Nowhere"},
+    ]})
+    assert bad_replacement.status_code == 422
+
+
+def test_rejected_edit_leaves_session_unchanged():
+    session = _session()
+    before = (session.request, [r["place_name"] for r in session.records], set(session.excluded), session.plan)
+
+    with pytest.raises(ValueError):
+        sessions.apply_edit(session, PlanEdit(max_places_per_day=4, swaps=[PoiSwap(day=1, place="Nowhere")]))
+    assert (session.request, [r["place_name"] for r in session.records], session.excluded, session.plan) == before
+
+    # an empty edit afterwards must not apply the rejected one
+    assert sessions.apply_edit(session, PlanEdit()) == []
+    assert [len(d.places) for d in session.plan.days] == [2, 2]
+
+
+def test_replacement_already_in_plan_is_rejected():
+    session = _session()
+    day1, day2 = _names(session, 1), _names(session, 2)
+    with pytest.raises(ValueError, match="already in the plan"):
+        sessions.apply_edit(session, PlanEdit(swaps=[PoiSwap(day=1, place=day1[0], replacement=day2[0])]))
+    assert _names(session, 1) == day1 and _names(session, 2) == day2
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from backend.app import shared_cache
+from backend.app.shared_cache import SQLiteBackend, SharedCache, dumps, loads
+
+
+def test_roundtrip_and_shared_l2(tmp_path):
+    value = {"summary": "A park. " * 100, "n": [1, 2.5, None]}
+    blob = dumps(value)
+    assert blob[:1] == b"z" and len(blob) < 200 and loads(blob) == value
+    assert loads(dumps("short")) == "short"
+
+    l2 = SQLiteBackend(tmp_path / "cache.db")
+    worker_a, worker_b = SharedCache(l2), SharedCache(SQLiteBackend(tmp_path / "cache.db"))
+    calls = []
+    compute = lambda: calls.append(1) or value
+
+    assert worker_a.get_or_compute("wiki", "k", compute) == value
+    got = worker_b.get_or_compute("wiki", "k", compute)
+    assert got == value and len(calls) == 1
+    assert worker_b.stats["l2_hits"] == 1
+    got["n"].append(3)  # hits are copies
+    assert worker_b.get_or_compute("wiki", "k", compute) == value
+    assert worker_b.stats["l1_hits"] == 1
+
+    # results rejected by cache_if are not stored
+    assert worker_a.get_or_compute("wiki", "none", lambda: None, cache_if=bool) is None
+    assert worker_b.get("wiki", "none") == (False, None)
+
+
+def test_stampede_protection(tmp_path):
+    cache = SharedCache(SQLiteBackend(tmp_path / "cache.db"))
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"city": "Paris"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("parse", "q", slow))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [{"city": "Paris"}] * 8 and len(calls) == 1
+    # every waiter gets its own copy
+    assert len({id(r) for r in results}) == 8
+
+    # another worker holds the lease: wait for its result instead of computing
+    other = SharedCache(SQLiteBackend(tmp_path / "cache.db"))
+    assert other.l2.add("lease:parse:q2", b"1", 5)
+    threading.Timer(0.15, lambda: other.set("parse", "q2", "from other worker")).start()
+    assert cache.get_or_compute("parse", "q2", slow) == "from other worker"
+    assert len(calls) == 1
+
+
+def test_waiter_computes_when_lease_ends_without_value(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "CACHE_LEASE_S", 5)
+    holder = SharedCache(SQLiteBackend(tmp_path / "cache.db"))
+    waiter = SharedCache(SQLiteBackend(tmp_path / "cache.db"))
+
+    def miss():
+        time.sleep(0.2)
+        return None
+
+    thread = threading.Thread(target=lambda: holder.get_or_compute("places", "q", miss, cache_if=bool))
+    thread.start()
+    time.sleep(0.05)  # holder has the lease
+    started = time.monotonic()
+    assert waiter.get_or_compute("places", "q", lambda: ["Louvre"], cache_if=bool) == ["Louvre"]
+    thread.join()
+    # released as soon as the holder was done, not after the whole lease
+    assert time.monotonic() - started < 1.0
+    assert waiter.l2.get("lease:places:q") is None
+
+
+def test_l2_errors_fall_back_to_compute(monkeypatch):
+    class Broken:
+        def __getattr__(self, name):
+            def fail(*args):
+                raise ConnectionError("down")
+            return fail
+
+    monkeypatch.setattr(shared_cache, "CACHE_L2_RETRY_S", 60)
+    cache = SharedCache(Broken())
+    assert cache.get_or_compute("places", "k", lambda: [1]) == [1]
+    assert cache.get_or_compute("places", "k", lambda: [2]) == [1]  # served from L1
+    assert cache.stats["l2_errors"] == 1
+
+
+def test_empty_places_results_are_not_cached(monkeypatch):
+    from backend.app import google_places
+
+    monkeypatch.setattr(shared_cache, "_CACHE", SharedCache())
+    monkeypatch.setattr(google_places, "API_KEY", "test")
+    responses = [[], [{"place_name": "Louvre"}]]
+    monkeypatch.setattr(google_places, "_text_search", lambda query, city, country: responses.pop(0))
+
+    assert google_places.search_places("museum", "Paris") == []
+    assert google_places.search_places("museum", "Paris") == [{"place_name": "Louvre"}]
+    assert google_places.search_places("museum", "Paris") == [{"place_name": "Louvre"}]
+    assert shared_cache.get_cache().stats["l1_hits"] == 1
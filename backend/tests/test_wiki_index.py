@@ -0,0 +1,53 @@
+import gzip
+
+from backend.app import wikipedia, wiki_index
+from backend.app.wiki_index import WikiSummaryIndex, build_index
+
+DUMP = """<feed>
+<doc><title>Wikipedia: Central Park</title><url>u</url><abstract>Central Park is an urban park in Manhattan. It opened in 1858. It is big. It is green.</abstract></doc>
+<doc><title>Wikipedia: Metropolitan Museum of Art</title><abstract>The Met is an art museum.</abstract></doc>
+<doc><title>Wikipedia: Musée d'Orsay</title><abstract>A museum in Paris.</abstract></doc>
+<doc><title>Wikipedia: High Line (New York City)</title><abstract>An elevated park.</abstract></doc>
+<doc><title>Wikipedia: Louvre Palace</title><abstract>A former royal palace.</abstract></doc>
+<doc><title>Wikipedia: Unrelated Page</title><abstract>Not a POI.</abstract></doc>
+<doc><title>Wikipedia: Times Square</title><abstract>| infobox residue</abstract></doc>
+</feed>"""
+
+
+def test_build_and_lookup(tmp_path):
+    dump = tmp_path / "abstracts.xml.gz"
+    with gzip.open(dump, "wt", encoding="utf-8") as fh:
+        fh.write(DUMP)
+    redirects = tmp_path / "redirects.tsv"
+    redirects.write_text("Louvre Museum\tLouvre Palace\n", encoding="utf-8")
+
+    names = ["central park", "the metropolitan museum of art", "musee d'orsay", "high line",
+             "louvre museum", "times square"]
+    written = build_index(dump, names, out=tmp_path / "idx", redirects=redirects)
+    assert written == 5
+
+    index = WikiSummaryIndex(tmp_path / "idx")
+    assert index.get("Central  Park").startswith("Central Park is an urban park")
+    assert index.get("The Metropolitan Museum of Art") == "The Met is an art museum."
+    assert index.get("Musée d'Orsay") == "A museum in Paris."
+    assert index.get("High Line") == "An elevated park."
+    assert index.get("louvre museum") == "A former royal palace."
+    assert index.get("Times Square") is None and index.get("Unrelated Page") is None
+
+
+def test_get_poi_summary_prefers_local_index(tmp_path, monkeypatch):
+    dump = tmp_path / "d.xml"
+    dump.write_text(DUMP, encoding="utf-8")
+    build_index(dump, ["central park"], out=tmp_path / "idx")
+    monkeypatch.setattr(wiki_index, "_INDEX", WikiSummaryIndex(tmp_path / "idx"))
+    monkeypatch.setattr(wiki_index, "_INDEX_LOADED", True)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("live Wikipedia called")
+
+    monkeypatch.setattr(wikipedia, "call_dependency", no_network)
+    assert wikipedia.get_poi_summary("Central Park", sentences=2) == (
+        "Central Park is an urban park in Manhattan. It opened in 1858."
+    )
+    monkeypatch.setattr(wikipedia, "WIKI_OFFLINE", True)
+    assert wikipedia.get_poi_summary("Nowhere Park") is None